@@ -0,0 +1,133 @@
+# benchmarks/cli_importtime.py
+"""
+Startup cost of each `python -m nompower_pipeline <command>`.
+
+Every command is run for real under `python -X importtime`, in a throwaway
+copy of the tree (nompower_pipeline/ + data/ + processed_urls.txt) with all
+upstreams pointed at benchmarks.fake_upstreams, so nothing in the repo is
+touched and no network is used. Reported per command:
+
+  import_ms   total import time (-X importtime, top-level cumulative)
+  wall_ms     whole process
+  modules     number of modules imported
+  heavy       which of requests / jinja2 / slugify / generate got loaded
+
+The first row is the old entry point (`import nompower_pipeline.generate`
+with everything it used to pull in) for reference.
+
+  python -m benchmarks.cli_importtime --repeat 5
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_upstreams import FakeOptions, env_for, start_server
+
+ROOT = Path(__file__).resolve().parents[1]
+
+COMMANDS = ["stats", "feeds", "poll", "fetch", "select", "generate", "build", "post"]
+HEAVY = ("requests", "jinja2", "slugify", "nompower_pipeline.generate")
+BASELINE = "import nompower_pipeline.generate, nompower_pipeline.deepseek, nompower_pipeline.reddit, slugify"
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> tuple[float, list[str]]:
+    """(top-level cumulative ms, imported module names)."""
+    total_us = 0
+    mods = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        mods.append(m.group(4))
+        if len(m.group(3)) == 1:  # トップレベルだけ足す（子は cumulative に含まれる）
+            total_us += int(m.group(2))
+    return total_us / 1000, mods
+
+
+def make_tree() -> Path:
+    tmp = Path(tempfile.mkdtemp(prefix="nompower-cli-"))
+    shutil.copytree(ROOT / "nompower_pipeline", tmp / "nompower_pipeline", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(ROOT / "data", tmp / "data")
+    shutil.copy(ROOT / "processed_urls.txt", tmp / "processed_urls.txt")
+    return tmp
+
+
+def seed_queue(tree: Path) -> None:
+    """post に仕事をさせるため、due 済みの投稿を1件入れておく"""
+    code = (
+        "from nompower_pipeline.post_queue import load_queue, save_queue, enqueue\n"
+        "import time\n"
+        "q = load_queue(); enqueue(q, 'bench', source=f'bench-{time.time()}', kind='link'); save_queue(q)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=tree, check=True)
+
+
+def run_once(argv: list[str], tree: Path, env: dict[str, str]) -> dict:
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=tree, env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - t0) * 1000
+    if p.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed ({p.returncode}):\n{p.stdout[-800:]}\n{p.stderr[-800:]}")
+    import_ms, mods = parse_importtime(p.stderr)
+    return {"import_ms": import_ms, "wall_ms": wall, "modules": len(mods), "heavy": [h for h in HEAVY if h in mods]}
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="benchmarks.cli_importtime")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per command (median is reported)")
+    ap.add_argument("--out", default="", help="write JSON here (default: table only)")
+    args = ap.parse_args(argv)
+
+    srv, _, base = start_server(FakeOptions())
+    env = {**os.environ, **env_for(base), "DEEPSEEK_API_KEY": "fake-key", "MASTODON_ACCESS_TOKEN": "fake-token"}
+
+    rows = []
+    tree = make_tree()
+    try:
+        plans = [("(old) import generate", ["-c", BASELINE])] + [(c, ["-m", "nompower_pipeline", c]) for c in COMMANDS]
+        for name, cmd in plans:
+            runs = []
+            # 1回目は .pyc 生成が入るので捨てる
+            for i in range(max(1, args.repeat) + 1):
+                if name == "generate":
+                    run_once(["-m", "nompower_pipeline", "select", "--refresh"], tree, env)
+                if name == "post":
+                    seed_queue(tree)
+                r = run_once(cmd, tree, env)
+                if i:
+                    runs.append(r)
+            rows.append(
+                {
+                    "command": name,
+                    "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+                    "wall_ms": round(statistics.median(r["wall_ms"] for r in runs), 1),
+                    "modules": runs[-1]["modules"],
+                    "heavy": runs[-1]["heavy"],
+                }
+            )
+    finally:
+        shutil.rmtree(tree, ignore_errors=True)
+        srv.shutdown()
+
+    print(f"{'command':<24} {'import_ms':>9} {'wall_ms':>9} {'modules':>8}  heavy")
+    for r in rows:
+        print(f"{r['command']:<24} {r['import_ms']:>9.1f} {r['wall_ms']:>9.1f} {r['modules']:>8}  {','.join(r['heavy']) or '-'}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"repeat": args.repeat, "rows": rows}, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
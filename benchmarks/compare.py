@@ -0,0 +1,47 @@
+# benchmarks/compare.py
+"""
+Compare two benchmarks.run JSON reports.
+
+  python -m benchmarks.compare base.json head.json [--threshold 10]
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+
+
+def _index(report: dict) -> dict[tuple[int, str], dict]:
+    return {(r["size"], r["stage"]): r for r in report.get("results", [])}
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="benchmarks.compare")
+    ap.add_argument("base")
+    ap.add_argument("head")
+    ap.add_argument("--threshold", type=float, default=10.0, help="flag changes above this percent")
+    args = ap.parse_args(argv)
+
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    head = json.loads(Path(args.head).read_text(encoding="utf-8"))
+    b, h = _index(base), _index(head)
+
+    print(f"base={base['meta'].get('git_rev') or '?'} head={head['meta'].get('git_rev') or '?'}")
+    print(f"{'size':>8} {'stage':<18} {'base_s':>10} {'head_s':>10} {'delta':>8} {'peak_kb':>18}")
+    regressions = 0
+    for key in sorted(set(b) & set(h)):
+        rb, rh = b[key], h[key]
+        delta = (rh["min_s"] / rb["min_s"] - 1) * 100 if rb["min_s"] else 0.0
+        flag = ""
+        if delta > args.threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif delta < -args.threshold:
+            flag = "  faster"
+        peak = f"{rb.get('peak_kb', '-')}→{rh.get('peak_kb', '-')}"
+        print(f"{key[0]:>8} {key[1]:<18} {rb['min_s']:>10.4f} {rh['min_s']:>10.4f} {delta:>+7.1f}% {peak:>18}{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
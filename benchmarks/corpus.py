@@ -0,0 +1,176 @@
+# benchmarks/corpus.py
+"""
+Synthetic, seed-stable corpora shaped like data/articles.json and Reddit Atom feeds.
+
+  python -m benchmarks.corpus --size 10000 --out /tmp/corpus   # writes articles.json + feeds/*.xml
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+import argparse
+import json
+import random
+
+SUBREDDITS = ["technology", "artificial", "programming", "gadgets", "science", "security"]
+
+# 頻出語は少数・レア語は多数（Zipf っぽい分布でタイトル類似度の現実味を出す）
+_BASE_WORDS = (
+    "ai model chip gpu security breach update apple google openai microsoft android iphone linux "
+    "privacy data leak battery ev tesla toyota launch price market stock crypto bitcoin bank tax "
+    "cloud server outage bug patch exploit ransomware law court ban regulation study research "
+    "robot drone space nasa rocket satellite startup funding layoffs hiring remote chatbot agent "
+    "open source kernel browser chrome firefox windows update phone camera display quantum energy "
+    "solar grid network router wifi vpn password passkey encryption malware phishing scam"
+).split()
+
+_SECTIONS = [
+    "Is this your problem?",
+    "The Hidden Reality",
+    "Stop the Damage / Secure the Win",
+    "The High Cost of Doing Nothing",
+    "Common Misconceptions",
+    "Critical FAQ",
+]
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _vocab(rng: random.Random, n_rare: int = 4000) -> tuple[list[str], list[float]]:
+    """Returns (words, cumulative weights) for rng.choices(cum_weights=...)."""
+    rare = []
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    for _ in range(n_rare):
+        rare.append("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    words = _BASE_WORDS + rare
+    cum: list[float] = []
+    acc = 0.0
+    for i in range(len(words)):
+        acc += 1.0 / (i + 1) ** 0.9
+        cum.append(acc)
+    return words, cum
+
+
+def _sentence(rng: random.Random, words: list[str], cum: list[float], n: int) -> str:
+    s = " ".join(rng.choices(words, cum_weights=cum, k=n))
+    return s[:1].upper() + s[1:] + "."
+
+
+def _body_html(rng: random.Random, words: list[str], cum: list[float], body_words: int, link: str) -> str:
+    parts = [f"<p><strong>[CRITICAL SUMMARY]</strong>: <strong>{_sentence(rng, words, cum, 14)}</strong></p>"]
+    per = max(8, body_words // (len(_SECTIONS) * 3))
+    for h in _SECTIONS:
+        parts.append(f"<h2>{h}</h2>")
+        if rng.random() < 0.5:
+            items = "".join(f"<li>{_sentence(rng, words, cum, per // 2)}</li>" for _ in range(4))
+            parts.append(f"<ul>{items}</ul>")
+        else:
+            parts.append(f"<p>{_sentence(rng, words, cum, per)} {_sentence(rng, words, cum, per)}</p>")
+    parts.append("<h2>Verify Original Details</h2>")
+    parts.append(f'<p><a href="{link}" rel="nofollow noopener" target="_blank">Access the full source here</a></p>')
+    return "\n".join(parts)
+
+
+def make_articles(size: int, seed: int = 1234, body_words: int = 400) -> list[dict]:
+    """Newest first, like data/articles.json."""
+    rng = random.Random(seed)
+    words, cum = _vocab(rng)
+    out: list[dict] = []
+    for i in range(size):
+        ts = T0 + timedelta(hours=8 * i)
+        title_words = rng.choices(words, cum_weights=cum, k=rng.randint(6, 12))
+        title = " ".join(title_words).title()
+        slug = "-".join(title_words)[:80]
+        ymd = ts.strftime("%Y-%m-%d")
+        sub = rng.choice(SUBREDDITS)
+        pid = f"{i:x}{rng.randrange(16**4):04x}"
+        link = f"https://www.reddit.com/r/{sub}/comments/{pid}/{slug[:40].replace('-', '_')}/"
+        out.append(
+            {
+                "id": f"{ymd}-{slug}-{i}",
+                "title": title,
+                "path": f"/articles/{ymd}-{slug}-{i}.html",
+                "published_ts": ts.isoformat(timespec="seconds"),
+                "source_url": link,
+                "rss": f"https://www.reddit.com/r/{sub}/new/.rss",
+                "summary": "",
+                "body_html": _body_html(rng, words, cum, body_words, link),
+                "hero_image": "",
+                "hero_image_kind": "none",
+            }
+        )
+    out.reverse()
+    return out
+
+
+def make_atom_feed(subreddit: str, n_entries: int = 25, seed: int = 1234, with_images: bool = True) -> str:
+    """Reddit-shaped Atom document (escaped HTML content, media:thumbnail, t3_ ids)."""
+    rng = random.Random(f"{seed}:{subreddit}")
+    words, cum = _vocab(rng, n_rare=600)
+    now = T0 + timedelta(days=400)
+    rows = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/">',
+        f'<category term="{subreddit}" label="r/{subreddit}"/>',
+        f"<updated>{now.isoformat()}</updated>",
+        f"<id>/r/{subreddit}/new/.rss</id>",
+        f'<link rel="self" href="https://www.reddit.com/r/{subreddit}/new/.rss" type="application/atom+xml" />',
+        f"<title>newest submissions : {subreddit}</title>",
+    ]
+    for i in range(n_entries):
+        pid = f"{rng.randrange(36**7):x}"
+        title = " ".join(rng.choices(words, cum_weights=cum, k=rng.randint(6, 14))).capitalize()
+        link = f"https://www.reddit.com/r/{subreddit}/comments/{pid}/{title[:30].lower().replace(' ', '_')}/"
+        ts = (now - timedelta(minutes=7 * i)).isoformat()
+        img = ""
+        if with_images and rng.random() < 0.6:
+            img = f"https://i.redd.it/{pid}{i}.jpeg" if rng.random() < 0.5 else f"https://preview.redd.it/{pid}{i}.jpeg?width=640&amp;crop=smart"
+        content = '<table> <tr><td> <a href="{0}">'.format(link)
+        if img:
+            content += f'<img src="{img}" alt="{escape(title)}" title="{escape(title)}" />'
+        content += f"</a> </td><td> submitted by <a href=\"https://www.reddit.com/user/u{i}\"> /u/u{i} </a> <br/> <span><a href=\"{link}\">[link]</a></span> </td></tr></table>"
+        rows.append(
+            "<entry>"
+            f"<author><name>/u/u{i}</name><uri>https://www.reddit.com/user/u{i}</uri></author>"
+            f'<category term="{subreddit}" label="r/{subreddit}"/>'
+            f'<content type="html">{escape(content)}</content>'
+            f"<id>t3_{pid}</id>"
+            + (f'<media:thumbnail url="https://b.thumbs.redditmedia.com/{pid}.jpg" />' if img else "")
+            + f'<link href="{link}" />'
+            f"<updated>{ts}</updated><published>{ts}</published>"
+            f"<title>{escape(title)}</title>"
+            "</entry>"
+        )
+    rows.append("</feed>")
+    return "\n".join(rows)
+
+
+def feed_url(subreddit: str) -> str:
+    return f"https://www.reddit.com/r/{subreddit}/new/.rss"
+
+
+def make_feeds(n_feeds: int = 3, n_entries: int = 25, seed: int = 1234) -> dict[str, str]:
+    return {feed_url(sub): make_atom_feed(sub, n_entries, seed) for sub in SUBREDDITS[:n_feeds]}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="benchmarks.corpus")
+    ap.add_argument("--size", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--body-words", type=int, default=400)
+    ap.add_argument("--feeds", type=int, default=3)
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    (out / "feeds").mkdir(parents=True, exist_ok=True)
+    arts = make_articles(args.size, seed=args.seed, body_words=args.body_words)
+    (out / "articles.json").write_text(json.dumps(arts, ensure_ascii=False), encoding="utf-8")
+    for sub in SUBREDDITS[: args.feeds]:
+        (out / "feeds" / f"{sub}.xml").write_text(make_atom_feed(sub, seed=args.seed), encoding="utf-8")
+    print(f"wrote {len(arts)} articles and {args.feeds} feeds to {out}")
+
+
+if __name__ == "__main__":
+    main()
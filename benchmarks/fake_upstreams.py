@@ -0,0 +1,437 @@
+# benchmarks/fake_upstreams.py
+"""
+Local stand-in for every upstream the pipeline talks to (one port, routed by path):
+
+  GET  /r/<sub>/...rss                       Reddit-shaped Atom feed
+  GET  /by_id/t3_a,t3_b,....json             Reddit Listing with score / num_comments (grow on every call)
+  GET  /r/<sub>/comments/<id>/...            post permalink (200 even when removed, like Reddit)
+  POST /chat/completions, /v1/chat/...       DeepSeek chat completion (TITLE: + HTML body, usage incl. cache hit/miss;
+                                             "stream": true → SSE, latency spent on keep-alives, stops on disconnect)
+  GET  /<anything>.(jpg|jpeg|png|webp)       PNG bytes (i.redd.it / preview.redd.it stand-in; --dead-image-rate → 404)
+  POST /api/v1/statuses                      Mastodon status (honours Idempotency-Key)
+  GET  /repos/<o>/<r>/issues/<n>/comments    GitHub comments (per_page/page, Link, ETag → 304)
+  GET  /__stats                              request / injected-fault counters
+
+Fault injection (latency, 5xx, 429 + Retry-After) applies to the routes in --fault-routes.
+
+  python -m benchmarks.fake_upstreams --port 8808 --latency-ms 800 --jitter-ms 400 \\
+      --error-rate 0.05 --rate-429 0.1 --fault-routes chat,rss
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+import argparse
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+
+from benchmarks.corpus import make_atom_feed
+
+ROUTES = ("rss", "by_id", "chat", "image", "mastodon", "github")
+
+
+@dataclass
+class FakeOptions:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    retry_after_s: int = 1
+    fault_routes: tuple[str, ...] = ("chat",)
+    seed: int = 1234
+    image_size: tuple[int, int] = (1200, 630)
+    github_comments: int = 45
+    dead_image_rate: float = 0.0  # この割合の画像 URL は 404（URL ごとに固定）
+
+
+@dataclass
+class FakeState:
+    opts: FakeOptions
+    rng: random.Random
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    stats: dict[str, dict[str, int]] = field(default_factory=dict)
+    feeds: dict[str, str] = field(default_factory=dict)
+    statuses: dict[str, dict[str, Any]] = field(default_factory=dict)
+    seen_prefixes: set[str] = field(default_factory=set)
+    by_id_calls: dict[str, int] = field(default_factory=dict)
+    next_status_id: int = 1
+
+    def bump(self, route: str, key: str) -> None:
+        with self.lock:
+            self.stats.setdefault(route, {}).setdefault(key, 0)
+            self.stats[route][key] += 1
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+
+def _png(width: int, height: int) -> bytes:
+    """Solid-colour PNG (zlib keeps even 1200x630 tiny)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        c = struct.pack(">I", len(data)) + tag + data
+        return c + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + b"\x20\x40\x80" * width
+    raw = zlib.compress(row * height, 9)
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+
+def _fake_article(title_hint: str, n: int) -> str:
+    words = re.findall(r"[A-Za-z]+", title_hint)[:6] or ["update"]
+    topic = " ".join(words)
+    body = [f"<p><strong>[CRITICAL SUMMARY]</strong>: <strong>{topic} matters for fake reader #{n}.</strong></p>"]
+    for h in ("Is this your problem?", "The Hidden Reality", "Stop the Damage / Secure the Win", "Critical FAQ"):
+        body.append(f"<h2>{h}</h2>")
+        body.append("<p>" + " ".join([f"Placeholder sentence about {topic}."] * 12) + "</p>")
+    return f"TITLE: Fake headline {n}: {topic}\n\n" + "\n".join(body)
+
+
+def _url_fraction(seed: int, key: str) -> float:
+    return int(hashlib.sha1(f"{seed}:{key}".encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+def _removed(seed: int, fullname: str) -> str:
+    """
+    How the fake Reddit treats a post (fixed per id): "" live, "removed"
+    (~1 in 34, by_id returns it with removed_by_category / "[deleted]"),
+    "gone" (~1 in 34, by_id leaves it out).
+    """
+    h = int(hashlib.sha1(f"{seed}:{fullname}".encode()).hexdigest()[:8], 16)
+    if h % 17:
+        return ""
+    return "removed" if h // 17 % 2 else "gone"
+
+
+def make_handler(state: FakeState) -> type[BaseHTTPRequestHandler]:
+    opts = state.opts
+    png = _png(*opts.image_size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt: str, *args: Any) -> None:  # 静かに
+            return
+
+        # ---- helpers ----
+        def _send(self, code: int, body: bytes, ctype: str, headers: dict[str, str] | None = None) -> None:
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _json(self, code: int, obj: Any, headers: dict[str, str] | None = None) -> None:
+            self._send(code, json.dumps(obj).encode("utf-8"), "application/json", headers)
+
+        def _body(self) -> bytes:
+            n = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(n) if n else b""
+
+        def _faults(self, route: str, hold: bool = False) -> bool:
+            """
+            Apply latency / injected errors. Returns True if a response was already sent.
+            hold=True leaves the latency to the caller (self.hold_s; streamed chat).
+            """
+            state.bump(route, "requests")
+            self.hold_s = 0.0
+            if route not in opts.fault_routes:
+                return False
+            delay = opts.latency_ms + (state.roll() * opts.jitter_ms if opts.jitter_ms else 0.0)
+            if hold:
+                self.hold_s = delay / 1000.0
+            elif delay:
+                time.sleep(delay / 1000.0)
+            r = state.roll()
+            if r < opts.rate_429:
+                state.bump(route, "429")
+                self._json(429, {"error": "rate limited"}, {"Retry-After": str(opts.retry_after_s)})
+                return True
+            if r < opts.rate_429 + opts.error_rate:
+                state.bump(route, "5xx")
+                self._json(503, {"error": "injected failure"})
+                return True
+            return False
+
+        # ---- routing ----
+        def do_HEAD(self) -> None:
+            self.do_GET()
+
+        def do_GET(self) -> None:
+            u = urlparse(self.path)
+            path = u.path
+
+            if path == "/__stats":
+                with state.lock:
+                    return self._json(200, state.stats)
+
+            m = re.match(r"^/r/([A-Za-z0-9_]+)/.*\.rss$", path)
+            if m:
+                if self._faults("rss"):
+                    return
+                sub = m.group(1)
+                with state.lock:
+                    if sub not in state.feeds:
+                        state.feeds[sub] = make_atom_feed(sub, seed=opts.seed)
+                    xml = state.feeds[sub]
+                return self._send(200, xml.encode("utf-8"), "application/atom+xml; charset=UTF-8")
+
+            m = re.match(r"^/r/[A-Za-z0-9_]+/comments/([a-z0-9]+)", path)
+            if m:
+                if self._faults("rss"):
+                    return
+                # 本物と同じく削除済みでも 200（本文が "[removed]" になるだけ）
+                body = b"[removed]" if _removed(opts.seed, f"t3_{m.group(1)}") else b"fake post"
+                return self._send(200, b"<html><title>" + body + b"</title></html>", "text/html; charset=UTF-8")
+
+            m = re.match(r"^/by_id/([A-Za-z0-9_,]+)\.json$", path)
+            if m:
+                if self._faults("by_id"):
+                    return
+                return self._by_id(m.group(1).split(","))
+
+            if re.search(r"\.(jpe?g|png|webp)$", path, re.IGNORECASE):
+                if self._faults("image"):
+                    return
+                if opts.dead_image_rate and _url_fraction(opts.seed, path) < opts.dead_image_rate:
+                    return self._send(404, b"", "text/plain")
+                return self._send(200, png, "image/png")
+
+            m = re.match(r"^/repos/[^/]+/[^/]+/issues/(\d+)/comments$", path)
+            if m:
+                if self._faults("github"):
+                    return
+                return self._github_comments(int(m.group(1)), parse_qs(u.query))
+
+            self._json(404, {"error": f"no fake route for GET {path}"})
+
+        def do_POST(self) -> None:
+            path = urlparse(self.path).path
+            body = self._body()
+
+            if path in ("/chat/completions", "/v1/chat/completions"):
+                try:
+                    stream = bool(json.loads(body or b"{}").get("stream"))
+                except ValueError:
+                    stream = False
+                if self._faults("chat", hold=stream):
+                    return
+                return self._chat(body)
+
+            if path == "/api/v1/statuses":
+                if self._faults("mastodon"):
+                    return
+                return self._status(body)
+
+            self._json(404, {"error": f"no fake route for POST {path}"})
+
+        # ---- route impls ----
+        def _chat(self, body: bytes) -> None:
+            try:
+                req = json.loads(body or b"{}")
+            except ValueError:
+                return self._json(400, {"error": "bad json"})
+            msgs = req.get("messages") or []
+            text = "".join(str(m.get("content", "")) for m in msgs)
+            prompt_tokens = max(1, len(text) // 4)
+
+            # DeepSeek のコンテキストキャッシュを真似る：先頭メッセージ群が既出なら hit 扱い
+            prefix = "".join(str(m.get("content", "")) for m in msgs[:-1]) if len(msgs) > 1 else ""
+            key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+            with state.lock:
+                hit = bool(prefix) and key in state.seen_prefixes
+                state.seen_prefixes.add(key)
+            hit_tokens = len(prefix) // 4 if hit else 0
+
+            n = state.stats.get("chat", {}).get("requests", 0)
+            content = _fake_article(str(msgs[-1].get("content", "")) if msgs else "", n)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+            }
+            if req.get("stream"):
+                return self._chat_stream(req.get("model", "deepseek-chat"), content, usage)
+            self._json(
+                200,
+                {
+                    "id": f"fake-{n}",
+                    "object": "chat.completion",
+                    "model": req.get("model", "deepseek-chat"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage,
+                },
+            )
+
+        def _chat_stream(self, model: str, content: str, usage: dict[str, int]) -> None:
+            # ヘッダはすぐ返し、遅延の間は keep-alive（DeepSeek と同じ）。切断されたらそこで止める
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def event(obj: Any) -> bytes:
+                return b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj).encode("utf-8")) + b"\n\n"
+
+            pieces = [content[i:i + 200] for i in range(0, len(content), 200)]
+            end = time.monotonic() + self.hold_s
+            try:
+                while time.monotonic() < end:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    time.sleep(min(0.05, max(0.0, end - time.monotonic())))
+                for piece in pieces:
+                    self.wfile.write(event({"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}))
+                self.wfile.write(event({"model": model, "choices": [], "usage": usage}))
+                self.wfile.write(event(b"[DONE]"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                state.bump("chat", "cancelled")
+
+        def _status(self, body: bytes) -> None:
+            ctype = self.headers.get("Content-Type", "")
+            if "json" in ctype:
+                form = json.loads(body or b"{}")
+            else:
+                form = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+            idem = self.headers.get("Idempotency-Key", "")
+            host = f"http://{self.headers.get('Host', 'localhost')}"
+            with state.lock:
+                if idem and idem in state.statuses:
+                    state.stats.setdefault("mastodon", {}).setdefault("idempotent_replays", 0)
+                    state.stats["mastodon"]["idempotent_replays"] += 1
+                    return self._json(200, state.statuses[idem])
+                sid = state.next_status_id
+                state.next_status_id += 1
+                st = {"id": str(sid), "url": f"{host}/@fake/{sid}", "content": form.get("status", ""), "visibility": form.get("visibility", "public")}
+                if idem:
+                    state.statuses[idem] = st
+            self._json(200, st)
+
+        def _by_id(self, names: list[str]) -> None:
+            children = []
+            for name in names[:100]:
+                if not name.startswith("t3_"):
+                    continue
+                h = int(hashlib.sha1(f"{opts.seed}:{name}".encode()).hexdigest()[:8], 16)
+                removed = _removed(opts.seed, name)
+                if removed == "gone":
+                    continue  # 完全に消えた投稿は返ってこない
+                with state.lock:
+                    n = state.by_id_calls[name] = state.by_id_calls.get(name, 0) + 1
+                data = {
+                    "id": name[3:], "name": name, "subreddit": ("technology", "artificial", "programming")[h % 3],
+                    "score": h % 5000 + 37 * n, "num_comments": h % 700 + 5 * n,
+                    "author": "fake_user", "removed_by_category": None, "selftext": "",
+                }
+                if removed:
+                    data.update(author="[deleted]", removed_by_category="moderator", selftext="[removed]")
+                children.append({"kind": "t3", "data": data})
+            self._json(200, {"kind": "Listing", "data": {"children": children, "after": None}})
+
+        def _github_comments(self, issue: int, q: dict[str, list[str]]) -> None:
+            per_page = max(1, min(100, int((q.get("per_page") or ["30"])[0])))
+            page = max(1, int((q.get("page") or ["1"])[0]))
+            total = opts.github_comments
+            last = max(1, -(-total // per_page))
+            start = (page - 1) * per_page
+            items = [
+                {
+                    "id": 1000 + i,
+                    "created_at": f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                    "body": f"Run status: success\nNew article: https://nompower.example/articles/fake-{issue}-{i}.html",
+                }
+                for i in range(start, min(total, start + per_page))
+            ]
+            etag = '"' + hashlib.sha1(f"{issue}:{total}:{per_page}:{page}".encode()).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                state.bump("github", "304")
+                return self._send(304, b"", "application/json", {"ETag": etag})
+            base = f"http://{self.headers.get('Host', 'localhost')}{urlparse(self.path).path}"
+            links = []
+            if page < last:
+                links.append(f'<{base}?per_page={per_page}&page={page + 1}>; rel="next"')
+                links.append(f'<{base}?per_page={per_page}&page={last}>; rel="last"')
+            if page > 1:
+                links.append(f'<{base}?per_page={per_page}&page={page - 1}>; rel="prev"')
+                links.append(f'<{base}?per_page={per_page}&page=1>; rel="first"')
+            headers = {"ETag": etag}
+            if links:
+                headers["Link"] = ", ".join(links)
+            self._json(200, items, headers)
+
+    return Handler
+
+
+def start_server(opts: FakeOptions | None = None, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, FakeState, str]:
+    """Start in a daemon thread. Returns (server, state, base_url); call server.shutdown() when done."""
+    opts = opts or FakeOptions()
+    state = FakeState(opts=opts, rng=random.Random(opts.seed))
+    srv = ThreadingHTTPServer((host, port), make_handler(state))
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, state, f"http://{host}:{srv.server_address[1]}"
+
+
+def env_for(base_url: str) -> dict[str, str]:
+    """Environment that points every pipeline client at the fake server."""
+    return {
+        "REDDIT_BASE_URL": base_url,
+        "REDDIT_IMAGE_BASE_URL": base_url,
+        "DEEPSEEK_BASE_URL": base_url,
+        "MASTODON_BASE_URL": base_url,
+        "GITHUB_API_URL": base_url,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="benchmarks.fake_upstreams")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--fault-routes", default="chat", help=f"comma list of {','.join(ROUTES)}")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--dead-image-rate", type=float, default=0.0, help="fraction of image URLs answered 404")
+    args = ap.parse_args()
+
+    opts = FakeOptions(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        retry_after_s=args.retry_after,
+        fault_routes=tuple(x.strip() for x in args.fault_routes.split(",") if x.strip()),
+        seed=args.seed,
+        dead_image_rate=args.dead_image_rate,
+    )
+    srv, _, base = start_server(opts, args.host, args.port)
+    print(f"fake upstreams on {base}")
+    for k, v in env_for(base).items():
+        print(f"  export {k}={v}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
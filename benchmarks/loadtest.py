@@ -0,0 +1,112 @@
+# benchmarks/loadtest.py
+"""
+Offline end-to-end load test against benchmarks.fake_upstreams.
+
+Each work item runs the real pipeline pieces: fetch_rss_entries →
+deepseek_article → cache_og_image, with N items in flight at once.
+
+  python -m benchmarks.loadtest --items 40 --concurrency 8 --latency-ms 300 --rate-429 0.1 --error-rate 0.05
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_upstreams import FakeOptions, env_for, start_server
+from nompower_pipeline import generate as g, hedge
+from nompower_pipeline.reddit import fetch_rss_entries
+
+
+def _pct(xs: list[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="benchmarks.loadtest")
+    ap.add_argument("--items", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--jitter-ms", type=float, default=200.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--fault-routes", default="chat")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args(argv)
+
+    opts = FakeOptions(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        fault_routes=tuple(x.strip() for x in args.fault_routes.split(",") if x.strip()),
+        seed=args.seed,
+    )
+    srv, state, base = start_server(opts)
+    os.environ.update(env_for(base))
+    os.environ.setdefault("DEEPSEEK_API_KEY", "fake-key")
+
+    cfg = g.load_config()
+    g.SITE_DIR = Path(tempfile.mkdtemp(prefix="nompower-load-"))
+    # フェイクの遅延を本番の data/llm_latency.json（ヘッジの締め切り）に混ぜない
+    hedge.LATENCY_PATH = Path(tempfile.mkdtemp(prefix="nompower-load-state-")) / "llm_latency.json"
+    site_base = cfg["site"]["base_url"]
+
+    t_fetch = time.perf_counter()
+    entries: list[dict] = []
+    for rss in cfg["feeds"]["reddit_rss"]:
+        entries.extend(fetch_rss_entries(rss))
+    fetch_s = time.perf_counter() - t_fetch
+    if not entries:
+        raise SystemExit("fake server returned no feed entries")
+
+    def work(i: int) -> float:
+        e = dict(entries[i % len(entries)])
+        t0 = time.perf_counter()
+        g.deepseek_article(cfg, e)
+        g.cache_og_image(site_base, e.get("hero_image", ""), f"load-{i}")
+        return time.perf_counter() - t0
+
+    lat: list[float] = []
+    failures: dict[str, int] = {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        futs = [ex.submit(work, i) for i in range(args.items)]
+        for f in as_completed(futs):
+            try:
+                lat.append(f.result())
+            except Exception as e:  # noqa: BLE001 - 集計したいだけ
+                failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+    wall = time.perf_counter() - t0
+    srv.shutdown()
+
+    report = {
+        "items": args.items,
+        "concurrency": args.concurrency,
+        "ok": len(lat),
+        "failed": failures,
+        "wall_s": round(wall, 3),
+        "throughput_items_per_s": round(len(lat) / wall, 3) if wall else 0.0,
+        "feed_fetch_s": round(fetch_s, 3),
+        "latency_s": {
+            "p50": round(_pct(lat, 50), 3),
+            "p90": round(_pct(lat, 90), 3),
+            "p99": round(_pct(lat, 99), 3),
+            "mean": round(statistics.mean(lat), 3) if lat else 0.0,
+        },
+        "upstream": state.stats,
+        "fault_options": {k: v for k, v in vars(opts).items() if k != "image_size"},
+    }
+    print(json.dumps(report, indent=2, default=list))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# benchmarks/run.py
+"""
+Time pipeline stages against synthetic corpora (fixed seeds, no network).
+
+  python -m benchmarks.run                               # 1k + 10k
+  python -m benchmarks.run --sizes 1000,10000,100000 --out bench.json
+  python -m benchmarks.run --stages related_articles,write_rss_feed
+
+Output is JSON ({"meta": ..., "results": [...]}) so runs can be diffed with
+python -m benchmarks.compare old.json new.json
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+import argparse
+import gc
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import make_articles, make_feeds
+from nompower_pipeline import generate as g
+from nompower_pipeline.derived import ensure_derived
+from nompower_pipeline.reddit import parse_rss_entries
+from nompower_pipeline.search_index import write_search_index
+
+STAGES = ["pick_candidate", "related_articles", "write_rss_feed", "search_index", "build_site"]
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=g.ROOT, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _measure(fn: Callable[[], Any], repeat: int, memory: bool) -> dict[str, Any]:
+    times: list[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    out: dict[str, Any] = {
+        "repeat": repeat,
+        "min_s": round(min(times), 5),
+        "median_s": round(statistics.median(times), 5),
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out["peak_kb"] = round(peak / 1024, 1)
+    return out
+
+
+def bench_size(size: int, stages: list[str], args: argparse.Namespace, site_root: Path) -> list[dict[str, Any]]:
+    t0 = time.perf_counter()
+    articles = make_articles(size, seed=args.seed, body_words=args.body_words)
+    ensure_derived(articles)  # 本番の articles.json と同じく取り込み時の派生フィールド込み
+    feeds = make_feeds(n_feeds=args.feeds, seed=args.seed)
+    print(f"[bench] size={size} corpus built in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+    cfg = g.load_config()
+    cfg["feeds"]["reddit_rss"] = list(feeds)
+    cfg.setdefault("build", {})["minify_html"] = args.minify
+
+    # フィードは fixture から（ネットワークなし）
+    fetch = lambda url, max_items=25: parse_rss_entries(feeds[url], url, max_items=max_items)  # noqa: E731
+    g.cache_og_image = lambda base_url, src_url, article_id, site_dir=None: ""
+
+    site_dir = site_root / f"site-{size}"
+    g.SITE_DIR = site_dir
+    g.BUILD_STATE_DIR = site_root / f"state-{size}"
+    site_dir.mkdir(parents=True, exist_ok=True)
+
+    sample = articles[: args.related_sample]
+    token_sets = {a["id"]: set(a["title_tokens"]) for a in articles}
+
+    runners: dict[str, Callable[[], Any]] = {
+        "pick_candidate": lambda: g.pick_candidate(cfg, set(), articles, fetch=fetch),
+        "related_articles": lambda: [g.related_articles(a, articles, k=6, token_sets=token_sets) for a in sample],
+        "write_rss_feed": lambda: g.write_rss_feed(cfg, articles, limit=10),
+        "search_index": lambda: (shutil.rmtree(site_dir / "search", ignore_errors=True), write_search_index(articles, site_dir / "search", g.BUILD_STATE_DIR / "search_index_state.json")),
+        "build_site": lambda: (shutil.rmtree(site_dir, ignore_errors=True), g.build_site(cfg, articles)),
+    }
+
+    results = []
+    for stage in stages:
+        if stage == "build_site" and size > args.build_max:
+            print(f"[bench] skip build_site for size={size} (> --build-max {args.build_max})", file=sys.stderr)
+            continue
+        repeat = 1 if stage == "build_site" else args.repeat
+        r = _measure(runners[stage], repeat, memory=not args.no_memory)
+        r.update({"size": size, "stage": stage})
+        if stage == "related_articles":
+            r["calls"] = len(sample)
+            r["per_call_ms"] = round(r["min_s"] / max(1, len(sample)) * 1000, 3)
+        results.append(r)
+        print(f"[bench] size={size} {stage}: min={r['min_s']:.4f}s peak={r.get('peak_kb', '-')}KB", file=sys.stderr)
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="benchmarks.run")
+    ap.add_argument("--sizes", default="1000,10000")
+    ap.add_argument("--stages", default=",".join(STAGES))
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--body-words", type=int, default=400)
+    ap.add_argument("--feeds", type=int, default=3)
+    ap.add_argument("--related-sample", type=int, default=50)
+    ap.add_argument("--build-max", type=int, default=10000, help="skip build_site above this size")
+    ap.add_argument("--minify", action="store_true", help="enable HTML minification in build_site")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    ap.add_argument("--out", default="", help="write JSON here (default: stdout)")
+    args = ap.parse_args(argv)
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    stages = [x.strip() for x in args.stages.split(",") if x.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    site_root = Path(tempfile.mkdtemp(prefix="nompower-bench-"))
+    try:
+        results: list[dict[str, Any]] = []
+        for size in sizes:
+            results.extend(bench_size(size, stages, args, site_root))
+    finally:
+        shutil.rmtree(site_root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "git_rev": _git_rev(),
+            "created_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "body_words": args.body_words,
+            "feeds": args.feeds,
+            "minify": args.minify,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# benchmarks/sanitize_bench.py
+"""
+Fuzz + benchmark for nompower_pipeline.sanitize.sanitize_html.
+
+  python -m benchmarks.sanitize_bench --fuzz 5000 --seed 7
+  python -m benchmarks.sanitize_bench --bench --scale 20
+
+The benchmark compares against the previous regex chain
+(script regex + strip_leading_duplicate_title + tag-strip for plain text
++ word count), i.e. everything the single pass now does.
+"""
+from __future__ import annotations
+
+from html.parser import HTMLParser
+import argparse
+import html as _html
+import json
+import random
+import re
+import sys
+import time
+
+from nompower_pipeline.sanitize import ALLOWED_ATTRS, ALLOWED_TAGS, _fast_path, _parse, sanitize_html
+from nompower_pipeline.util import ROOT, read_json
+
+# ---- previous implementation (baseline) ----
+
+
+def _old_sanitize(s: str) -> str:
+    return re.sub(r"(?is)<\s*script\b", "&lt;script", s)
+
+
+def _old_strip_title(body_html: str, title: str) -> str:
+    if not body_html or not title:
+        return body_html
+    t_norm = re.sub(r"\s+", " ", _html.unescape(title).strip()).lower()
+
+    def _same(text: str) -> bool:
+        return re.sub(r"\s+", " ", _html.unescape(text or "").strip()).lower() == t_norm
+
+    s = body_html.lstrip()
+    for rx in (r"(?is)^\s*<h1[^>]*>(.*?)</h1>\s*", r"(?is)^\s*<h2[^>]*>(.*?)</h2>\s*"):
+        m = re.match(rx, s)
+        if m and _same(m.group(1)):
+            return s[m.end():].lstrip()
+    m = re.match(r"(?is)^\s*<p[^>]*>(.*?)</p>\s*", s)
+    if m and _same(re.sub(r"(?is)<[^>]+>", "", m.group(1))):
+        return s[m.end():].lstrip()
+    m = re.match(r"(?is)^\s*([^<\n]{10,200})\s*(?:<br\s*/?>|\n)\s*", s)
+    if m and _same(m.group(1)):
+        return s[m.end():].lstrip()
+    return body_html
+
+
+def old_chain(body: str, title: str) -> tuple[str, str, int]:
+    h = _old_strip_title(_old_sanitize(body), title)
+    text = re.sub(r"\s+", " ", re.sub(r"(?is)<[^>]+>", " ", h)).strip()
+    return h, text, len(text.split())
+
+
+# ---- fuzzing ----
+
+_TAGS = ["p", "h1", "h2", "h3", "ul", "ol", "li", "strong", "b", "em", "code", "a", "div", "span",
+         "script", "style", "iframe", "img", "svg", "br", "template", "noscript", "table", "td"]
+_ATTRS = ["href", "src", "onclick", "onerror", "onload", "style", "class", "target", "rel", "title", "srcdoc", "formaction"]
+_VALUES = ["https://example.com/a?b=1&c=2", "javascript:alert(1)", " JaVaScRiPt:alert(1)", "java\tscript:alert(1)",
+           "jav&#x09;ascript:alert(1)", "data:text/html;base64,PHNjcmlwdD4=", "vbscript:msgbox(1)", "/relative/path",
+           "#frag", "mailto:a@b.c", "_blank", "x\" onmouseover=\"alert(1)", "'><script>alert(1)</script>", ""]
+_TEXT = ["hello", "Big News Today", "&lt;script&gt;", "&amp;", "<", ">", "\n", "  ", "word " * 5, "é ü 日本"]
+
+
+def _attr(rng: random.Random) -> str:
+    name, value = rng.choice(_ATTRS), rng.choice(_VALUES)
+    if rng.random() < 0.7:
+        return f' {name}="{value}"'
+    return f" {name}={value.split()[0] if value.split() else 'x'}"  # unquoted
+
+
+def _fragment(rng: random.Random, depth: int = 0) -> str:
+    out = []
+    for _ in range(rng.randint(1, 5)):
+        r = rng.random()
+        if r < 0.35 or depth > 4:
+            out.append(rng.choice(_TEXT))
+        elif r < 0.45:
+            out.append(rng.choice(["<!-- c -->", "<!--", "-->", "</p>", "</script>", "<br/>", "<img src=x onerror=alert(1)>", "<", "</"]))
+        else:
+            tag = rng.choice(_TAGS)
+            attrs = "".join(_attr(rng) for _ in range(rng.randint(0, 3)))
+            inner = _fragment(rng, depth + 1)
+            close = f"</{tag}>" if rng.random() < 0.8 else ""
+            out.append(f"<{tag}{attrs}>{inner}{close}")
+    return "".join(out)
+
+
+class _Audit(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.problems: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ALLOWED_TAGS:
+            self.problems.append(f"tag <{tag}>")
+        for k, v in attrs:
+            if k not in ALLOWED_ATTRS.get(tag, ()):
+                self.problems.append(f"attr {tag}[{k}]")
+            if k == "href" and re.sub(r"[\x00-\x20]+", "", (v or "")).lower().startswith(("javascript:", "data:", "vbscript:")):
+                self.problems.append(f"href {v!r}")
+
+
+def fuzz(n: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = fast_hits = 0
+    for i in range(n):
+        doc = _fragment(rng)
+        title = rng.choice(["Big News Today", "", "hello"])
+        r = sanitize_html(doc, title)
+        audit = _Audit()
+        audit.feed(r.html)
+        audit.close()
+        problems = list(audit.problems)
+        # テキスト中の "<" は &lt; になっているはずなので、生の "<script" が残っていたら漏れ
+        if re.search(r"(?i)<\s*script", r.html):
+            problems.append("raw <script")
+        again = sanitize_html(r.html).html
+        if again != r.html:
+            problems.append("not idempotent")
+        # fast path を通る入力は html.parser 経由と同じ結果になること
+        for src, t in ((doc, title), (r.html, title), (f"<h2>{title}</h2>\n" + r.html, title)):
+            fast = _fast_path(src, t)
+            if fast is not None:
+                fast_hits += 1
+                if fast != _parse(src, t):
+                    problems.append("fast path differs")
+        if problems:
+            failures += 1
+            if failures <= 5:
+                print(json.dumps({"case": i, "input": doc, "output": r.html, "problems": problems}), file=sys.stderr)
+    print(json.dumps({"fuzz_cases": n, "seed": seed, "fast_path_checked": fast_hits, "failures": failures}))
+    return failures
+
+
+def bench(scale: int, repeat: int) -> None:
+    arts = read_json(ROOT / "data" / "articles.json", default=[])
+    bodies = [(a.get("title", ""), "<h1>" + a.get("title", "") + "</h1>\n" + a.get("body_html", "")) for a in arts]
+    if not bodies:
+        print("no articles")
+        return
+    # 実際の LLM 出力に近い形（許可タグだけ）：アーカイブ本文を一度通したもの + 先頭に重複タイトル
+    clean = [(t, f"<h2>{t}</h2>\n" + _parse(b, t).html) for t, b in bodies]
+    large = [(t, b * scale) for t, b in bodies[:20]]
+    large_clean = [(t, b * scale) for t, b in clean[:20]]
+
+    def timeit(fn, items) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for t, b in items:
+                fn(b, t)
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    report = {}
+    cases = (("archive", bodies), (f"archive_x{scale}", large), ("llm_clean", clean), (f"llm_clean_x{scale}", large_clean))
+    for label, items in cases:
+        old = timeit(old_chain, items)
+        new = timeit(sanitize_html, items)
+        kb = sum(len(b) for _, b in items) / 1024
+        report[label] = {
+            "bodies": len(items),
+            "total_kb": round(kb, 1),
+            "regex_chain_s": round(old, 4),
+            "single_pass_s": round(new, 4),
+            "speedup": round(old / new, 2) if new else 0.0,
+        }
+    print(json.dumps(report, indent=2))
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="benchmarks.sanitize_bench")
+    ap.add_argument("--fuzz", type=int, default=0, help="number of random documents")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--scale", type=int, default=20, help="body multiplier for the large-body case")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    rc = 0
+    if args.fuzz:
+        rc = 1 if fuzz(args.fuzz, args.seed) else 0
+    if args.bench or not args.fuzz:
+        bench(args.scale, args.repeat)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
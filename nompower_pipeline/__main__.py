@@ -0,0 +1,256 @@
+# nompower_pipeline/__main__.py
+"""
+Subcommand CLI: python -m nompower_pipeline <command>
+
+  poll       fetch feeds into the candidate queue  → data/candidates.sqlite (+ .jsonl)
+  fetch      download the configured RSS feeds    → data/feed_entries.json
+  select     pick one new candidate               → data/candidate.json
+  generate   LLM article for data/candidate.json  → data/articles.json
+  engage     refresh Reddit score/comments (batched by_id) → data/articles.json, data/trending.json
+  linkcheck  probe source / hero image URLs, flag dead ones → data/link_health.json, data/articles.json
+  build      render site/ from data/articles.json
+  feeds      rewrite feed.xml / feed.atom / feed.json (+ archives) only
+  weight     page-weight report of the built site/ (offline)
+  post       drain due Mastodon posts (data/post_queue.json)
+  stats      articles / last run / queue summary
+
+Each stage reads and writes the files above, so they can run one at a time.
+Heavy modules (requests, jinja2, slugify, the generate pipeline) are imported
+inside the command that needs them; `stats` and `feeds` never load them.
+The full one-shot run is still `python -m nompower_pipeline.generate`.
+
+Startup cost per command: python -m benchmarks.cli_importtime
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import argparse
+import os
+import sys
+
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+# generate.py と同じ既定パス（ここで generate を import しないため）
+CONFIG_PATH = ROOT / "nompower_pipeline" / "config.json"
+ARTICLES_PATH = ROOT / "data" / "articles.json"
+PROCESSED_PATH = ROOT / "processed_urls.txt"
+LAST_RUN_PATH = ROOT / "data" / "last_run.json"
+SITE_DIR = ROOT / "site"
+FEED_STATE_PATH = ROOT / "data" / "feed_state.json"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _config() -> dict:
+    return read_json(CONFIG_PATH, default=None) or {}
+
+
+def cmd_poll(args: argparse.Namespace) -> int:
+    from contextlib import closing
+
+    from nompower_pipeline.candidate_queue import QUEUE_DB_PATH, connect, counts, export_path, poll, save_jsonl
+    from nompower_pipeline.util import normalize_url, read_text
+
+    processed = {normalize_url(x) for x in read_text(PROCESSED_PATH).splitlines() if x.strip()}
+    articles = read_json(ARTICLES_PATH, default=[])
+    with closing(connect(QUEUE_DB_PATH)) as conn:
+        st = poll(conn, _config(), processed, articles)
+        c = counts(conn)
+        saved = save_jsonl(conn, export_path(QUEUE_DB_PATH))
+    print(f"[poll] seen={st['seen']} inserted={st['inserted']} queued={st['queued']} expired={st['expired']} saved={saved} | "
+          + " ".join(f"{k}={v}" for k, v in sorted(c.items())))
+    return 0
+
+
+def cmd_fetch(args: argparse.Namespace) -> int:
+    from nompower_pipeline.candidates import ENTRIES_PATH, fetch_feeds
+
+    urls = _config()["feeds"]["reddit_rss"]
+    feeds = fetch_feeds(urls)
+    write_json(ENTRIES_PATH, {"fetched_utc": _now_iso(), "feeds": feeds})
+    print(f"[fetch] feeds={len(feeds)} entries={sum(len(v) for v in feeds.values())} → {ENTRIES_PATH.relative_to(ROOT)}")
+    return 0
+
+
+def cmd_select(args: argparse.Namespace) -> int:
+    from nompower_pipeline.candidates import CANDIDATE_PATH, ENTRIES_PATH, pick_candidate, stored_fetch
+    from nompower_pipeline.util import normalize_url, read_text
+
+    cfg = _config()
+    processed = {normalize_url(x) for x in read_text(PROCESSED_PATH).splitlines() if x.strip()}
+    articles = read_json(ARTICLES_PATH, default=[])
+
+    stored = read_json(ENTRIES_PATH, default=None)
+    if stored and not args.refresh:
+        fetch = stored_fetch(stored["feeds"])
+        print(f"[select] using {ENTRIES_PATH.relative_to(ROOT)} (fetched {stored.get('fetched_utc', '?')})")
+    else:
+        fetch = None  # その場で取得
+
+    cand = pick_candidate(cfg, processed, articles, fetch=fetch)
+    if not cand:
+        CANDIDATE_PATH.unlink(missing_ok=True)
+        print("[select] no new candidate")
+        return 0
+    write_json(CANDIDATE_PATH, cand)
+    print(f"[select] {cand['title']!r} {cand['link']} → {CANDIDATE_PATH.relative_to(ROOT)}")
+    return 0
+
+
+def cmd_generate(args: argparse.Namespace) -> int:
+    from nompower_pipeline.candidates import CANDIDATE_PATH
+
+    cand = read_json(CANDIDATE_PATH, default=None)
+    if not cand:
+        print(f"[generate] no {CANDIDATE_PATH.relative_to(ROOT)}; run `select` first", file=sys.stderr)
+        return 1
+
+    from nompower_pipeline import generate as g
+
+    cfg = g.load_config()
+    articles = read_json(g.ARTICLES_PATH, default=[])
+    entry = g.make_article(cfg, cand)
+    g.store_article(entry, cand["link"], articles)
+    CANDIDATE_PATH.unlink(missing_ok=True)
+    print(f"[generate] {entry['path']} words={entry['word_count']} articles={len(articles)}")
+    return 0
+
+
+def cmd_engage(args: argparse.Namespace) -> int:
+    from nompower_pipeline.engagement import main as engage_main
+
+    engage_main((["--limit", str(args.limit)] if args.limit else []) + (["--dry-run"] if args.dry_run else []))
+    return 0
+
+
+def cmd_linkcheck(args: argparse.Namespace) -> int:
+    from nompower_pipeline.linkcheck import main as linkcheck_main
+
+    linkcheck_main((["--max", str(args.max)] if args.max is not None else []) + (["--dry-run"] if args.dry_run else []))
+    return 0
+
+
+def cmd_build(args: argparse.Namespace) -> int:
+    from nompower_pipeline import generate as g
+
+    cfg = g.load_config()
+    articles = read_json(g.ARTICLES_PATH, default=[])
+    g.build_site(cfg, articles)
+    print(f"[build] articles={len(articles)} → {g.SITE_DIR}")
+    return 0
+
+
+def cmd_feeds(args: argparse.Namespace) -> int:
+    from nompower_pipeline.derived import ensure_derived
+    from nompower_pipeline.feeds import write_feeds, write_rss
+
+    cfg = _config()
+    articles = read_json(ARTICLES_PATH, default=[])
+    ensure_derived(articles)
+    write_rss(cfg, articles, SITE_DIR, limit=10)
+    fs = write_feeds(cfg, articles, SITE_DIR, FEED_STATE_PATH)
+    print(f"[feeds] head={fs['head']} pages={fs['pages']} written={fs['written']} full={fs['full']}")
+    return 0
+
+
+def cmd_weight(args: argparse.Namespace) -> int:
+    from nompower_pipeline.pageweight import main as weight_main
+
+    weight_main(["--site", str(SITE_DIR), "--top", str(args.top)] + (["--out", args.out] if args.out else []))
+    return 0
+
+
+def cmd_post(args: argparse.Namespace) -> int:
+    base = os.getenv("MASTODON_BASE_URL")
+    token = os.getenv("MASTODON_ACCESS_TOKEN")
+    if not base or not token:
+        print("[post] Missing MASTODON_BASE_URL or MASTODON_ACCESS_TOKEN", file=sys.stderr)
+        return 1
+
+    from nompower_pipeline.post_queue import drain, mastodon_poster
+
+    stats = drain(mastodon_poster(base, token), limit=args.limit)
+    print(f"[post] {stats}")
+    return 1 if stats["failed"] else 0
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    from contextlib import closing
+
+    from nompower_pipeline.candidate_queue import QUEUE_DB_PATH, connect, counts, export_path
+    from nompower_pipeline.candidates import CANDIDATE_PATH
+    from nompower_pipeline.post_queue import load_queue
+
+    articles = read_json(ARTICLES_PATH, default=[])
+    newest = max(articles, key=lambda a: a.get("published_ts", ""), default=None)
+    print(f"articles   {len(articles)}" + (f"  newest {newest['published_ts']} {newest['title'][:60]!r}" if newest else ""))
+
+    lr = read_json(LAST_RUN_PATH, default=None)
+    if lr:
+        print(f"last run   {lr.get('updated_utc', '?')}  created={lr.get('created')}  {lr.get('article_url') or lr.get('note', '')}")
+        u = lr.get("llm_usage")
+        if u:
+            print(f"  llm prompt={u.get('prompt_tokens')} cache_hit={u.get('prompt_cache_hit_tokens')} "
+                  f"ratio={u.get('cache_hit_ratio')} prefix={u.get('prompt_prefix')} {u.get('latency_s')}s")
+        spans = sorted((lr.get("timings") or {}).items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:5]
+        for name, t in spans:
+            print(f"  {name:<24} n={t['count']:<4} total={t['total_s']:.3f}s")
+
+    cand = read_json(CANDIDATE_PATH, default=None)
+    print(f"candidate  {cand['title'][:60]!r}" if cand else "candidate  -")
+
+    if QUEUE_DB_PATH.exists() or export_path(QUEUE_DB_PATH).exists():
+        with closing(connect(QUEUE_DB_PATH)) as conn:
+            c = counts(conn)
+        print("candidates " + (" ".join(f"{k}={v}" for k, v in sorted(c.items())) or "empty"))
+
+    posts: dict[str, int] = {}
+    for p in load_queue()["posts"]:
+        posts[p["status"]] = posts.get(p["status"], 0) + 1
+    print("queue      " + (" ".join(f"{k}={v}" for k, v in sorted(posts.items())) or "empty"))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m nompower_pipeline")
+    sub = ap.add_subparsers(dest="command", required=True, metavar="command")
+
+    sub.add_parser("poll", help="add new feed entries to the candidate queue (data/candidates.jsonl)").set_defaults(fn=cmd_poll)
+    sub.add_parser("fetch", help="download RSS feeds to data/feed_entries.json").set_defaults(fn=cmd_fetch)
+    p = sub.add_parser("select", help="pick a candidate into data/candidate.json")
+    p.add_argument("--refresh", action="store_true", help="ignore data/feed_entries.json and fetch now")
+    p.set_defaults(fn=cmd_select)
+    sub.add_parser("generate", help="write the article for data/candidate.json").set_defaults(fn=cmd_generate)
+    p = sub.add_parser("engage", help="refresh Reddit score/comments and the trending ranking")
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(fn=cmd_engage)
+    p = sub.add_parser("linkcheck", help="check a slice of source / image links and flag dead ones")
+    p.add_argument("--max", type=int, default=None)
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(fn=cmd_linkcheck)
+    sub.add_parser("build", help="render site/ from data/articles.json").set_defaults(fn=cmd_build)
+    sub.add_parser("feeds", help="rewrite RSS / Atom / JSON feeds only").set_defaults(fn=cmd_feeds)
+    p = sub.add_parser("weight", help="page-weight report of site/")
+    p.add_argument("--top", type=int, default=5)
+    p.add_argument("--out", default="", help="write the full report as JSON")
+    p.set_defaults(fn=cmd_weight)
+    p = sub.add_parser("post", help="post due Mastodon queue entries")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(fn=cmd_post)
+    sub.add_parser("stats", help="print a status summary").set_defaults(fn=cmd_stats)
+    return ap
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    from nompower_pipeline.telemetry import flush_at_exit
+
+    flush_at_exit(args.command)  # HTTP を使ったコマンドだけ data/metrics.jsonl に行が増える
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
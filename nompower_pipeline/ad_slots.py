@@ -0,0 +1,91 @@
+# nompower_pipeline/ad_slots.py
+"""
+Display-ad slots as lightweight placeholders filled by /assets/ads.js.
+
+Every page used to inline the same Monetag loader three times (top / mid /
+bottom, plus once more at the start of <body>) and relied on
+window.__monetag_loaded to make all but one of them no-ops. Now the
+pipeline emits, per slot, an empty element that only describes what to load:
+
+  <section class="ad-slot ad-top" data-ad-slot="top"
+           data-ad-src="https://…/tag.min.js" data-ad-attr-zone="10551684"
+           data-ad-margin="200px"></section>
+
+ads.js (one shared, cached asset) watches the slots with IntersectionObserver
+and injects the provider script when a slot comes within `margin` of the
+viewport; a src already injected by another slot is not loaded twice.
+A slot without a provider renders nothing.
+
+Providers and slots are defined below; config.json can override both:
+
+  "ads": {
+    "providers": {"name": {"src": "...", "attrs": {"data-zone": "..."}, "target": "head"}},
+    "slots": {"mid": {"provider": "monetag_inpage", "margin": "400px", "min_height": 90}}
+  }
+
+target: "slot" (default) appends the script inside the slot element,
+"head" appends it to <head> (page-level formats such as in-page push).
+"""
+from __future__ import annotations
+
+from html import escape
+
+AD_PROVIDERS: dict[str, dict] = {
+    # Monetag In-Page Push（ページ全体で1回読めばよい）
+    "monetag_inpage": {
+        "src": "https://nap5k.com/tag.min.js",
+        "attrs": {"data-zone": "10551684"},
+        "target": "head",
+    },
+    # 以前の ads_rail_left / ads_rail_right（テンプレートには未配置）
+    "effectivegate_rail": {
+        "src": "https://pl28593834.effectivegatecpm.com/bf/0c/41/bf0c417e61a02af02bb4fab871651c1b.js",
+    },
+    "quge_rail": {
+        "src": "https://quge5.com/88/tag.min.js",
+        "attrs": {"data-zone": "206389", "data-cfasync": "false"},
+    },
+}
+
+# 置き場所 → 中身。provider "" の枠は出力しない
+AD_SLOTS: dict[str, dict] = {
+    "top": {"provider": "monetag_inpage", "margin": "0px"},
+    "mid": {"provider": "", "margin": "200px"},
+    "bottom": {"provider": "", "margin": "200px"},
+}
+
+
+def _merged(cfg: dict) -> tuple[dict[str, dict], dict[str, dict]]:
+    ads_cfg = cfg.get("ads", {}) or {}
+    providers = {k: dict(v) for k, v in AD_PROVIDERS.items()}
+    for k, v in (ads_cfg.get("providers") or {}).items():
+        providers[k] = {**providers.get(k, {}), **v}
+    slots = {k: dict(v) for k, v in AD_SLOTS.items()}
+    for k, v in (ads_cfg.get("slots") or {}).items():
+        slots[k] = {**slots.get(k, {}), **v}
+    return providers, slots
+
+
+def slot_html(name: str, slot: dict, providers: dict[str, dict]) -> str:
+    provider = providers.get(slot.get("provider") or "")
+    if not provider or not provider.get("src"):
+        return ""
+    attrs = [
+        ("class", f"ad-slot ad-{name}"),
+        ("data-ad-slot", name),
+        ("data-ad-src", provider["src"]),
+        ("data-ad-margin", slot.get("margin", "200px")),
+    ]
+    if provider.get("target", "slot") != "slot":
+        attrs.append(("data-ad-target", provider["target"]))
+    for k, v in (provider.get("attrs") or {}).items():
+        # data-zone → data-ad-attr-zone（ads.js が script に data-zone として付け直す）
+        attrs.append((f"data-ad-attr-{k.removeprefix('data-')}" if k.startswith("data-") else f"data-ad-prop-{k}", str(v)))
+    style = f' style="min-height:{int(slot["min_height"])}px"' if slot.get("min_height") else ""
+    return "<section " + " ".join(f'{k}="{escape(v)}"' for k, v in attrs) + style + "></section>"
+
+
+def ad_slot_context(cfg: dict) -> dict[str, str]:
+    """{"ads_top": html, "ads_mid": html, ...} for the templates (same for every page)."""
+    providers, slots = _merged(cfg)
+    return {f"ads_{name}": slot_html(name, slot, providers) for name, slot in slots.items()}
@@ -0,0 +1,281 @@
+# nompower_pipeline/backfill.py
+"""
+Re-apply a transformation to articles already in data/articles.json.
+
+body_html is frozen when an article is stored, so changes to the affiliate
+block, the sanitizer or the prompt only reach new articles. This walks the
+archive and rewrites the stored bodies:
+
+  ads        strip the old <section class="card affiliate"> and pick again
+             (build_affiliate_section with the article's own id; the pick is
+             seeded by the id, so --dry-run shows what a real run writes)
+  sanitize   run sanitize_html again on the LLM part (the ad block is kept as is)
+  llm        regenerate the body via DeepSeek (title / id / path / date kept,
+             so URLs do not change)
+
+Transforms can be combined (--transform llm,ads) and always run in the
+order above. Derived fields (excerpt, word_count, …) are recomputed.
+
+Progress goes to data/backfill_state.json after every CHECKPOINT_EVERY
+articles, including the new bodies, so an interrupted run (Ctrl-C, CI
+timeout) resumes where it stopped without paying for the LLM twice.
+articles.json is written once, at the end; the state file is then removed.
+
+  python -m nompower_pipeline.backfill --transform ads --dry-run
+  python -m nompower_pipeline.backfill --transform sanitize,ads --workers 8 --build
+  python -m nompower_pipeline.backfill --transform llm --since 2026-02-01 --limit 20
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Callable
+import argparse
+import difflib
+import os
+import random
+import re
+import threading
+
+from nompower_pipeline import generate as g
+from nompower_pipeline.derived import AFFILIATE_MARKER, derive_article_fields
+from nompower_pipeline.sanitize import sanitize_html
+from nompower_pipeline.telemetry import flush_at_exit
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+STATE_PATH = ROOT / "data" / "backfill_state.json"
+TRANSFORMS = ("llm", "sanitize", "ads")
+CHECKPOINT_EVERY = 5
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def split_body(body_html: str) -> tuple[str, str]:
+    """(LLM part, affiliate section or "") — assemble_entry appends the section last."""
+    i = body_html.find(AFFILIATE_MARKER)
+    if i < 0:
+        return body_html, ""
+    return body_html[:i].rstrip(), body_html[i:].strip()
+
+
+def join_body(llm_html: str, affiliate_html: str) -> str:
+    # assemble_entry と同じ連結
+    if affiliate_html:
+        return llm_html.rstrip() + "\n\n" + affiliate_html + "\n"
+    return llm_html
+
+
+def transform_article(a: dict, transforms: tuple[str, ...], cfg: dict, ds=None) -> str:
+    """New body_html for one article (the article itself is not modified)."""
+    llm_html, affiliate_html = split_body(a.get("body_html", ""))
+
+    if "llm" in transforms:
+        item = {"title": a["title"], "link": a["source_url"], "summary": a.get("summary", "")}
+        raw, _ = g.deepseek_completion(cfg, item, ds=ds)
+        _, llm_html = g.parse_completion(raw, item)
+    if "sanitize" in transforms:
+        llm_html = sanitize_html(llm_html, title=a["title"]).html
+    if "ads" in transforms:
+        affiliate_html, _ = g.build_affiliate_section(
+            article_id=a["id"],
+            title=a["title"],
+            summary=a.get("summary", "") or "",
+            ads_catalog=g.load_ads_catalog(),
+            base_url=cfg["site"]["base_url"].rstrip("/"),
+            rng=random.Random(a["id"]),
+        )
+    return join_body(llm_html, affiliate_html)
+
+
+def select_articles(articles: list[dict], ids: list[str] | None = None, since: str = "", limit: int = 0) -> list[dict]:
+    out = [a for a in articles if (not ids or a["id"] in ids) and a.get("published_ts", "") >= since]
+    return out[:limit] if limit else out
+
+
+def _diff_lines(body_html: str) -> list[str]:
+    # 保存済みの本文はほぼ1行なので、タグの手前で区切って比べる
+    return [p.strip() for p in re.split(r"(?=<)", body_html) if p.strip()]
+
+
+def body_diff(a: dict, new_body: str, context: int = 1) -> str:
+    return "\n".join(
+        difflib.unified_diff(
+            _diff_lines(a.get("body_html", "")), _diff_lines(new_body),
+            f"{a['id']} (stored)", f"{a['id']} (new)", n=context, lineterm="",
+        )
+    )
+
+
+class Checkpoint:
+    """data/backfill_state.json: {job, started_utc, updated_utc, done: {id: {status, body_html?, error?}}}"""
+
+    def __init__(self, path, job: dict[str, Any], restart: bool = False) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        state = None if restart else read_json(path, default=None)
+        if state and state.get("job") != job:
+            raise RuntimeError(f"{path} belongs to another backfill ({state.get('job')}); finish it or pass --restart")
+        self.state = state or {"job": job, "started_utc": _now_iso(), "done": {}}
+        self._pending = 0
+
+    @property
+    def done(self) -> dict[str, dict]:
+        return self.state["done"]
+
+    def record(self, article_id: str, result: dict) -> None:
+        with self.lock:
+            self.done[article_id] = result
+            self._pending += 1
+            if self._pending >= CHECKPOINT_EVERY:
+                self._save()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._save()
+
+    def _save(self) -> None:
+        self.state["updated_utc"] = _now_iso()
+        tmp = self.path.with_suffix(".json.tmp")
+        write_json(tmp, self.state)
+        os.replace(tmp, self.path)
+        self._pending = 0
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def backfill(
+    transforms: tuple[str, ...],
+    *,
+    ids: list[str] | None = None,
+    since: str = "",
+    limit: int = 0,
+    workers: int = 4,
+    dry_run: bool = False,
+    restart: bool = False,
+    show: Callable[[str], None] = print,
+) -> dict[str, int]:
+    """Run the backfill; returns counts {selected, changed, unchanged, failed, resumed}."""
+    transforms = tuple(t for t in TRANSFORMS if t in transforms)
+    cfg = g.load_config()
+    articles = read_json(g.ARTICLES_PATH, default=[])
+    targets = select_articles(articles, ids=ids, since=since, limit=limit)
+    stats = {"selected": len(targets), "changed": 0, "unchanged": 0, "failed": 0, "resumed": 0}
+
+    if dry_run and "llm" in transforms:
+        # 有料なので dry-run では呼ばない（対象だけ出す）
+        for a in targets:
+            show(f"[backfill] would regenerate {a['id']}")
+        return stats
+
+    ds = None
+    if "llm" in transforms:
+        from nompower_pipeline.deepseek import DeepSeekClient
+        from nompower_pipeline.http import make_session
+
+        ds = DeepSeekClient(session=make_session(retries=0, pool_size=max(10, workers)))
+
+    job = {"transforms": list(transforms), "ids": sorted(ids or []), "since": since, "limit": limit}
+    ckpt = None if dry_run else Checkpoint(STATE_PATH, job, restart=restart)
+    todo = [a for a in targets if not ckpt or a["id"] not in ckpt.done]
+    stats["resumed"] = len(targets) - len(todo)
+    if stats["resumed"]:
+        show(f"[backfill] resuming: {stats['resumed']} already done, {len(todo)} left")
+
+    def one(a: dict) -> dict:
+        try:
+            new_body = transform_article(a, transforms, cfg, ds=ds)
+        except Exception as e:  # 1件の失敗で全体を止めない（再実行で拾う）
+            return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        if new_body == a.get("body_html", ""):
+            return {"status": "unchanged"}
+        return {"status": "changed", "body_html": new_body}
+
+    results: dict[str, dict] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backfill") as pool:
+            futs = {pool.submit(one, a): a for a in todo}
+            for n, fut in enumerate(as_completed(futs), 1):
+                a, res = futs[fut], fut.result()
+                if res["status"] == "failed":
+                    show(f"[backfill] {a['id']} failed: {res['error']}")
+                if res["status"] != "failed":  # 失敗は記録しない → 次回また試す
+                    if ckpt:
+                        ckpt.record(a["id"], res)
+                    results[a["id"]] = res
+                if n % 25 == 0:
+                    show(f"[backfill] {n}/{len(todo)}")
+    finally:
+        if ckpt:
+            ckpt.flush()
+
+    if dry_run:
+        # 終わった順ではなく記事の順に出す（何度やっても同じ出力）
+        for a in todo:
+            if results.get(a["id"], {}).get("status") == "changed":
+                show(body_diff(a, results[a["id"]]["body_html"]))
+    if ckpt:
+        results = {**ckpt.done, **results}
+    for a in targets:
+        res = results.get(a["id"])
+        if res is None:
+            stats["failed"] += 1
+        else:
+            stats[res["status"]] += 1
+
+    if dry_run or stats["failed"]:
+        if stats["failed"]:
+            show(f"[backfill] {stats['failed']} failed; articles.json not written (rerun to retry them)")
+        return stats
+
+    # まとめて1回だけ書く
+    by_id = {a["id"]: a for a in articles}
+    for aid, res in results.items():
+        if res["status"] == "changed" and aid in by_id:
+            a = by_id[aid]
+            a["body_html"] = res["body_html"]
+            a.update(derive_article_fields(a))
+    if stats["changed"]:
+        write_json(g.ARTICLES_PATH, articles)
+    ckpt.remove()
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.backfill")
+    ap.add_argument("--transform", required=True, help=f"comma list of {', '.join(TRANSFORMS)}")
+    ap.add_argument("--ids", default="", help="comma list of article ids (default: all)")
+    ap.add_argument("--since", default="", help="only articles published on/after this ISO date")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=4, help="articles processed at once")
+    ap.add_argument("--dry-run", action="store_true", help="print diffs, write nothing")
+    ap.add_argument("--restart", action="store_true", help="discard an unfinished backfill's checkpoint")
+    ap.add_argument("--build", action="store_true", help="rebuild site/ afterwards")
+    args = ap.parse_args(argv)
+    flush_at_exit("backfill")
+
+    transforms = tuple(t.strip() for t in args.transform.split(",") if t.strip())
+    unknown = [t for t in transforms if t not in TRANSFORMS]
+    if unknown:
+        ap.error(f"unknown transform(s): {', '.join(unknown)}")
+
+    stats = backfill(
+        transforms,
+        ids=[x.strip() for x in args.ids.split(",") if x.strip()] or None,
+        since=args.since,
+        limit=args.limit,
+        workers=args.workers,
+        dry_run=args.dry_run,
+        restart=args.restart,
+    )
+    print("[backfill] " + " ".join(f"{k}={v}" for k, v in stats.items()))
+    if stats["failed"]:
+        raise SystemExit(1)
+    if args.build and stats["changed"] and not args.dry_run:
+        g.build_site(g.load_config(), read_json(g.ARTICLES_PATH, default=[]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# nompower_pipeline/candidate_queue.py
+"""
+Persistent candidate queue (data/candidates.sqlite).
+
+A cheap, frequent poll job fills it; the generation job drains it:
+
+  python -m nompower_pipeline poll        fetch feeds → insert new entries
+  python -m nompower_pipeline.generate    pick stage takes the best queued item
+
+Rows are keyed by the normalized permalink, so an entry seen by many polls is
+inserted once (INSERT OR IGNORE) and its filtering result is kept:
+
+  queued     usable, waiting for generation (ordered by priority)
+  generated  an article was written from it
+  skipped    processed already / too similar to an existing article
+  blocked    blocked keyword
+  expired    queued longer than the TTL (news goes stale)
+
+priority = published time (newer first) + an optional per-feed boost in
+config.json `queue.feed_boost_hours`. Rows stay for PURGE_DAYS after
+discovery so dedup survives while an entry is still in the feed.
+
+The sqlite file is a local working copy. What CI commits is
+data/candidates.jsonl (export_path): one row per line, oldest discovery
+first, rewritten only when a row changed, so a poll that found nothing new
+commits nothing and one that did adds a few lines instead of a new binary
+blob. connect() rebuilds a missing sqlite file from it.
+"""
+from __future__ import annotations
+
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator
+import json
+import sqlite3
+import time
+
+from nompower_pipeline.candidates import (
+    Fetch,
+    fetch_feeds,
+    previous_title_tokens,
+    reject_reason,
+    with_image_fields,
+)
+from nompower_pipeline.derived import iso_to_epoch
+from nompower_pipeline.util import ROOT, normalize_url
+
+QUEUE_DB_PATH = ROOT / "data" / "candidates.sqlite"
+SCHEMA_VERSION = 1
+
+TTL_HOURS = 48
+PURGE_DAYS = 30
+
+STATUSES = ("queued", "generated", "skipped", "blocked", "expired")
+
+COLUMNS = ("url", "title", "rss", "entry", "status", "reason", "priority", "published", "discovered", "expires", "updated")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    url         TEXT PRIMARY KEY,
+    title       TEXT NOT NULL,
+    rss         TEXT NOT NULL DEFAULT '',
+    entry       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    reason      TEXT NOT NULL DEFAULT '',
+    priority    REAL NOT NULL DEFAULT 0,
+    published   INTEGER NOT NULL DEFAULT 0,
+    discovered  INTEGER NOT NULL,
+    expires     INTEGER NOT NULL,
+    updated     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS candidates_next ON candidates (status, priority DESC);
+"""
+
+
+def export_path(path: Path) -> Path:
+    """data/candidates.sqlite → data/candidates.jsonl (the form that is committed)."""
+    return path.with_suffix(".jsonl")
+
+
+def connect(path: Path = QUEUE_DB_PATH) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fresh = not path.exists()
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    if fresh:
+        # CI は毎回 checkout し直す：commit 済みの jsonl から作り直す
+        load_jsonl(conn, export_path(path))
+    return conn
+
+
+def load_jsonl(conn: sqlite3.Connection, src: Path) -> int:
+    if not src.exists():
+        return 0
+    rows = []
+    for line in src.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            r = json.loads(line)
+            r["entry"] = json.dumps(r["entry"], ensure_ascii=False)
+            rows.append(tuple(r[c] for c in COLUMNS))
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO candidates ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            rows,
+        )
+    return len(rows)
+
+
+def save_jsonl(conn: sqlite3.Connection, dst: Path) -> bool:
+    """Write every row to dst; False (file untouched) when nothing changed."""
+    lines = []
+    for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM candidates ORDER BY discovered, url"):
+        r = dict(row)
+        r["entry"] = json.loads(r["entry"])
+        lines.append(json.dumps(r, ensure_ascii=False, sort_keys=True))
+    text = "".join(line + "\n" for line in lines)
+    if dst.exists() and dst.read_text(encoding="utf-8") == text:
+        return False
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_text(text, encoding="utf-8")
+    return True
+
+
+def _queue_cfg(cfg: dict) -> dict:
+    return cfg.get("queue", {}) or {}
+
+
+def _published(e: dict) -> int:
+    try:
+        return iso_to_epoch(e.get("published") or "") if e.get("published") else 0
+    except ValueError:
+        return 0
+
+
+def expire(conn: sqlite3.Connection, now: int | None = None) -> int:
+    now = int(now or time.time())
+    cur = conn.execute(
+        "UPDATE candidates SET status = 'expired', updated = ? WHERE status = 'queued' AND expires < ?",
+        (now, now),
+    )
+    conn.execute("DELETE FROM candidates WHERE discovered < ?", (now - PURGE_DAYS * 86400,))
+    return cur.rowcount
+
+
+def poll(
+    conn: sqlite3.Connection,
+    cfg: dict,
+    processed: set[str],
+    articles: list[dict],
+    fetch: Fetch | None = None,
+    now: int | None = None,
+) -> dict[str, int]:
+    """Fetch every feed and insert unseen entries with their filter result. Returns counts."""
+    now = int(now or time.time())
+    qcfg = _queue_cfg(cfg)
+    ttl_s = int(float(qcfg.get("ttl_hours", TTL_HOURS)) * 3600)
+    boost_h = qcfg.get("feed_boost_hours", {}) or {}
+    blocked_kw = cfg["safety"]["blocked_keywords"]
+    prev_tok = previous_title_tokens(articles)
+
+    feeds = fetch_feeds(cfg["feeds"]["reddit_rss"], fetch=fetch)
+    stats = {"seen": 0, "inserted": 0, "queued": 0, "expired": expire(conn, now)}
+
+    rows = []
+    for rss, entries in feeds.items():
+        for e in entries:
+            stats["seen"] += 1
+            url = normalize_url(e.get("link", ""))
+            if not url:
+                continue
+            reason = reject_reason(e, processed, blocked_kw, prev_tok)
+            status = "blocked" if reason == "blocked" else ("skipped" if reason else "queued")
+            published = _published(e)
+            priority = (published or now) + float(boost_h.get(rss, 0)) * 3600
+            rows.append(
+                (url, e.get("title", ""), rss, json.dumps(e, ensure_ascii=False), status, reason,
+                 priority, published, now, now + ttl_s, now)
+            )
+
+    with conn:
+        for row in rows:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO candidates "
+                "(url, title, rss, entry, status, reason, priority, published, discovered, expires, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            if cur.rowcount:
+                stats["inserted"] += 1
+                stats["queued"] += row[4] == "queued"
+    return stats
+
+
+def _queued(conn: sqlite3.Connection) -> Iterator[sqlite3.Row]:
+    yield from conn.execute("SELECT url, entry FROM candidates WHERE status = 'queued' ORDER BY priority DESC, discovered")
+
+
+def take(conn: sqlite3.Connection, cfg: dict, processed: set[str], articles: list[dict], now: int | None = None) -> dict | None:
+    """
+    Best queued candidate, re-checked against the current articles (one that
+    became too similar since it was queued is marked skipped). The row stays
+    queued until mark(..., "generated").
+    """
+    expire(conn, now)
+    blocked_kw = cfg["safety"]["blocked_keywords"]
+    prev_tok = previous_title_tokens(articles)
+    picked = None
+    stale: list[tuple[str, str]] = []
+    for row in _queued(conn):
+        e = json.loads(row["entry"])
+        reason = reject_reason(e, processed, blocked_kw, prev_tok)
+        if reason:
+            stale.append((reason, row["url"]))
+            continue
+        picked = with_image_fields(e)
+        break
+    with conn:
+        for reason, url in stale:
+            mark(conn, url, "blocked" if reason == "blocked" else "skipped", reason, commit=False)
+    return picked
+
+
+def mark(conn: sqlite3.Connection, link: str, status: str, reason: str = "", commit: bool = True) -> None:
+    if status not in STATUSES:
+        raise ValueError(f"unknown status {status!r}")
+    conn.execute(
+        "UPDATE candidates SET status = ?, reason = ?, updated = ? WHERE url = ?",
+        (status, reason, int(time.time()), normalize_url(link)),
+    )
+    if commit:
+        conn.commit()
+
+
+def counts(conn: sqlite3.Connection) -> dict[str, int]:
+    return {r[0]: r[1] for r in conn.execute("SELECT status, COUNT(*) FROM candidates GROUP BY status")}
+
+
+def take_or_poll(
+    path: Path,
+    cfg: dict,
+    processed: set[str],
+    articles: list[dict],
+    fetch: Fetch | None = None,
+) -> dict | None:
+    """Generation side: drain the queue; poll once first if nothing is queued (single-job setups)."""
+    with closing(connect(path)) as conn:
+        cand = take(conn, cfg, processed, articles)
+        if cand is None:
+            st = poll(conn, cfg, processed, articles, fetch=fetch)
+            print(f"[queue] empty → polled seen={st['seen']} inserted={st['inserted']} queued={st['queued']}")
+            cand = take(conn, cfg, processed, articles)
+        save_jsonl(conn, export_path(path))
+        return cand
+
+
+def mark_generated(path: Path, link: str) -> None:
+    with closing(connect(path)) as conn:
+        mark(conn, link, "generated")
+        save_jsonl(conn, export_path(path))
@@ -0,0 +1,96 @@
+# nompower_pipeline/candidates.py
+"""
+Candidate selection: feed entries → the one Reddit item to write about.
+
+Kept free of requests / jinja2 so `python -m nompower_pipeline select` starts
+fast; the network fetcher is imported only when no entries are passed in.
+
+Stage files (used by the subcommand CLI):
+  data/feed_entries.json   {rss_url: [entry, ...]}   written by `fetch`
+  data/candidate.json      the picked entry           written by `select`
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from nompower_pipeline.instrument import span
+from nompower_pipeline.util import ROOT, jaccard, normalize_url, simple_tokens
+
+ENTRIES_PATH = ROOT / "data" / "feed_entries.json"
+CANDIDATE_PATH = ROOT / "data" / "candidate.json"
+
+Fetch = Callable[[str], list[dict]]
+
+
+def is_blocked(title: str, blocked_kw: list[str]) -> bool:
+    t = (title or "").lower()
+    for kw in blocked_kw:
+        if kw.lower() in t:
+            return True
+    return False
+
+
+def network_fetch() -> Fetch:
+    from nompower_pipeline.reddit import fetch_rss_entries
+    return fetch_rss_entries
+
+
+def fetch_feeds(urls: list[str], fetch: Fetch | None = None) -> dict[str, list[dict]]:
+    fetch = fetch or network_fetch()
+    out: dict[str, list[dict]] = {}
+    for rss in urls:
+        with span("fetch_feeds"):
+            out[rss] = fetch(rss)
+    return out
+
+
+def stored_fetch(entries: dict[str, list[dict]]) -> Fetch:
+    """fetch() backed by a saved feed_entries.json; feeds added to config since then are fetched live."""
+    def _fetch(rss: str, max_items: int = 25) -> list[dict]:
+        if rss in entries:
+            return [dict(e) for e in entries[rss][:max_items]]
+        return network_fetch()(rss, max_items=max_items)
+    return _fetch
+
+
+def previous_title_tokens(articles: list[dict]) -> list[set[str]]:
+    return [set(a["title_tokens"]) if a.get("title_tokens") is not None else simple_tokens(a.get("title", ""))
+            for a in articles if a.get("title")]
+
+
+def reject_reason(e: dict, processed: set[str], blocked_kw: list[str], prev_tok: list[set[str]]) -> str:
+    """"" if the entry is usable, else why not: nolink / processed / blocked / similar."""
+    link = normalize_url(e["link"])
+    if not link:
+        return "nolink"
+    if link in processed:
+        return "processed"
+    if is_blocked(e["title"], blocked_kw):
+        return "blocked"
+    tok = simple_tokens(e["title"])
+    if any(jaccard(tok, pt) >= 0.78 for pt in prev_tok):
+        return "similar"
+    return ""
+
+
+def with_image_fields(e: dict) -> dict:
+    # ✅ RSSから拾った安全な画像だけ使う（i.redd.itのみ）
+    e["image_url"] = e.get("hero_image", "") or ""
+    e["image_kind"] = e.get("hero_image_kind", "none") or "none"
+    return e
+
+
+def pick_candidate(cfg: dict, processed: set[str], articles: list[dict], fetch: Fetch | None = None) -> dict | None:
+    """fetch(rss_url) -> entries; multisite passes a cached fetcher so shared feeds are fetched once."""
+    fetch = fetch or network_fetch()
+    blocked_kw = cfg["safety"]["blocked_keywords"]
+    prev_tok = previous_title_tokens(articles)
+
+    for rss in cfg["feeds"]["reddit_rss"]:
+        with span("fetch_feeds"):
+            entries = fetch(rss)
+        for e in entries:
+            if not reject_reason(e, processed, blocked_kw, prev_tok):
+                return with_image_fields(e)
+
+    return None
@@ -0,0 +1,166 @@
+# nompower_pipeline/critical_css.py
+"""
+Critical CSS: the subset of style.css needed to paint the top of a page.
+
+build_site renders sample pages per template, collects the tags / classes
+/ ids that appear before the fold (the `<!-- fold -->` marker in the
+template, else the first FOLD_BYTES of HTML) and keeps only the rules
+whose selectors can match those. A template with conditional blocks above
+the fold gets one sample per branch and the union of what they use, so
+one inline subset serves every page of it. The result is inlined in <head>; the full
+stylesheet is loaded without blocking render (see base.html).
+
+Kept: :root / * / html / body rules, @media blocks with their matching
+rules, @keyframes used by a kept rule, @font-face. Dropped: rules for
+elements below the fold or created by JS, and :hover/:focus-style states.
+This is a selector-level approximation (no layout), which is enough for
+the handful of templates here.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+import re
+
+FOLD_MARKER = "<!-- fold -->"
+FOLD_BYTES = 14 * 1024  # 初回 TCP ウィンドウ程度
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_WS_RE = re.compile(r"\s+")
+_PUNCT_WS_RE = re.compile(r"\s*([{};,])\s*")
+_PSEUDO_RE = re.compile(r"::?[a-zA-Z-]+(\([^)]*\))?")
+_ATTR_SEL_RE = re.compile(r"\[[^\]]*\]")
+_COMBINATOR_RE = re.compile(r"[\s>+~]+")
+_TAG_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9-]*|^\*")
+_CLASS_RE = re.compile(r"\.([\w-]+)")
+_ID_RE = re.compile(r"#([\w-]+)")
+_STATE_RE = re.compile(r":(hover|focus|focus-visible|focus-within|active|visited)\b")
+_ANIM_RE = re.compile(r"animation(?:-name)?\s*:([^;}]*)")
+
+GROUP_AT_RULES = ("@media", "@supports")
+KEEP_AT_RULES = ("@font-face", "@charset", "@import")
+
+
+@dataclass
+class Rule:
+    prelude: str
+    body: str = ""
+    children: list["Rule"] = field(default_factory=list)
+
+    @property
+    def at(self) -> str:
+        return self.prelude.split(None, 1)[0].lower() if self.prelude.startswith("@") else ""
+
+
+def parse_css(css: str) -> list[Rule]:
+    css = _COMMENT_RE.sub("", css)
+    rules: list[Rule] = []
+    i, n = 0, len(css)
+    while i < n:
+        brace = css.find("{", i)
+        semi = css.find(";", i)
+        if brace < 0:
+            break
+        if 0 <= semi < brace and css[i:semi].strip().startswith("@"):
+            rules.append(Rule(css[i:semi].strip()))  # @import ...; など
+            i = semi + 1
+            continue
+        prelude = css[i:brace].strip()
+        depth, j = 1, brace + 1
+        while j < n and depth:
+            if css[j] == "{":
+                depth += 1
+            elif css[j] == "}":
+                depth -= 1
+            j += 1
+        body = css[brace + 1:j - 1]
+        rule = Rule(prelude, body)
+        if rule.at in GROUP_AT_RULES:
+            rule.children = parse_css(body)
+            rule.body = ""
+        rules.append(rule)
+        i = j
+    return rules
+
+
+class _UsedCollector(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.tags: set[str] = set()
+        self.classes: set[str] = set()
+        self.ids: set[str] = set()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.tags.add(tag.lower())
+        for k, v in attrs:
+            if k == "class" and v:
+                self.classes.update(v.split())
+            elif k == "id" and v:
+                self.ids.add(v)
+
+
+def used_selectors(*pages: str) -> _UsedCollector:
+    """Tags / classes / ids present above the fold of any of the rendered pages."""
+    c = _UsedCollector()
+    for html in pages:
+        fold = html.find(FOLD_MARKER)
+        c.feed(html[:fold] if fold >= 0 else html[:FOLD_BYTES])
+        c.reset()
+    c.tags.update(("html", "body"))
+    return c
+
+
+def selector_may_match(selector: str, used: _UsedCollector) -> bool:
+    if _STATE_RE.search(selector):
+        return False
+    s = _ATTR_SEL_RE.sub("", _PSEUDO_RE.sub("", selector)).strip()
+    for compound in _COMBINATOR_RE.split(s):
+        if not compound:
+            continue
+        m = _TAG_RE.match(compound)
+        if m and m.group(0) != "*" and m.group(0).lower() not in used.tags:
+            return False
+        if any(c not in used.classes for c in _CLASS_RE.findall(compound)):
+            return False
+        if any(i not in used.ids for i in _ID_RE.findall(compound)):
+            return False
+    return True
+
+
+def _minify(s: str) -> str:
+    return _PUNCT_WS_RE.sub(r"\1", _WS_RE.sub(" ", s)).strip()
+
+
+def _select(rules: list[Rule], used: _UsedCollector, keep: list[str], animations: set[str]) -> None:
+    for r in rules:
+        if r.at in GROUP_AT_RULES:
+            inner: list[str] = []
+            _select(r.children, used, inner, animations)
+            if inner:
+                keep.append(f"{_minify(r.prelude)}{{{''.join(inner)}}}")
+        elif r.at == "@keyframes" or r.at.endswith("keyframes"):
+            continue  # 使われていれば後で足す
+        elif r.at in KEEP_AT_RULES:
+            keep.append(f"{_minify(r.prelude)}{{{_minify(r.body)}}}" if r.body else _minify(r.prelude) + ";")
+        elif r.at:
+            continue
+        else:
+            sels = [s.strip() for s in r.prelude.split(",") if s.strip()]
+            hit = [s for s in sels if selector_may_match(s, used)]
+            if hit:
+                keep.append(f"{','.join(_minify(s) for s in hit)}{{{_minify(r.body).rstrip(';')}}}")
+                for m in _ANIM_RE.finditer(r.body):
+                    animations.update(m.group(1).replace(",", " ").split())
+
+
+def critical_css(css: str, *pages: str) -> str:
+    """Minified critical subset of css for the given page(s) (union of what they use)."""
+    rules = parse_css(css)
+    used = used_selectors(*pages)
+    keep: list[str] = []
+    animations: set[str] = set()
+    _select(rules, used, keep, animations)
+    for r in rules:
+        if r.at.endswith("keyframes") and r.prelude.split(None, 1)[-1].strip() in animations:
+            keep.append(f"{_minify(r.prelude)}{{{_minify(r.body)}}}")
+    return "".join(keep)
@@ -1,16 +1,58 @@
 from __future__ import annotations
+import json
 import os
+import threading
+import time
 import requests
 from typing import Any
+from urllib.parse import urlparse
+
+from .endpoints import DEEPSEEK_BASE, deepseek_base  # noqa: F401  (DEEPSEEK_BASE kept for importers)
+from .http import make_session
+from .telemetry import HTTP_METRICS
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Cancelled(Exception):
+    """chat_full(cancel=...) stopped reading because cancel was set; the connection is closed."""
 
-DEEPSEEK_BASE = "https://api.deepseek.com"
 
 class DeepSeekClient:
-    def __init__(self, api_key: str | None = None, base_url: str = DEEPSEEK_BASE) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        max_retries: int = 2,
+        backoff_s: float = 2.0,
+        session: requests.Session | None = None,
+    ) -> None:
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY", "")
-        self.base_url = base_url.rstrip("/")
+        # DEEPSEEK_BASE_URL でローカルのフェイクサーバ等に向けられる
+        self.base_url = (base_url or deepseek_base()).rstrip("/")
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_s = float(backoff_s)
+        self.retries = 0  # 累計リトライ回数（負荷試験の集計用）
+        # 同じ client で複数回呼ぶなら接続を使い回す（リトライはこのクラス側でやるので retries=0）
+        self.session = session or make_session(retries=0)
 
     def chat(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.85, max_tokens: int = 2200) -> str:
+        return self.chat_full(model, messages, temperature=temperature, max_tokens=max_tokens)[0]
+
+    def chat_full(
+        self,
+        model: str,
+        messages: list[dict[str, Any]],
+        temperature: float = 0.85,
+        max_tokens: int = 2200,
+        cancel: threading.Event | None = None,
+    ) -> tuple[str, dict[str, int]]:
+        """
+        (content, usage). usage includes prompt_cache_hit_tokens / prompt_cache_miss_tokens.
+        With cancel, the completion is streamed (SSE) and abandoned as soon as
+        cancel is set: the connection is closed, which also stops generation
+        on the server, and Cancelled is raised.
+        """
         if not self.api_key:
             raise RuntimeError("Missing DEEPSEEK_API_KEY (set GitHub Secrets: DEEPSEEK_API_KEY)")
 
@@ -25,7 +67,62 @@ class DeepSeekClient:
             "temperature": float(temperature),
             "max_tokens": int(max_tokens)
         }
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
+        if cancel is not None:
+            # 途中で止められるように SSE で受ける（keep-alive / トークンごとに cancel を見る）
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+
+        attempt = 0
+        while True:
+            try:
+                r = self.session.post(url, headers=headers, json=payload, timeout=60, stream=cancel is not None)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                wait = self.backoff_s * (2 ** attempt)
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    break
+                wait = _retry_after(r) or self.backoff_s * (2 ** attempt)
+                r.close()
+
+            attempt += 1
+            self.retries += 1
+            HTTP_METRICS.retry(urlparse(url).netloc)
+            print(f"[deepseek] retry {attempt}/{self.max_retries} in {wait:.1f}s")
+            time.sleep(wait)
+
+        if cancel is not None:
+            with r:
+                r.raise_for_status()
+                return _read_stream(r, cancel)
         r.raise_for_status()
         data = r.json()
-        return (data["choices"][0]["message"]["content"] or "").strip()
+        usage = {k: int(v) for k, v in (data.get("usage") or {}).items() if isinstance(v, (int, float))}
+        return (data["choices"][0]["message"]["content"] or "").strip(), usage
+
+
+def _read_stream(r: requests.Response, cancel: threading.Event) -> tuple[str, dict[str, int]]:
+    parts: list[str] = []
+    usage: dict[str, int] = {}
+    for line in r.iter_lines():
+        if cancel.is_set():
+            raise Cancelled("completion abandoned")  # 呼び出し側の with が接続を閉じる
+        if not line.startswith(b"data:"):
+            continue  # 空行 / ": keep-alive"
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        chunk = json.loads(data)
+        for c in chunk.get("choices") or []:
+            parts.append((c.get("delta") or {}).get("content") or "")
+        if chunk.get("usage"):
+            usage = {k: int(v) for k, v in chunk["usage"].items() if isinstance(v, (int, float))}
+    return "".join(parts).strip(), usage
+
+
+def _retry_after(r: requests.Response) -> float:
+    try:
+        return min(60.0, max(0.0, float(r.headers.get("Retry-After", ""))))
+    except ValueError:
+        return 0.0
@@ -0,0 +1,117 @@
+# nompower_pipeline/derived.py
+"""
+Fields derived from an article once at ingestion time (stored in data/articles.json):
+
+  excerpt, word_count, reading_minutes, title_tokens, genre, published_epoch
+
+Builds read these instead of re-stripping body_html / re-tokenizing titles /
+re-parsing timestamps for every page. Existing data:
+
+  python -m nompower_pipeline.derived --backfill
+"""
+from __future__ import annotations
+
+from datetime import datetime
+import argparse
+import math
+
+from .sanitize import sanitize_html
+from .util import ROOT, read_json, simple_tokens, write_json
+
+ARTICLES_PATH = ROOT / "data" / "articles.json"
+
+# 計算方法を変えたら上げる（古い値は backfill / ensure_derived で作り直される）
+DERIVED_VERSION = 1
+DERIVED_KEYS = ("excerpt", "word_count", "reading_minutes", "title_tokens", "genre", "published_epoch")
+
+EXCERPT_CHARS = 240
+WORDS_PER_MINUTE = 220
+
+# 本文末尾に足しているアフィリエイト枠（本文扱いしない）
+AFFILIATE_MARKER = '<section class="card affiliate">'
+
+
+def classify_genre(title: str, summary: str) -> str:
+    """
+    Phase1: simple keyword rules (fast + stable).
+    Fallback: 'general'
+    """
+    text = f"{title} {summary}".lower()
+
+    rules = [
+        ("health", ["health", "hair", "sleep", "diet", "doctor", "study says", "medical", "wellness"]),
+        ("beauty", ["skincare", "beauty", "cosmetic", "laser", "dermatology", "makeup"]),
+        ("finance", ["stock", "crypto", "bitcoin", "bank", "interest rate", "loan", "tax", "investment"]),
+        ("tech", ["ai", "openai", "model", "gpu", "software", "bug", "security", "iphone", "android"]),
+        ("travel", ["travel", "flight", "hotel", "trip", "tourism", "airport"]),
+        ("study", ["learn", "exam", "toeic", "eiken", "study", "university"]),
+        ("vpn", ["vpn", "privacy", "proxy", "geoblock"]),
+        ("tools", ["tool", "formatter", "converter", "generator", "app", "extension"])
+    ]
+
+    for genre, kws in rules:
+        if any(k in text for k in kws):
+            return genre
+
+    return "general"
+
+
+def iso_to_epoch(iso: str) -> int:
+    return int(datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp())
+
+
+def derive_article_fields(a: dict) -> dict:
+    title = a.get("title", "") or ""
+    summary = (a.get("summary", "") or "").strip()
+    body = (a.get("body_html", "") or "").split(AFFILIATE_MARKER, 1)[0]
+
+    body_text = sanitize_html(body)
+    excerpt = sanitize_html(summary).text if summary else body_text.text
+    words = body_text.word_count
+
+    published = a.get("published_ts", "") or ""
+    try:
+        epoch = iso_to_epoch(published) if published else 0
+    except ValueError:
+        epoch = 0
+
+    return {
+        "excerpt": excerpt[:EXCERPT_CHARS],
+        "word_count": words,
+        "reading_minutes": max(1, math.ceil(words / WORDS_PER_MINUTE)) if words else 0,
+        "title_tokens": sorted(simple_tokens(title)),
+        "genre": classify_genre(title, summary),
+        "published_epoch": epoch,
+        "derived_v": DERIVED_VERSION,
+    }
+
+
+def has_derived(a: dict) -> bool:
+    return a.get("derived_v") == DERIVED_VERSION
+
+
+def ensure_derived(articles: list[dict], force: bool = False) -> int:
+    """Fill in missing/outdated derived fields in place. Returns how many were updated."""
+    n = 0
+    for a in articles:
+        if force or not has_derived(a):
+            a.update(derive_article_fields(a))
+            n += 1
+    return n
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.derived")
+    ap.add_argument("--backfill", action="store_true", help="write derived fields into data/articles.json")
+    ap.add_argument("--force", action="store_true", help="recompute even if already up to date")
+    args = ap.parse_args(argv)
+
+    articles = read_json(ARTICLES_PATH, default=[])
+    n = ensure_derived(articles, force=args.force)
+    if args.backfill and n:
+        write_json(ARTICLES_PATH, articles)
+    print(f"[derived] articles={len(articles)} updated={n} written={bool(args.backfill and n)}")
+
+
+if __name__ == "__main__":
+    main()
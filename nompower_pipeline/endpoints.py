@@ -0,0 +1,47 @@
+# nompower_pipeline/endpoints.py
+"""
+Base-URL overrides for every external host the pipeline talks to.
+
+Stored data (articles.json, feed URLs in config.json) always keeps the real
+URLs; only the outgoing request is rewritten. Point everything at the local
+fake server with e.g.:
+
+  REDDIT_BASE_URL=http://127.0.0.1:8808
+  REDDIT_IMAGE_BASE_URL=http://127.0.0.1:8808
+  DEEPSEEK_BASE_URL=http://127.0.0.1:8808
+  MASTODON_BASE_URL=http://127.0.0.1:8808
+  GITHUB_API_URL=http://127.0.0.1:8808
+"""
+from __future__ import annotations
+
+import os
+
+DEEPSEEK_BASE = "https://api.deepseek.com"
+GITHUB_API_BASE = "https://api.github.com"
+
+# env var -> origins it replaces
+ORIGIN_OVERRIDES: dict[str, tuple[str, ...]] = {
+    "REDDIT_BASE_URL": ("https://www.reddit.com", "https://reddit.com", "https://old.reddit.com"),
+    "REDDIT_IMAGE_BASE_URL": ("https://i.redd.it", "https://preview.redd.it", "https://external-preview.redd.it"),
+}
+
+
+def rebase_url(url: str) -> str:
+    """Rewrite url's origin if an override env var is set (read at call time)."""
+    for env, origins in ORIGIN_OVERRIDES.items():
+        base = os.getenv(env, "").strip().rstrip("/")
+        if not base:
+            continue
+        for origin in origins:
+            if url == origin or url.startswith(origin + "/"):
+                return base + url[len(origin):]
+    return url
+
+
+def deepseek_base() -> str:
+    return (os.getenv("DEEPSEEK_BASE_URL", "").strip() or DEEPSEEK_BASE).rstrip("/")
+
+
+def github_api_base() -> str:
+    # GitHub Actions sets GITHUB_API_URL itself (GHES uses a different host)
+    return (os.getenv("GITHUB_API_URL", "").strip() or GITHUB_API_BASE).rstrip("/")
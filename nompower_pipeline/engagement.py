@@ -0,0 +1,260 @@
+# nompower_pipeline/engagement.py
+"""
+Reddit engagement (score / comments) for stored articles, and the trending
+ranking built from it.
+
+refresh_engagement() asks Reddit's /by_id endpoint for up to BY_ID_MAX
+posts per request (reddit.fetch_by_id) and stores on each article
+
+  score, comments, subreddit, engagement_utc
+
+Only articles younger than max_age_days whose last refresh is older than
+min_interval_h are asked for; a post Reddit no longer returns keeps its
+last numbers (and is asked again after the interval). The same answers
+say which posts are gone: given the link_health.json dict, it records
+them there (linkcheck.record_by_id) and sets / clears source_dead
+(linkcheck.apply_flags), and linkcheck skips those sources until their
+TTL runs out.
+
+Trending ranking (the "Ranking" block; index.html says "score + 2×comments"):
+
+  hot = log10(max(1, score + 2 * comments)) + published_epoch / 45000
+
+A day of age weighs as much as ~83x the engagement (10 ** (86400 / 45000)).
+The age term is absolute, not relative to "now", so a hot value changes
+only when the article's engagement does. That allows an incremental top-k:
+data/trending.json keeps a min-heap of the k best (hot, id) pairs plus
+`through_epoch`, the newest published_epoch seen. A build pushes only the
+articles published after through_epoch, a refresh pushes the articles whose
+numbers changed, and neither re-sorts the archive. The heap is rebuilt with
+heapq.nlargest (O(n log k)) when a member drops, disappears or k changes.
+
+config.json (optional):
+
+  "engagement": {"max_age_days": 30, "min_interval_h": 6}
+
+  python -m nompower_pipeline.engagement [--limit N] [--dry-run]
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+import argparse
+import heapq
+import math
+
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+ARTICLES_PATH = ROOT / "data" / "articles.json"
+CONFIG_PATH = ROOT / "nompower_pipeline" / "config.json"
+TRENDING_PATH = ROOT / "data" / "trending.json"
+
+TRENDING_VERSION = 1
+TRENDING_K = 10
+HOT_DECAY_S = 45000
+BY_ID_MAX = 100  # reddit.BY_ID_MAX と同じ（requests を import しないため）
+
+DEFAULTS = {"max_age_days": 30, "min_interval_h": 6}
+
+# fullnames → {fullname: {"score", "comments", "subreddit", "removed"}}（テストではフェイクサーバ/固定データ）
+ByIdFetch = Callable[[list[str]], dict[str, dict]]
+
+
+def hot_score(a: dict) -> float:
+    engagement = int(a.get("score") or 0) + 2 * int(a.get("comments") or 0)
+    return math.log10(max(1, engagement)) + int(a.get("published_epoch") or 0) / HOT_DECAY_S
+
+
+def _now_epoch() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds")
+
+
+def due_articles(articles: list[dict], cfg: dict, now: int | None = None) -> list[dict]:
+    """Articles with a Reddit post whose numbers are worth re-asking for."""
+    from nompower_pipeline.reddit import post_fullname
+
+    ec = {**DEFAULTS, **(cfg.get("engagement") or {})}
+    now = now or _now_epoch()
+    oldest = now - int(ec["max_age_days"] * 86400)
+    fresh_after = _iso(now - int(ec["min_interval_h"] * 3600))
+    return [
+        a for a in articles
+        if post_fullname(a.get("source_url", ""))
+        and int(a.get("published_epoch") or 0) >= oldest
+        and (a.get("engagement_utc") or "") < fresh_after
+    ]
+
+
+def refresh_engagement(
+    articles: list[dict],
+    cfg: dict,
+    fetch: ByIdFetch | None = None,
+    now: int | None = None,
+    limit: int = 0,
+    health: dict[str, dict] | None = None,
+) -> tuple[list[dict], dict[str, int]]:
+    """
+    Update due articles in place. Returns (changed articles, stats).
+    health: link_health.json dict to record the answers into; source_dead
+    is then updated too (stats["flag_changes"]).
+    """
+    from nompower_pipeline.linkcheck import apply_flags, linkcheck_config, record_by_id
+    from nompower_pipeline.reddit import fetch_by_id, post_fullname
+
+    fetch = fetch or fetch_by_id
+    now = now or _now_epoch()
+    due = due_articles(articles, cfg, now=now)
+    # 新しい記事ほど数字が動くので先に
+    due.sort(key=lambda a: int(a.get("published_epoch") or 0), reverse=True)
+    if limit:
+        due = due[:limit]
+
+    changed: list[dict] = []
+    stats = {"due": len(due), "requests": 0, "returned": 0, "changed": 0, "failed_batches": 0}
+    stamp = _iso(now)
+    for i in range(0, len(due), BY_ID_MAX):
+        batch = due[i:i + BY_ID_MAX]
+        try:
+            got = fetch([post_fullname(a["source_url"]) for a in batch])
+        except Exception as e:  # noqa: BLE001  1バッチ失敗しても残りは続ける
+            print(f"[engagement] batch {i // BY_ID_MAX + 1} failed: {e}")
+            stats["failed_batches"] += 1
+            continue
+        stats["requests"] += 1
+        stats["returned"] += len(got)
+        if health is not None:
+            record_by_id(health, [a["source_url"] for a in batch], got, now)
+        for a in batch:
+            a["engagement_utc"] = stamp  # 返ってこない（削除済み）投稿も次の間隔までは聞かない
+            d = got.get(post_fullname(a["source_url"]))
+            if d is None:
+                continue
+            if (a.get("score"), a.get("comments")) != (d["score"], d["comments"]):
+                changed.append(a)
+            a["score"], a["comments"] = d["score"], d["comments"]
+            a["subreddit"] = d["subreddit"] or a.get("subreddit", "")
+    stats["changed"] = len(changed)
+    if health is not None:
+        stats["flag_changes"] = apply_flags(articles, health, int(linkcheck_config(cfg)["dead_after"]))
+    return changed, stats
+
+
+class Trending:
+    """Top-k (hot, id) as a min-heap; heap[0] is the weakest member."""
+
+    def __init__(self, k: int = TRENDING_K, heap: list[list] | None = None, through_epoch: int = 0) -> None:
+        self.k = k
+        self.heap: list[tuple[float, str]] = [(float(h), str(i)) for h, i in heap or []]
+        heapq.heapify(self.heap)
+        self.through_epoch = through_epoch
+
+    @classmethod
+    def load(cls, path: Path | None = None, k: int = TRENDING_K) -> "Trending | None":
+        st = read_json(path or TRENDING_PATH, default=None)
+        if not st or st.get("v") != TRENDING_VERSION or st.get("k") != k:
+            return None
+        return cls(k, st.get("heap"), int(st.get("through_epoch") or 0))
+
+    def save(self, path: Path | None = None) -> None:
+        write_json(path or TRENDING_PATH, {
+            "v": TRENDING_VERSION,
+            "k": self.k,
+            "through_epoch": self.through_epoch,
+            "heap": [[round(h, 6), i] for h, i in self.heap],
+        })
+
+    @classmethod
+    def build(cls, articles: list[dict], k: int = TRENDING_K) -> "Trending":
+        best = heapq.nlargest(k, ((hot_score(a), a["id"]) for a in articles if a.get("id")))
+        newest = max((int(a.get("published_epoch") or 0) for a in articles), default=0)
+        return cls(k, [list(x) for x in best], newest)
+
+    def push(self, a: dict) -> bool:
+        """Offer one article with a new or changed hot value. False = heap must be rebuilt."""
+        h, aid = hot_score(a), a["id"]
+        self.through_epoch = max(self.through_epoch, int(a.get("published_epoch") or 0))
+        for n, (old, mid) in enumerate(self.heap):
+            if mid == aid:
+                if h < round(old, 6) - 1e-9:
+                    return False  # メンバーが下がった：外の記事が上に来るかもしれない
+                self.heap[n] = (h, aid)
+                heapq.heapify(self.heap)
+                return True
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (h, aid))
+        elif h > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (h, aid))
+        return True
+
+    def valid_for(self, by_id: dict[str, dict], changed: set[str] = frozenset()) -> bool:
+        """Every member still exists with the hot value it was stored with (changed ones are pushed instead)."""
+        return all(i in by_id and (i in changed or abs(hot_score(by_id[i]) - h) < 1e-6) for h, i in self.heap)
+
+    def ids(self) -> list[str]:
+        return [i for _, i in sorted(self.heap, reverse=True)]
+
+
+def update_trending(
+    articles: list[dict],
+    changed: list[dict] | None = None,
+    k: int = TRENDING_K,
+    path: Path | None = None,
+    save: bool = True,
+) -> list[dict]:
+    """
+    Bring the trending heap up to date and return the top-k articles, best first.
+    changed: articles whose engagement was just refreshed (pushed in addition
+    to the ones published since the last update). save=False leaves
+    data/trending.json as it is (build_site, which may build other article sets).
+    """
+    by_id = {a["id"]: a for a in articles if a.get("id")}
+    t = Trending.load(path, k)
+    ok = t is not None and t.valid_for(by_id, {a.get("id") for a in changed or []})
+    if ok:
+        fresh = [a for a in articles if int(a.get("published_epoch") or 0) > t.through_epoch]
+        ok = all(t.push(a) for a in [*(changed or []), *fresh] if a.get("id"))
+    if not ok:
+        t = Trending.build(articles, k)
+    if save:
+        t.save(path)
+    return [by_id[i] for i in t.ids()]
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.engagement")
+    ap.add_argument("--limit", type=int, default=0, help="refresh at most N articles (newest first)")
+    ap.add_argument("--dry-run", action="store_true", help="fetch and report, write nothing")
+    args = ap.parse_args(argv)
+
+    from nompower_pipeline.derived import ensure_derived
+    from nompower_pipeline.linkcheck import HEALTH_PATH
+    from nompower_pipeline.telemetry import flush_at_exit
+
+    flush_at_exit("engagement")
+    cfg = read_json(CONFIG_PATH, default=None) or {}
+    articles = read_json(ARTICLES_PATH, default=[])
+    ensure_derived(articles)
+    health = read_json(HEALTH_PATH, default={}) or {}
+    changed, st = refresh_engagement(articles, cfg, limit=args.limit, health=health)
+    print(f"[engagement] due={st['due']} requests={st['requests']} returned={st['returned']} "
+          f"changed={st['changed']} failed_batches={st['failed_batches']} flag_changes={st['flag_changes']}")
+    if args.dry_run:
+        for a in changed[:10]:
+            print(f"  {a['score']:>6} / {a['comments']:<5} {a['title'][:70]}")
+        return
+    if st["requests"]:
+        write_json(HEALTH_PATH, health)
+    if st["returned"] or st["flag_changes"]:
+        write_json(ARTICLES_PATH, articles)
+    top = update_trending(articles, changed)
+    for n, a in enumerate(top, 1):
+        print(f"  {n:>2}. hot={hot_score(a):.3f} score={a.get('score', 0)} comments={a.get('comments', 0)} {a['title'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# nompower_pipeline/feeds.py
+"""
+Full-content Atom / JSON Feed output with paged archives (site/).
+
+Layout:
+  feed.xml                        RSS 2.0, latest 10 items, excerpt only
+  feed.atom, feed.json            head (subscription) documents: newest items
+  feeds/atom/page-<k>.xml         RFC 5005 archive documents, k=1 is the oldest page
+  feeds/json/page-<k>.json        same pages as JSON Feed 1.1 (next_url → older page)
+
+Articles are split oldest-first into fixed pages of PAGE_SIZE. A page is
+archived only once it is full and at least HEAD_MIN newer items exist, so
+the head always carries HEAD_MIN..HEAD_MIN+PAGE_SIZE-1 items and archive
+pages never move. On a normal run only the head documents are rewritten
+(plus the previous newest page once, when a new page rolls over and gains
+its next-archive link).
+
+The per-page fingerprints live outside the published site, in
+data/feed_state.json, with the hash of the feed.json written alongside
+them. When the feed.json found in site_dir is a different one (site/
+restored from an older deploy, or not restored at all) every page is
+rewritten.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from xml.sax.saxutils import escape as _xml_escape
+import hashlib
+import html as _html
+import json
+import time
+
+from nompower_pipeline.derived import derive_article_fields
+from nompower_pipeline.util import read_json, write_json
+
+
+FEEDS_VERSION = 1
+PAGE_SIZE = 50
+HEAD_MIN = 20
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+HISTORY_NS = "http://purl.org/syndication/history/1.0"
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+
+
+def _esc(s: str) -> str:
+    return _xml_escape(s or "", {'"': "&quot;"})
+
+
+# atom_document / json_document が出力に使うフィールド全部（1つでも変わればページを書き直す）
+RENDERED_FIELDS = (
+    "id", "title", "path", "published_ts", "body_html", "excerpt", "genre",
+    "hero_image", "hero_dead", "source_url", "source_dead",
+)
+
+
+def _fingerprint(items: list[dict], extra: str) -> str:
+    h = hashlib.sha1(extra.encode("utf-8"))
+    for a in items:
+        for key in RENDERED_FIELDS:
+            h.update(b"\0")
+            h.update(str(a.get(key, "") or "").encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def partition(articles: list[dict], page_size: int = PAGE_SIZE, head_min: int = HEAD_MIN) -> tuple[list[list[dict]], list[dict]]:
+    """Return (archive pages oldest-first, head items newest-first)."""
+    ordered = sorted(articles, key=lambda a: a.get("published_ts", ""))
+    n_pages = max(0, len(ordered) - head_min) // page_size
+    pages = [ordered[i * page_size:(i + 1) * page_size] for i in range(n_pages)]
+    head = ordered[n_pages * page_size:]
+    head.reverse()
+    return pages, head
+
+
+class _Urls:
+    def __init__(self, base_url: str) -> None:
+        self.base = base_url.rstrip("/")
+
+    def article(self, a: dict) -> str:
+        return f"{self.base}{a['path']}"
+
+    def head(self, kind: str) -> str:
+        return f"{self.base}/feed.{'atom' if kind == 'atom' else 'json'}"
+
+    def page(self, kind: str, k: int) -> str:
+        return f"{self.base}/feeds/{kind}/page-{k}.{'xml' if kind == 'atom' else 'json'}"
+
+
+def atom_document(cfg: dict, items: list[dict], urls: _Urls, links: dict[str, str], archive: bool) -> str:
+    site = cfg["site"]
+    title = site.get("title", site.get("brand_name", "Nompower"))
+    updated = max((a.get("published_ts", "") for a in items), default="") or "1970-01-01T00:00:00+00:00"
+
+    parts = ['<?xml version="1.0" encoding="utf-8"?>']
+    parts.append(f'<feed xmlns="{ATOM_NS}"' + (f' xmlns:fh="{HISTORY_NS}"' if archive else "") + ">")
+    if archive:
+        parts.append("<fh:archive/>")
+    parts.append(f"<id>{_esc(links['self'])}</id>")
+    parts.append(f"<title>{_esc(title)}</title>")
+    parts.append(f"<subtitle>{_esc(site.get('description', 'Daily digest'))}</subtitle>")
+    parts.append(f"<updated>{_esc(updated)}</updated>")
+    parts.append(f"<author><name>{_esc(site.get('brand_name', 'Nompower'))}</name></author>")
+    parts.append(f'<link rel="alternate" type="text/html" href="{_esc(urls.base + "/")}"/>')
+    for rel, href in links.items():
+        parts.append(f'<link rel="{rel}" type="application/atom+xml" href="{_esc(href)}"/>')
+
+    for a in items:
+        url = urls.article(a)
+        pub = a.get("published_ts", "")
+        parts.append("<entry>")
+        parts.append(f"<id>{_esc(url)}</id>")
+        parts.append(f"<title>{_esc(a.get('title', ''))}</title>")
+        parts.append(f'<link rel="alternate" type="text/html" href="{_esc(url)}"/>')
+        parts.append(f"<published>{_esc(pub)}</published>")
+        parts.append(f"<updated>{_esc(pub)}</updated>")
+        if a.get("genre"):
+            parts.append(f'<category term="{_esc(a["genre"])}"/>')
+        if a.get("excerpt"):
+            parts.append(f"<summary>{_esc(a['excerpt'])}</summary>")
+        parts.append(f'<content type="html">{_esc(a.get("body_html", ""))}</content>')
+        parts.append("</entry>")
+
+    parts.append("</feed>")
+    return "\n".join(parts) + "\n"
+
+
+def json_document(cfg: dict, items: list[dict], urls: _Urls, feed_url: str, next_url: str) -> dict:
+    site = cfg["site"]
+    doc: dict = {
+        "version": JSON_FEED_VERSION,
+        "title": site.get("title", site.get("brand_name", "Nompower")),
+        "home_page_url": urls.base + "/",
+        "feed_url": feed_url,
+        "description": site.get("description", "Daily digest"),
+        "authors": [{"name": site.get("brand_name", "Nompower")}],
+        "language": "en",
+    }
+    if next_url:
+        doc["next_url"] = next_url
+    out_items = []
+    for a in items:
+        it = {
+            "id": urls.article(a),
+            "url": urls.article(a),
+            "title": a.get("title", ""),
+            "content_html": a.get("body_html", ""),
+            "date_published": a.get("published_ts", ""),
+        }
+        if a.get("excerpt"):
+            it["summary"] = a["excerpt"]
+        if a.get("hero_image") and not a.get("hero_dead"):
+            it["image"] = a["hero_image"]
+        if a.get("genre"):
+            it["tags"] = [a["genre"]]
+        if a.get("source_url") and not a.get("source_dead"):
+            it["external_url"] = a["source_url"]
+        out_items.append(it)
+    doc["items"] = out_items
+    return doc
+
+
+def _write_json_doc(path: Path, obj: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(obj, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def write_rss(cfg: dict, articles: list[dict], site_dir: Path, limit: int = 10) -> None:
+    base_url = cfg["site"]["base_url"].rstrip("/")
+    site_title = cfg["site"].get("title", "Nompower")
+    site_desc = cfg["site"].get("description", "Daily digest")
+
+    items = sorted(articles, key=lambda a: a.get("published_ts", ""), reverse=True)[:limit]
+
+    def rfc822(epoch: int) -> str:
+        return time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(epoch))
+
+    parts = []
+    parts.append('<?xml version="1.0" encoding="UTF-8"?>')
+    parts.append("<rss version='2.0' xmlns:atom='http://www.w3.org/2005/Atom'>")
+    parts.append("<channel>")
+    parts.append(f"<title>{_html.escape(site_title)}</title>")
+    parts.append(f"<link>{_html.escape(base_url + '/')}</link>")
+    parts.append(f"<description>{_html.escape(site_desc)}</description>")
+    parts.append(f"<lastBuildDate>{_html.escape(rfc822(int(time.time())))}</lastBuildDate>")
+
+    for a in items:
+        url = f"{base_url}{a['path']}"
+        title = a.get("title", "")
+        # excerpt / published_epoch は取り込み時に計算済み（derived.py）。古いデータだけその場で
+        d = a if "excerpt" in a and "published_epoch" in a else derive_article_fields(a)
+        pub = d["published_epoch"] or int(time.time())
+        summary = d["excerpt"]
+
+        parts.append("<item>")
+        parts.append(f"<title>{_html.escape(title)}</title>")
+        parts.append(f"<link>{_html.escape(url)}</link>")
+        parts.append(f"<guid isPermaLink='true'>{_html.escape(url)}</guid>")
+        parts.append(f"<pubDate>{_html.escape(rfc822(pub))}</pubDate>")
+        parts.append(f"<description>{_html.escape(summary)}</description>")
+        parts.append("</item>")
+
+    parts.append("</channel>")
+    parts.append("</rss>")
+
+    site_dir.mkdir(parents=True, exist_ok=True)
+    (site_dir / "feed.xml").write_text("\n".join(parts) + "\n", encoding="utf-8")
+
+
+def _sha(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:16] if path.exists() else ""
+
+
+def write_feeds(cfg: dict, articles: list[dict], site_dir: Path, state_path: Path) -> dict:
+    """
+    Write head + archive feeds under site_dir (page fingerprints kept in state_path).
+    Returns stats: {"head", "pages", "written", "full"}.
+    """
+    build = cfg.get("build", {})
+    page_size = int(build.get("feed_page_size", PAGE_SIZE))
+    head_min = int(build.get("feed_head_min", HEAD_MIN))
+
+    urls = _Urls(cfg["site"]["base_url"])
+    state = read_json(state_path, default=None)
+    # 以前は公開ディレクトリに置いていた
+    (site_dir / "feeds" / "state.json").unlink(missing_ok=True)
+    full = (
+        not isinstance(state, dict)
+        or state.get("v") != FEEDS_VERSION
+        or state.get("page_size") != page_size
+        or state.get("head_sha") != _sha(site_dir / "feed.json")
+    )
+    if full:
+        state = {"v": FEEDS_VERSION, "page_size": page_size, "pages": {}}
+    known: dict[str, str] = state["pages"]
+
+    pages, head = partition(articles, page_size, head_min)
+    n = len(pages)
+    written = 0
+
+    for k, items in enumerate(pages, start=1):
+        has_next = k < n
+        fp = _fingerprint(items, f"{k}:{has_next}")
+        atom_path = site_dir / "feeds" / "atom" / f"page-{k}.xml"
+        json_path = site_dir / "feeds" / "json" / f"page-{k}.json"
+        if known.get(str(k)) == fp and atom_path.exists() and json_path.exists():
+            continue
+
+        newest_first = list(reversed(items))
+        links = {"self": urls.page("atom", k), "current": urls.head("atom")}
+        if k > 1:
+            links["prev-archive"] = urls.page("atom", k - 1)
+        if has_next:
+            links["next-archive"] = urls.page("atom", k + 1)
+        atom_path.parent.mkdir(parents=True, exist_ok=True)
+        atom_path.write_text(atom_document(cfg, newest_first, urls, links, archive=True), encoding="utf-8")
+        _write_json_doc(
+            json_path,
+            json_document(cfg, newest_first, urls, urls.page("json", k), urls.page("json", k - 1) if k > 1 else ""),
+        )
+        known[str(k)] = fp
+        written += 1
+
+    # 記事が消えてページ数が減った場合の後始末
+    for key in [key for key in known if int(key) > n]:
+        known.pop(key)
+        (site_dir / "feeds" / "atom" / f"page-{key}.xml").unlink(missing_ok=True)
+        (site_dir / "feeds" / "json" / f"page-{key}.json").unlink(missing_ok=True)
+
+    head_links = {"self": urls.head("atom")}
+    if n:
+        head_links["prev-archive"] = urls.page("atom", n)
+    (site_dir / "feed.atom").write_text(atom_document(cfg, head, urls, head_links, archive=False), encoding="utf-8")
+    _write_json_doc(
+        site_dir / "feed.json",
+        json_document(cfg, head, urls, urls.head("json"), urls.page("json", n) if n else ""),
+    )
+
+    state["head_sha"] = _sha(site_dir / "feed.json")
+    write_json(state_path, state)
+    return {"head": len(head), "pages": n, "written": written, "full": full}
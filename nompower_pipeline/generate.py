@@ -1,15 +1,15 @@
 # nompower_pipeline/generate.py
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
-from slugify import slugify
+from typing import TYPE_CHECKING, Any
+import argparse
 import json
 import random
 import re
 import html as _html
-import urllib.request
 from urllib.parse import urlparse
 
 from nompower_pipeline.util import (
@@ -21,11 +21,29 @@ from nompower_pipeline.util import (
     normalize_url,
     simple_tokens,
     jaccard,
-    sanitize_llm_html,
 )
-from nompower_pipeline.deepseek import DeepSeekClient
-from nompower_pipeline.reddit import fetch_rss_entries
-from nompower_pipeline.render import env_for, render_to_file, write_asset
+from nompower_pipeline.ad_slots import ad_slot_context
+from nompower_pipeline.candidate_queue import QUEUE_DB_PATH, mark_generated, take_or_poll
+from nompower_pipeline.candidates import is_blocked, pick_candidate  # noqa: F401  (re-export)
+from nompower_pipeline.critical_css import critical_css
+from nompower_pipeline.derived import classify_genre, derive_article_fields, ensure_derived
+from nompower_pipeline.endpoints import rebase_url
+from nompower_pipeline.engagement import TRENDING_K, update_trending
+from nompower_pipeline.feeds import write_feeds, write_rss
+from nompower_pipeline.hedge import hedged_chat
+from nompower_pipeline.imagemeta import ImageMetaCache
+from nompower_pipeline.instrument import TIMINGS, span, memory_top
+from nompower_pipeline.prompts import article_payload, article_prefix
+from nompower_pipeline.render import env_for, render_to_file
+from nompower_pipeline.runs import RUNS_DIR, STAGES, open_run, prune_runs
+from nompower_pipeline.sanitize import sanitize_html
+from nompower_pipeline.search_index import write_search_index
+from nompower_pipeline.service_worker import write_assets, write_service_worker
+from nompower_pipeline.telemetry import flush_at_exit
+
+# requests / slugify は記事生成でだけ使う（build だけなら読み込まない）
+if TYPE_CHECKING:
+    from nompower_pipeline.deepseek import DeepSeekClient
 
 CONFIG_PATH = ROOT / "nompower_pipeline" / "config.json"
 ADS_JSON_PATH = ROOT / "nompower_pipeline" / "ads.json"
@@ -34,56 +52,37 @@ PROCESSED_PATH = ROOT / "processed_urls.txt"
 ARTICLES_PATH = ROOT / "data" / "articles.json"
 LAST_RUN_PATH = ROOT / "data" / "last_run.json"
 SITE_DIR = ROOT / "site"
+# build_site の差分更新用 state（公開しない。daily workflow が commit する）
+BUILD_STATE_DIR = ROOT / "data"
 
 TEMPLATES_DIR = ROOT / "nompower_pipeline" / "templates"
 STATIC_DIR = ROOT / "nompower_pipeline" / "static"
 
-# === Ads (strings must be standalone and syntactically valid) ===
-ADS_TOP = """
-<script>
-(function(){
-  var dbg = (window.__ads_debug === true);
-  var t0 = Date.now();
-  function log(){ if(dbg) console.log.apply(console, arguments); }
-
-  log("[ads] init called", new Date().toISOString());
-
-  if (window.__monetag_loaded) {
-    log("[ads] monetag already loaded; skip", window.__monetag_loaded_at);
-    return;
-  }
-  window.__monetag_loaded = true;
-  window.__monetag_loaded_at = new Date().toISOString();
-
-  var s = document.createElement("script");
-  s.async = true;
-  s.dataset.zone = "10551684";
-  s.src = "https://nap5k.com/tag.min.js";
-
-  s.onload = function(){
-    log("[ads] monetag script loaded", "ms=", (Date.now()-t0));
-  };
-  s.onerror = function(e){
-    console.error("[ads] monetag script FAILED", e);
-  };
-
-  var parent = document.head || document.body || document.documentElement;
-  parent.appendChild(s);
-  log("[ads] monetag script appended to", parent.tagName);
-})();
-</script>
-""".strip()
-
-ADS_MID = ADS_TOP
-ADS_BOTTOM = ADS_TOP
 
-ads_rail_left = """
-<script src="https://pl28593834.effectivegatecpm.com/bf/0c/41/bf0c417e61a02af02bb4fab871651c1b.js"></script>
-""".strip()
+@dataclass
+class SitePaths:
+    """
+    Per-site inputs/outputs for run_site(). None = the single-site default
+    above (resolved at call time, so benchmarks can still patch the globals).
+    """
+    config: Path | None = None
+    articles: Path | None = None
+    processed: Path | None = None
+    last_run: Path | None = None
+    site_dir: Path | None = None
+    runs: Path | None = None
+    queue: Path | None = None
+
+# critical CSS のサンプル：ファーストビューの {% if %} を全部の分岐で一度ずつ描いて和集合を取る
+# （最初の記事にヒーロー画像が無い / 元投稿が削除済みでも、他の記事の分が抜けない）
+CRITICAL_VARIANTS: dict[str, list[dict[str, Any]]] = {
+    "article.html": [
+        {"hero_src": "/og/critical-sample.jpg", "hero_size": (1200, 630), "a": {"source_dead": False, "reading_minutes": 1}},
+        {"hero_src": "", "a": {"source_dead": True}},
+    ],
+}
 
-ads_rail_right = """
-<script src="https://quge5.com/88/tag.min.js" data-zone="206389" async data-cfasync="false"></script>
-""".strip()
+# 表示広告の枠は ad_slots.py（placeholder + /assets/ads.js）
 
 FIXED_POLICY_BLOCK = """
 <p><strong>Policy & Transparency (to stay search-friendly)</strong></p>
@@ -125,30 +124,6 @@ def save_ad_state(state: dict) -> None:
     AD_STATE_PATH.write_text(json.dumps(state, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
-def classify_genre(title: str, summary: str) -> str:
-    """
-    Phase1: simple keyword rules (fast + stable).
-    Fallback: 'general'
-    """
-    text = f"{title} {summary}".lower()
-
-    rules = [
-        ("health", ["health", "hair", "sleep", "diet", "doctor", "study says", "medical", "wellness"]),
-        ("beauty", ["skincare", "beauty", "cosmetic", "laser", "dermatology", "makeup"]),
-        ("finance", ["stock", "crypto", "bitcoin", "bank", "interest rate", "loan", "tax", "investment"]),
-        ("tech", ["ai", "openai", "model", "gpu", "software", "bug", "security", "iphone", "android"]),
-        ("travel", ["travel", "flight", "hotel", "trip", "tourism", "airport"]),
-        ("study", ["learn", "exam", "toeic", "eiken", "study", "university"]),
-        ("vpn", ["vpn", "privacy", "proxy", "geoblock"]),
-        ("tools", ["tool", "formatter", "converter", "generator", "app", "extension"])
-    ]
-
-    for genre, kws in rules:
-        if any(k in text for k in kws):
-            return genre
-
-    return "general"
-
 ADS_PATH = None  # set below in main init if you already have ROOT; otherwise leave
 
 def load_ads(ads_path):
@@ -228,17 +203,19 @@ RELATED_GENRES: dict[str, list[str]] = {
     "travel": ["productivity", "home_improvement", "business"],
 }
 
-def choose_ad(ads_catalog: dict, genre: str) -> tuple[dict | None, str | None]:
+def choose_ad(ads_catalog: dict, genre: str, rng: random.Random | None = None) -> tuple[dict | None, str | None]:
     """
     Pick the closest possible ad by genre.
     - Never use 'general'
     - Prefer exact genre pool
     - If empty, try RELATED_GENRES[genre] pools in order
     - If still empty, pick random from ALL non-general ads
+    rng: seeded Random for a reproducible pick (backfill); default = module random
     Returns: (ad_dict or None, picked_genre or None)
     """
     if not isinstance(ads_catalog, dict):
         return (None, None)
+    choice = (rng or random).choice
 
     def pool_for(g: str) -> list[dict]:
         v = ads_catalog.get(g) or []
@@ -250,7 +227,7 @@ def choose_ad(ads_catalog: dict, genre: str) -> tuple[dict | None, str | None]:
     if genre != "general":
         pool = pool_for(genre)
         if pool:
-            return (random.choice(pool), genre)
+            return (choice(pool), genre)
 
     # 2) related genres
     for g in RELATED_GENRES.get(genre, []):
@@ -258,7 +235,7 @@ def choose_ad(ads_catalog: dict, genre: str) -> tuple[dict | None, str | None]:
             continue
         pool = pool_for(g)
         if pool:
-            return (random.choice(pool), g)
+            return (choice(pool), g)
 
     # 3) last resort: any non-general
     all_ads: list[dict] = []
@@ -271,18 +248,21 @@ def choose_ad(ads_catalog: dict, genre: str) -> tuple[dict | None, str | None]:
     if not all_ads:
         return (None, None)
 
-    return (random.choice(all_ads), None)
+    return (choice(all_ads), None)
 
 
 
 
-def build_affiliate_section(article_id: str, title: str, summary: str, ads_catalog: dict, base_url: str) -> tuple[str, str | None]:
+def build_affiliate_section(
+    article_id: str, title: str, summary: str, ads_catalog: dict, base_url: str, rng: random.Random | None = None
+) -> tuple[str, str | None]:
     """
     Returns (html, chosen_ad_id)
     Uses Cloudflare Worker /go for click tracking and redirect.
+    rng: passed to choose_ad (backfill seeds it with the article id)
     """
     genre = classify_genre(title, summary)
-    ad, picked_genre = choose_ad(ads_catalog, genre)
+    ad, picked_genre = choose_ad(ads_catalog, genre, rng=rng)
 
     if not ad:
         return ("", None)
@@ -326,27 +306,28 @@ def now_utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds")
 
 
-def load_config() -> dict:
-    return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+def load_config(path: Path | None = None) -> dict:
+    return json.loads((path or CONFIG_PATH).read_text(encoding="utf-8"))
 
 
-def load_processed() -> set[str]:
-    s = read_text(PROCESSED_PATH)
+def load_processed(path: Path | None = None) -> set[str]:
+    s = read_text(path or PROCESSED_PATH)
     lines = [normalize_url(x) for x in s.splitlines() if x.strip()]
     return set(lines)
 
 
-def append_processed(url: str) -> None:
+def append_processed(url: str, path: Path | None = None) -> None:
+    path = path or PROCESSED_PATH
     url = normalize_url(url)
-    existing = load_processed()
+    existing = load_processed(path)
     if url in existing:
         return
 
-    current = read_text(PROCESSED_PATH).rstrip()
+    current = read_text(path).rstrip()
     if current.strip():
         current += "\n"
     current += url + "\n"
-    write_text(PROCESSED_PATH, current)
+    write_text(path, current)
 
 def og_image_from_article(base_url: str, a: dict) -> str:
     img = (a.get("hero_image") or "").strip()
@@ -362,143 +343,25 @@ def og_image_from_article(base_url: str, a: dict) -> str:
 
     return ""
 
-def is_blocked(title: str, blocked_kw: list[str]) -> bool:
-    t = (title or "").lower()
-    for kw in blocked_kw:
-        if kw.lower() in t:
-            return True
-    return False
-
-
-def pick_candidate(cfg: dict, processed: set[str], articles: list[dict]) -> dict | None:
-    blocked_kw = cfg["safety"]["blocked_keywords"]
+def deepseek_article(cfg: dict, item: dict, ds: DeepSeekClient | None = None) -> tuple[str, str]:
+    return parse_completion(deepseek_completion(cfg, item, ds=ds)[0], item)
 
-    prev_titles = [a.get("title", "") for a in articles]
-    prev_tok = [simple_tokens(t) for t in prev_titles if t]
 
-    candidates: list[dict] = []
-    for rss in cfg["feeds"]["reddit_rss"]:
-        for e in fetch_rss_entries(rss):
-            link = normalize_url(e["link"])
-            if not link or link in processed:
-                continue
-
-            if is_blocked(e["title"], blocked_kw):
-                continue
-
-            tok = simple_tokens(e["title"])
-            too_similar = any(jaccard(tok, pt) >= 0.78 for pt in prev_tok)
-            if too_similar:
-                continue
-
-            # ✅ RSSから拾った安全な画像だけ使う（i.redd.itのみ）
-            e["image_url"] = e.get("hero_image", "") or ""
-            e["image_kind"] = e.get("hero_image_kind", "none") or "none"
-
-            candidates.append(e)
-
-    return candidates[0] if candidates else None
-
-
-def deepseek_article(cfg: dict, item: dict) -> tuple[str, str]:
-
-    ds = DeepSeekClient()
+def deepseek_completion(cfg: dict, item: dict, ds: DeepSeekClient | None = None) -> tuple[str, dict[str, Any]]:
+    """
+    (raw model output, usage report) — the paid part, checkpointed by run_site.
+    Messages = cached system+instruction prefix (prompts.py) + one item message.
+    """
+    if ds is None:
+        from nompower_pipeline.deepseek import DeepSeekClient
+        ds = DeepSeekClient()
     model = cfg["generation"]["model"]
-    target_words = int(cfg["generation"]["target_words"])
     temp = float(cfg["generation"]["temperature"])
 
     title = item["title"]
     link = item["link"]
     summary = item.get("summary", "")
 
-    system = (
-        "You are a high-performance conversion copywriter and tech analyst. "
-        "Your mission is to write content that grabs attention, triggers the reader's survival instinct (FOMO), "
-        "and provides immediate, actionable solutions. "
-        "Write in English only. Do not fabricate facts. "
-        "Be punchy, direct, and slightly provocative to drive clicks, but remain ethically grounded. "
-        "Your goal is to make the reader feel that ignoring this info is a mistake. "
-        "Always focus on the 'What's in it for me?' for the reader."
-    )
-
-    user = f"""
-You are an expert tech journalist and high-conversion copywriter.
-Your goal is NOT to summarize the news. Your goal is: Create an URGENT "reader-benefit" briefing that makes the reader feel, "If I don't read this now, I'm losing money/security/time."
-
-OUTPUT RULES:
-VERY IMPORTANT OUTPUT FORMAT:
-- First line MUST be: TITLE: <your best SEO-friendly title>
-- Second line MUST be empty (blank line).
-- From the third line, output the HTML body only (allowed tags only).
-
-- English only.
-- HTML body only.
-- Allowed tags: <p>, <h2>, <ul>, <li>, <strong>, <code>, <a>
-- Do NOT output <h1>.
-- Do NOT repeat the post title in the body.
-- Do NOT paste any affiliate code or scripts.
-- Do NOT invent facts. If unknown, explicitly say "Not stated in the source."
-
-INPUT:
-Post title: {title}
-Permalink: {link}
-RSS summary snippet (may be partial): {summary}
-
-TASK (Mental preparation):
-1) Identify the Persona: Who stands to lose the MOST (money, data, or reputation) from this news?
-2) Identify the Pain: What is the single most terrifying or frustrating consequence for them?
-3) Identify the Gain: What is the "unfair advantage" they get by knowing this 5 minutes before others?
-
-IF YOU CANNOT GIVE CLEAR ACTIONS (Irrelevant/Low-value news):
-- Start with: <p><strong>[SKIP: no actionable value]</strong></p>
-- Then add ONE short <p> explaining why (missing specifics, no impact, etc.).
-- Stop.
-
-OUTPUT STRUCTURE (Follow this EXACTLY for maximum impact):
-
-1) <p><strong>[CRITICAL SUMMARY]</strong>: <strong>2 lines of high-impact warning.</strong> Who is in immediate danger/losing out, and the single most urgent action to take right now.</p>
-
-2) <h2>Is this your problem?</h2>
-   <p>Check if you are in the "Danger Zone":</p>
-   <ul><li>5 yes/no conditions that describe the reader's current setup or behavior. Make them feel "This is about ME."</li></ul>
-
-3) <h2>The Hidden Reality</h2>
-   <p>Summarize what changed, but focus on the <strong>IMPACT</strong>. Why does this matter more than people think? (2-3 sentences max, no fluff).</p>
-
-4) <h2>Stop the Damage / Secure the Win</h2>
-   <ul><li>3-7 concrete, actionable steps. Use strong verbs (e.g., "Revoke," "Switch," "Deploy"). If information is missing, state what to watch out for.</li></ul>
-
-5) <h2>The High Cost of Doing Nothing</h2>
-   <p>Explain the exact negative outcome (data loss, wasted cash, missed opportunity) in vivid detail. Be direct and blunt.</p>
-
-6) <h2>Common Misconceptions</h2>
-   <ul><li>3-5 "dangerous myths" about this news that will cause people to fail.</li></ul>
-
-7) <h2>Critical FAQ</h2>
-   <ul><li>5 high-stakes questions the reader is likely panicking about. If not in source, answer: "Not stated in the source."</li></ul>
-
-8) <h2>Verify Original Details</h2>
-   <p><a href="{link}" rel="nofollow noopener" target="_blank">Access the full source here</a></p>
-
-9) <h2>Strategic Next Step</h2>
-   <p>
-   Write EXACTLY one transition paragraph (2–4 sentences) that bridges the current problem to a broader solution.
-   - Tone: Helpful, authoritative, and practical. 
-   - Strategy: "Since this news shows how vulnerable [Category] is, the smart long-term move is to [Related Best Practice]."
-   - NOT mention discounts, coupons, promo codes, prices, or "buy now."
-   - End with: "If you want a practical option people often use to handle this, here’s one."
-   Use the Ad context below for relevance.
-   </p>
-
-AD CONTEXT (DO NOT SELL; only allow a neutral transition):
-- Genre: {{AD_GENRE}}
-- Ad title: {{AD_TITLE}}
-- Ad detail: {{AD_DETAIL}}
-
-FINAL TOUCH:
-- Put it as the very last paragraph, max 2 sentences. Focus on "Choosing trusted standards/tools" in this domain to avoid scams or repeat issues.
-""".strip()
-
     # ---- Phase1: pick one affiliate ad by genre and feed details to the prompt ----
     # Decide genre from title/summary (your classify_genre already exists)
     genre = classify_genre(title, summary)
@@ -511,37 +374,32 @@ FINAL TOUCH:
 
     ad_title = (ad.get("title") if ad else "") or ""
     ad_detail = (ad.get("detail") if ad else "") or ""
-    # Replace placeholders in the user prompt
-    user = (user
-        .replace("{{AD_GENRE}}", genre)
-        .replace("{{AD_TITLE}}", ad_title)
-        .replace("{{AD_DETAIL}}", ad_detail))
-
-
-    out = ds.chat(
-    model=model,
-    messages=[
-        {"role": "system", "content": system},
-        {"role": "user", "content": user},
-    ],
-    temperature=temp,
-    max_tokens=2400,
-)
 
-# ---- Make it robust: out can be None/empty ----
-    out = ds.chat(
+    # 固定部分（system + 指示）を先頭に、記事ごとに変わる部分は最後のメッセージだけ
+    prefix, prefix_fp = article_prefix(cfg)
+    item_msg = article_payload(title, link, summary, genre, ad_title, ad_detail)
+
+    # generation.hedge が有効なら締切超過/失敗時に2本目を投げる（hedge.py）
+    out, usage, info = hedged_chat(
+        ds,
+        cfg,
         model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
+        messages=prefix + [{"role": "user", "content": item_msg}],
         temperature=temp,
         max_tokens=2400,
     )
+    report = {**usage, **info, "prompt_prefix": prefix_fp}
+    hit, miss = usage.get("prompt_cache_hit_tokens", 0), usage.get("prompt_cache_miss_tokens", 0)
+    if hit + miss:
+        report["cache_hit_ratio"] = round(hit / (hit + miss), 3)
+    print(f"[deepseek] prompt={usage.get('prompt_tokens', '?')} cache_hit={hit} miss={miss} {report['latency_s']:.2f}s")
 
     # ---- Make it robust: out can be None/empty ----
-    out = (out or "").strip()
+    return (out or "").strip(), report
+
 
+def parse_completion(out: str, item: dict) -> tuple[str, str]:
+    """(llm_title, sanitized body_html) from a raw completion."""
     # Expect:
     # TITLE: ...
     #
@@ -555,103 +413,43 @@ FINAL TOUCH:
         llm_title = (item.get("title") or "").strip()
         llm_html = out
 
-    llm_html = sanitize_llm_html(llm_html or "")
+    # allowlist + 先頭の重複タイトル除去を1パスで
+    llm_html = sanitize_html(llm_html or "", title=llm_title).html
     return (llm_title, llm_html)
 
 
 
 
-def strip_leading_duplicate_title(body_html: str, title: str) -> str:
-    if not body_html or not title:
-        return body_html
-
-    t = _html.unescape(title).strip()
-    t_norm = re.sub(r"\s+", " ", t).lower()
+def compute_rankings(articles: list[dict], k: int = TRENDING_K) -> list[dict]:
+    """Top-k by hot score (score + 2×comments, time-decayed); see engagement.py."""
+    return update_trending(articles, k=k, save=False)
 
-    def _same(text: str) -> bool:
-        x = _html.unescape(text or "").strip()
-        x = re.sub(r"\s+", " ", x).lower()
-        return x == t_norm
 
-    s = body_html.lstrip()
+def title_token_set(a: dict) -> set[str]:
+    toks = a.get("title_tokens")
+    return set(toks) if toks is not None else simple_tokens(a.get("title", ""))
 
-    m = re.match(r"(?is)^\s*<h1[^>]*>(.*?)</h1>\s*", s)
-    if m and _same(m.group(1)):
-        return s[m.end() :].lstrip()
 
-    m = re.match(r"(?is)^\s*<h2[^>]*>(.*?)</h2>\s*", s)
-    if m and _same(m.group(1)):
-        return s[m.end() :].lstrip()
-
-    m = re.match(r"(?is)^\s*<p[^>]*>(.*?)</p>\s*", s)
-    if m:
-        inner = re.sub(r"(?is)<[^>]+>", "", m.group(1))
-        if _same(inner):
-            return s[m.end() :].lstrip()
+def related_articles(current: dict, articles: list[dict], k: int = 6, token_sets: dict[str, set[str]] | None = None) -> list[dict]:
+    # token_sets: build_site で1回だけ作った {id: タイトルトークン}（無ければその場で）
+    def toks(a: dict) -> set[str]:
+        if token_sets is not None and a.get("id") in token_sets:
+            return token_sets[a["id"]]
+        return title_token_set(a)
 
-    m = re.match(r"(?is)^\s*([^<\n]{10,200})\s*(?:<br\s*/?>|\n)\s*", s)
-    if m and _same(m.group(1)):
-        return s[m.end() :].lstrip()
-
-    return body_html
-
-
-def compute_rankings(articles: list[dict]) -> list[dict]:
-    return sorted(articles, key=lambda a: a.get("published_ts", ""), reverse=True)
-
-
-def related_articles(current: dict, articles: list[dict], k: int = 6) -> list[dict]:
-    cur_tok = simple_tokens(current.get("title", ""))
+    cur_tok = toks(current)
     scored: list[tuple[float, dict]] = []
     for a in articles:
         if a.get("id") == current.get("id"):
             continue
-        sim = jaccard(cur_tok, simple_tokens(a.get("title", "")))
+        sim = jaccard(cur_tok, toks(a))
         scored.append((sim, a))
     scored.sort(key=lambda x: x[0], reverse=True)
     return [a for s, a in scored[:k] if s > 0.05]
 
 
-def write_rss_feed(cfg: dict, articles: list[dict], limit: int = 10) -> None:
-    base_url = cfg["site"]["base_url"].rstrip("/")
-    site_title = cfg["site"].get("title", "Nompower")
-    site_desc = cfg["site"].get("description", "Daily digest")
-
-    items = sorted(articles, key=lambda a: a.get("published_ts", ""), reverse=True)[:limit]
-
-    def rfc822(iso: str) -> str:
-        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
-        return dt.astimezone(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
-
-    parts = []
-    parts.append('<?xml version="1.0" encoding="UTF-8"?>')
-    parts.append("<rss version='2.0' xmlns:atom='http://www.w3.org/2005/Atom'>")
-    parts.append("<channel>")
-    parts.append(f"<title>{_html.escape(site_title)}</title>")
-    parts.append(f"<link>{_html.escape(base_url + '/')}</link>")
-    parts.append(f"<description>{_html.escape(site_desc)}</description>")
-    parts.append(f"<lastBuildDate>{_html.escape(rfc822(now_utc_iso()))}</lastBuildDate>")
-
-    for a in items:
-        url = f"{base_url}{a['path']}"
-        title = a.get("title", "")
-        pub = a.get("published_ts", now_utc_iso())
-        summary = a.get("summary", "") or ""
-        if not summary:
-            summary = re.sub(r"\s+", " ", re.sub(r"(?is)<[^>]+>", " ", a.get("body_html", ""))).strip()[:240]
-
-        parts.append("<item>")
-        parts.append(f"<title>{_html.escape(title)}</title>")
-        parts.append(f"<link>{_html.escape(url)}</link>")
-        parts.append(f"<guid isPermaLink='true'>{_html.escape(url)}</guid>")
-        parts.append(f"<pubDate>{_html.escape(rfc822(pub))}</pubDate>")
-        parts.append(f"<description>{_html.escape(summary)}</description>")
-        parts.append("</item>")
-
-    parts.append("</channel>")
-    parts.append("</rss>")
-
-    (SITE_DIR / "feed.xml").write_text("\n".join(parts) + "\n", encoding="utf-8")
+def write_rss_feed(cfg: dict, articles: list[dict], limit: int = 10, site_dir: Path | None = None) -> None:
+    write_rss(cfg, articles, site_dir or SITE_DIR, limit=limit)
 
 
 def _abs_image_url(base_url: str, img: str) -> str:
@@ -676,7 +474,12 @@ def _guess_ext_from_url(u: str) -> str:
     return ".jpg"
 
 
-def cache_og_image(base_url: str, src_url: str, article_id: str) -> str:
+def og_image_rel(src_url: str, article_id: str) -> str:
+    """Site-relative path of the cached copy of src_url (/og/<id>.<ext>)."""
+    return f"/og/{article_id}{_guess_ext_from_url(src_url)}"
+
+
+def cache_og_image(base_url: str, src_url: str, article_id: str, site_dir: Path | None = None) -> str:
     """
     RSSに画像がある記事だけ:
     - 外部画像を site/og/ に保存
@@ -688,46 +491,54 @@ def cache_og_image(base_url: str, src_url: str, article_id: str) -> str:
         return ""
 
     # i.redd.it など外部からの直リンクがSNSクローラに弾かれる対策として自サイトにキャッシュ
-    ext = _guess_ext_from_url(src_url)
-    rel = f"/og/{article_id}{ext}"
-    out_path = SITE_DIR / rel.lstrip("/")
+    rel = og_image_rel(src_url, article_id)
+    out_path = (site_dir or SITE_DIR) / rel.lstrip("/")
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     if not out_path.exists():
+        from nompower_pipeline.http import shared_session  # requests は画像を取りに行くときだけ
+
         try:
-            req = urllib.request.Request(
-                src_url,
+            r = shared_session().get(
+                rebase_url(src_url),
                 headers={
                     # ここ重要：UA無いと弾くCDNがある
                     "User-Agent": "Mozilla/5.0 (compatible; NompowerBot/1.0; +https://nompower.mikanntool.com/)"
                 },
+                timeout=20,
             )
-            with urllib.request.urlopen(req, timeout=20) as r:
-                data = r.read()
-            if data:
-                out_path.write_bytes(data)
+            r.raise_for_status()
+            if r.content:
+                out_path.write_bytes(r.content)
         except Exception:
             return ""
 
     # 自サイトの絶対URLを返す（SNSはこれを取りに来る）
     return base_url.rstrip("/") + rel
 
-def build_site(cfg: dict, articles: list[dict]) -> None:
+def build_site(cfg: dict, articles: list[dict], site_dir: Path | None = None, jenv=None, state_dir: Path | None = None) -> None:
+    """
+    site_dir: 出力先（省略時は SITE_DIR）。jenv: コンパイル済みテンプレートを使い回すとき
+    state_dir: 検索インデックス・フィード・画像サイズ等の state の置き場（省略時は BUILD_STATE_DIR）
+    """
     base_url = cfg["site"]["base_url"].rstrip("/")
+    out_dir = site_dir or SITE_DIR
+    state_dir = state_dir or BUILD_STATE_DIR
 
-    SITE_DIR.mkdir(parents=True, exist_ok=True)
-    (SITE_DIR / "articles").mkdir(parents=True, exist_ok=True)
-    (SITE_DIR / "assets").mkdir(parents=True, exist_ok=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "articles").mkdir(parents=True, exist_ok=True)
+    (out_dir / "assets").mkdir(parents=True, exist_ok=True)
 
-    write_asset(SITE_DIR / "assets" / "style.css", STATIC_DIR / "style.css")
-    write_asset(SITE_DIR / "assets" / "fx.js", STATIC_DIR / "fx.js")
+    with span("build_site.assets"):
+        # テンプレートは指紋付きの URL を参照する（service_worker.py）
+        assets = write_assets(STATIC_DIR, out_dir / "assets")
 
     robots = f"""User-agent: *
 Allow: /
 
 Sitemap: {base_url}/sitemap.xml
 """
-    (SITE_DIR / "robots.txt").write_text(robots, encoding="utf-8")
+    (out_dir / "robots.txt").write_text(robots, encoding="utf-8")
 
     urls = [f"{base_url}/"] + [f"{base_url}{a['path']}" for a in articles]
     sitemap_items = "\n".join([f"<url><loc>{u}</loc></url>" for u in urls])
@@ -736,24 +547,60 @@ Sitemap: {base_url}/sitemap.xml
 {sitemap_items}
 </urlset>
 """
-    (SITE_DIR / "sitemap.xml").write_text(sitemap, encoding="utf-8")
+    (out_dir / "sitemap.xml").write_text(sitemap, encoding="utf-8")
+
+    jenv = jenv or env_for(TEMPLATES_DIR)
+    minify = bool(cfg.get("build", {}).get("minify_html", False))
+    inline_critical = bool(cfg.get("build", {}).get("critical_css", True))
+    service_worker = bool(cfg.get("build", {}).get("service_worker", True))
+    size_report = {"pages": 0, "raw_bytes": 0, "out_bytes": 0}
+    critical: dict[str, str] = {}  # テンプレートごとに最初のページから1回だけ抽出
+    image_meta = ImageMetaCache(state_dir / "image_meta.json")  # multisite はサイトごと（同時に save しない）
+
+    def _render(template_name: str, ctx: dict, out_path: Path) -> None:
+        if inline_critical:
+            if template_name not in critical:
+                with span("build_site.critical_css"):
+                    tpl = jenv.get_template(template_name)
+                    samples = [
+                        tpl.render(**{**ctx, **v, "a": {**ctx.get("a", {}), **v.get("a", {})}, "critical_css": ""})
+                        for v in CRITICAL_VARIANTS.get(template_name, [{}])
+                    ]
+                    critical[template_name] = critical_css((STATIC_DIR / "style.css").read_text(encoding="utf-8"), *samples)
+            ctx["critical_css"] = critical[template_name]
+        with span("build_site.render"):
+            raw, out = render_to_file(jenv, template_name, ctx, out_path, minify=minify)
+        size_report["pages"] += 1
+        size_report["raw_bytes"] += raw
+        size_report["out_bytes"] += out
+
+    # 派生フィールドが無い/古い記事だけここで埋める（保存はしない。data 側は derived --backfill で）
+    missing = ensure_derived(articles)
+    if missing:
+        print(f"[derived] computed on the fly for {missing} article(s); run: python -m nompower_pipeline.derived --backfill")
+    token_sets = {a.get("id"): set(a["title_tokens"]) for a in articles}
+
+    ranking = compute_rankings(articles)
+    new_articles = sorted(articles, key=lambda a: a.get("published_ts", ""), reverse=True)[:10]
 
-    jenv = env_for(TEMPLATES_DIR)
+    with span("build_site.rss"):
+        write_rss_feed(cfg, articles, limit=10, site_dir=out_dir)
 
-    ranking = compute_rankings(articles)[:10]
-    new_articles = sorted(articles, key=lambda a: a.get("published_ts", ""), reverse=True)[:10]
+    with span("build_site.feeds"):
+        fs = write_feeds(cfg, articles, out_dir, state_dir / "feed_state.json")
+    print(f"[feeds] head={fs['head']} pages={fs['pages']} written={fs['written']} full={fs['full']}")
 
-    write_rss_feed(cfg, articles, limit=10)
+    with span("build_site.search_index"):
+        st = write_search_index(articles, out_dir / "search", state_dir / "search_index_state.json")
+    print(f"[search] docs={st['docs']} shards={st['shards']} touched={st['touched']} full={st['full']}")
 
     base_ctx = {
         "site": cfg["site"],
         "ranking": ranking,
         "new_articles": new_articles,
-        "ads_top": ADS_TOP,
-        "ads_mid": ADS_MID,
-        "ads_bottom": ADS_BOTTOM,
-        "ads_rail_left": ads_rail_left,
-        "ads_rail_right": ads_rail_right,
+        **ad_slot_context(cfg),
+        "assets": assets,
+        "service_worker": service_worker,
         "now_iso": now_utc_iso(),
     }
 
@@ -768,7 +615,7 @@ Sitemap: {base_url}/sitemap.xml
             "og_image": "",  # ←空なら base.html 側で出さない
         }
     )
-    render_to_file(jenv, "index.html", ctx, SITE_DIR / "index.html")
+    _render("index.html", ctx, out_dir / "index.html")
 
     static_pages = [
         ("about", "About Nompower", "<p>Nompower is a daily digest that curates a single noteworthy Reddit item and adds commentary, context, and takeaways.</p>"),
@@ -791,14 +638,24 @@ Sitemap: {base_url}/sitemap.xml
                 "og_image": "",  # デフォルト無し
             }
         )
-        render_to_file(jenv, "static.html", ctx, SITE_DIR / f"{slug}.html")
+        _render("static.html", ctx, out_dir / f"{slug}.html")
 
     # 記事ページ：RSS画像がある記事だけ og:image を出す
     for a in articles:
-        rel = related_articles(a, articles, k=6)
+        with span("build_site.related"):
+            rel = related_articles(a, articles, k=6, token_sets=token_sets)
 
         src = a.get("hero_image", "") or ""
-        og_img = cache_og_image(base_url, src, a.get("id", "article"))
+        hero_src = src
+        if src and a.get("hero_dead"):
+            # 元画像が消えている（linkcheck.py）：site/og のコピーがあればそれを、無ければ出さない
+            cached = og_image_rel(src, a.get("id", "article"))
+            hero_src = cached if (out_dir / cached.lstrip("/")).exists() else ""
+            src = src if hero_src else ""
+        with span("build_site.og_image"):
+            og_img = cache_og_image(base_url, src, a.get("id", "article"), site_dir=out_dir)
+            # hero の width/height（キャッシュ済み画像のヘッダから）
+            hero_size = image_meta.size(out_dir / og_image_rel(src, a.get("id", "article")).lstrip("/"), src) if og_img else None
 
 
         ctx = dict(base_ctx)
@@ -814,57 +671,65 @@ Sitemap: {base_url}/sitemap.xml
                 "canonical": f"{base_url}{a['path']}",
                 "og_type": "article",
                 "og_image": og_img,  # ←ここが空ならメタは出ない（デフォルト無し）
+                "hero_src": hero_src,
+                "hero_size": hero_size,
+                "preload_image": hero_src,
             }
         )
-        render_to_file(jenv, "article.html", ctx, SITE_DIR / a["path"].lstrip("/"))
+        _render("article.html", ctx, out_dir / a["path"].lstrip("/"))
+    image_meta.save()
+
+    if service_worker:
+        with span("build_site.service_worker"):
+            sw = write_service_worker(out_dir, assets, STATIC_DIR, [a["path"] for a in articles])
+        print(f"[sw] build={sw['build']} precache={len(sw['precache'])}")
+    else:
+        (out_dir / "sw.js").unlink(missing_ok=True)
+
+    raw_b, out_b = size_report["raw_bytes"], size_report["out_bytes"]
+    saved = (1 - out_b / raw_b) * 100 if raw_b else 0.0
+    print(
+        f"[render] pages={size_report['pages']} minify={minify} "
+        f"raw={raw_b / 1024:.1f}KB out={out_b / 1024:.1f}KB saved={saved:.1f}%"
+    )
 
 
-def write_last_run(cfg: dict, payload: dict[str, Any]) -> None:
+def write_last_run(cfg: dict, payload: dict[str, Any], path: Path | None = None) -> None:
     base_url = cfg["site"]["base_url"].rstrip("/")
     out = {
         "updated_utc": now_utc_iso(),
         "homepage_url": base_url + "/",
         **payload,
+        "timings": TIMINGS.report(),
     }
-    write_json(LAST_RUN_PATH, out)
+    write_json(path or LAST_RUN_PATH, out)
 
 
-def main() -> None:
-    cfg = load_config()
-    base_url = cfg["site"]["base_url"].rstrip("/")
+def run(from_stage: str | None = None, run_id: str | None = None, fresh: bool = False) -> None:
+    run_site(from_stage=from_stage, run_id=run_id, fresh=fresh)
 
-    processed = load_processed()
-    articles = read_json(ARTICLES_PATH, default=[])
 
-    cand = pick_candidate(cfg, processed, articles)
-    if not cand:
-        build_site(cfg, articles)
-        write_last_run(
-            cfg,
-            {
-                "created": False,
-                "article_url": "",
-                "article_title": "",
-                "source_url": "",
-                "note": "No new candidate found. Site rebuilt.",
-            },
+def affiliate_for(cfg: dict, cand: dict, llm_title: str) -> tuple[str, str | None]:
+    from slugify import slugify
+
+    with span("affiliate"):
+        ads_catalog = load_ads_catalog()
+        affiliate_html, chosen_ad_id = build_affiliate_section(
+            article_id=f"{datetime.now(timezone.utc).strftime('%Y-%m-%d')}-{slugify(llm_title or cand['title'])[:80] or 'post'}",
+            title=llm_title or cand["title"],
+            summary=cand.get("summary", "") or "",
+            ads_catalog=ads_catalog,
+            base_url=cfg["site"]["base_url"].rstrip("/"),
         )
-        return
 
-    llm_title, body_html = deepseek_article(cfg, cand)
-    body_html = strip_leading_duplicate_title(body_html, llm_title or cand["title"])
+    print(f"[ads] chosen_ad_id={chosen_ad_id} affiliate_len={len(affiliate_html or '')}")
+    return affiliate_html, chosen_ad_id
 
 
-    ads_catalog = load_ads_catalog()
-    affiliate_html, chosen_ad_id = build_affiliate_section(
-        article_id=f"{datetime.now(timezone.utc).strftime('%Y-%m-%d')}-{slugify(llm_title or cand['title'])[:80] or 'post'}",
-        title=llm_title or cand["title"],
-        summary=cand.get("summary", "") or "",
-        ads_catalog=ads_catalog,
-        base_url=base_url,
-    )
+def assemble_entry(cand: dict, llm_title: str, body_html: str, affiliate_html: str) -> dict:
+    from slugify import slugify
 
-    print(f"[ads] chosen_ad_id={chosen_ad_id} affiliate_len={len(affiliate_html or '')}")
+    from nompower_pipeline.reddit import subreddit_from_url
 
     # Append affiliate section at the end of the article body (phase1)
     if affiliate_html:
@@ -875,7 +740,6 @@ def main() -> None:
     ymd = ts.strftime("%Y-%m-%d")
     slug =slugify(llm_title or cand['title'])[:80] or f"post-{int(ts.timestamp())}"
     path = f"/articles/{ymd}-{slug}.html"
-    article_url = base_url + path
 
     entry = {
         "id": f"{ymd}-{slug}",
@@ -889,24 +753,190 @@ def main() -> None:
         # ✅ RSSから拾った安全画像（i.redd.itのみ）。無ければ空で表示されない
         "hero_image": cand.get("image_url", "") or "",
         "hero_image_kind": cand.get("image_kind", "none") or "none",
+        # engagement.py が後で by_id から更新する
+        "subreddit": subreddit_from_url(cand["link"]),
+        "score": 0,
+        "comments": 0,
     }
-
-    append_processed(cand["link"])
-    articles.insert(0, entry)
-    write_json(ARTICLES_PATH, articles)
-
-    build_site(cfg, articles)
-
-    write_last_run(
-        cfg,
-        {
+    # excerpt / word_count / reading_minutes / title_tokens / genre / published_epoch
+    entry.update(derive_article_fields(entry))
+
+    return entry
+
+
+def make_article(cfg: dict, cand: dict, ds: DeepSeekClient | None = None) -> dict:
+    """LLM body + affiliate block + derived fields for one candidate (nothing is stored)."""
+    with span("deepseek_article"):
+        llm_title, body_html = deepseek_article(cfg, cand, ds=ds)
+    affiliate_html, _ = affiliate_for(cfg, cand, llm_title)
+    return assemble_entry(cand, llm_title, body_html, affiliate_html)
+
+
+def store_article(entry: dict, source_url: str, articles: list[dict], paths: SitePaths | None = None) -> None:
+    """Prepend entry to articles.json and mark source_url processed."""
+    paths = paths or SitePaths()
+    with span("store"):
+        append_processed(source_url, paths.processed)
+        # 同じ run を --from-stage でやり直したときに二重登録しない
+        articles[:] = [a for a in articles if a.get("source_url") != source_url]
+        articles.insert(0, entry)
+        write_json(paths.articles or ARTICLES_PATH, articles)
+
+
+def run_site(
+    paths: SitePaths | None = None,
+    *,
+    fetch=None,
+    ds: DeepSeekClient | None = None,
+    jenv=None,
+    from_stage: str | None = None,
+    run_id: str | None = None,
+    fresh: bool = False,
+) -> dict:
+    """
+    One pipeline run for one site, as checkpointed stages (see runs.py):
+    pick → llm → affiliate → store → build → last_run.
+    pick drains the candidate queue (candidate_queue.py), polling feeds only if it is empty.
+    An unfinished previous run is resumed from its first missing stage;
+    from_stage / run_id reopen a run, fresh forces a new one.
+    fetch / ds / jenv are shared across sites by multisite.py (None = create locally).
+    Returns the payload written to last_run.json.
+    """
+    paths = paths or SitePaths()
+    runs_dir = paths.runs or RUNS_DIR
+    queue_db = paths.queue or QUEUE_DB_PATH
+
+    with span("load_state"):
+        cfg = load_config(paths.config)
+        base_url = cfg["site"]["base_url"].rstrip("/")
+
+        processed = load_processed(paths.processed)
+        articles = read_json(paths.articles or ARTICLES_PATH, default=[])
+        run, how = open_run(runs_dir, run_id=run_id, from_stage=from_stage, fresh=fresh)
+    print(f"[run] {run.id} {how} done={','.join(run.state['completed']) or '-'}")
+
+    if run.needs("pick"):
+        with span("pick_candidate"):
+            cand = take_or_poll(queue_db, cfg, processed, articles, fetch=fetch)
+        run.write_json("candidate.json", cand)
+        run.complete("pick")
+    cand = run.read_json("candidate.json")
+
+    entry = None
+    if cand:
+        if run.needs("llm"):
+            if run.has("completion.txt"):
+                # 前回は parse 前に落ちた：課金済みの出力をそのまま使う
+                raw = run.read_text("completion.txt")
+            else:
+                with span("deepseek_article"):
+                    raw, usage = deepseek_completion(cfg, cand, ds=ds)
+                run.write_text("completion.txt", raw)
+                run.write_json("usage.json", usage)
+            llm_title, body_html = parse_completion(raw, cand)
+            run.write_json("body.json", {"title": llm_title, "body_html": body_html})
+            run.complete("llm")
+        body = run.read_json("body.json")
+
+        if run.needs("affiliate"):
+            affiliate_html, chosen_ad_id = affiliate_for(cfg, cand, body["title"])
+            run.write_json("affiliate.json", {"html": affiliate_html, "ad_id": chosen_ad_id})
+            run.complete("affiliate")
+        aff = run.read_json("affiliate.json")
+
+        if run.needs("store"):
+            entry = assemble_entry(cand, body["title"], body["body_html"], aff["html"])
+            store_article(entry, cand["link"], articles, paths)
+            mark_generated(queue_db, cand["link"])
+            run.write_json("entry.json", entry)
+            run.complete("store")
+        entry = run.read_json("entry.json")
+
+    if run.needs("build"):
+        with span("build_site"):
+            build_site(cfg, articles, site_dir=paths.site_dir, jenv=jenv,
+                       state_dir=paths.articles.parent if paths.articles else None)
+        run.complete("build")
+
+    if entry:
+        payload = {
             "created": True,
-            "article_url": article_url,
-            "article_path": path,
+            "article_url": base_url + entry["path"],
+            "article_path": entry["path"],
             "article_title": cand["title"],
             "source_url": cand["link"],
-        },
-    )
+        }
+    else:
+        payload = {
+            "created": False,
+            "article_url": "",
+            "article_title": "",
+            "source_url": "",
+            "note": "No new candidate found. Site rebuilt.",
+        }
+    payload.update({"articles": len(articles), "run_id": run.id})
+    if cand and run.has("usage.json"):
+        payload["llm_usage"] = run.read_json("usage.json")
+
+    if run.needs("last_run"):
+        write_last_run(cfg, payload, paths.last_run)
+        run.complete("last_run")
+        prune_runs(runs_dir)
+    return payload
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.generate")
+    ap.add_argument("--profile", nargs="?", const=str(ROOT / "data" / "profile.pstats"), default=None,
+                    help="dump cProfile stats to this path (default: data/profile.pstats)")
+    ap.add_argument("--trace-memory", nargs="?", type=int, const=15, default=0, metavar="N",
+                    help="record the top N allocation sites with tracemalloc")
+    ap.add_argument("--from-stage", choices=STAGES, default=None,
+                    help="rerun a checkpointed run (latest, or --run-id) starting at this stage")
+    ap.add_argument("--run-id", default=None, help="data/runs/<run-id> to resume or rerun")
+    ap.add_argument("--new-run", action="store_true", help="start a new run even if the last one is unfinished")
+    args = ap.parse_args(argv)
+    run_opts = {"from_stage": args.from_stage, "run_id": args.run_id, "fresh": args.new_run}
+
+    flush_at_exit("generate")
+
+    prof = None
+    if args.profile:
+        import cProfile
+        prof = cProfile.Profile()
+    if args.trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    completed = False
+    try:
+        if prof:
+            prof.runcall(run, **run_opts)
+        else:
+            run(**run_opts)
+        completed = True
+    finally:
+        extra: dict[str, Any] = {}
+        if args.trace_memory:
+            snap = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            extra["memory_peak_kb"] = round(peak / 1024, 1)
+            extra["memory_top"] = memory_top(snap, limit=args.trace_memory)
+        if prof:
+            import pstats
+            Path(args.profile).parent.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(args.profile)
+            pstats.Stats(prof).sort_stats("cumulative").print_stats(25)
+            extra["profile_path"] = str(args.profile)
+
+        print("[timings]")
+        for line in TIMINGS.summary_lines():
+            print("  " + line)
+
+        # 失敗時は前回の last_run.json に混ぜない
+        if extra and completed and LAST_RUN_PATH.exists():
+            write_json(LAST_RUN_PATH, {**read_json(LAST_RUN_PATH, default={}), **extra})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+# nompower_pipeline/github_api.py
+"""
+Minimal GitHub REST helpers for the Mastodon worker.
+
+latest_issue_comment() goes straight to the last page of an issue's
+comments (via the Link header) and remembers that page's URL + ETag in
+data/github_cache.json. Reruns send If-None-Match, and a 304 costs no rate
+limit, so an unchanged issue is one free request. The last handled comment
+id is kept in the same file so the worker can skip work it already did.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+import os
+import re
+
+from .endpoints import github_api_base
+from .http import shared_session
+from .util import ROOT, read_json, write_json
+
+CACHE_PATH = ROOT / "data" / "github_cache.json"
+PER_PAGE = 100
+
+_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+
+def parse_link_header(value: str) -> dict[str, str]:
+    return {rel: url for url, rel in _LINK_RE.findall(value or "")}
+
+
+def _headers(token: str, etag: str = "") -> dict[str, str]:
+    h = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+    if token:
+        h["Authorization"] = f"Bearer {token}"
+    if etag:
+        h["If-None-Match"] = etag
+    return h
+
+
+def _with_page(url: str, page: int) -> str:
+    if re.search(r"[?&]page=\d+", url):
+        return re.sub(r"([?&]page=)\d+", rf"\g<1>{page}", url)
+    return url + ("&" if "?" in url else "?") + f"page={page}"
+
+
+def _page_no(url: str) -> int:
+    m = re.search(r"[?&]page=(\d+)", url)
+    return int(m.group(1)) if m else 1
+
+
+def _slim(c: dict) -> dict:
+    return {"id": c.get("id"), "created_at": c.get("created_at", ""), "body": c.get("body", "") or ""}
+
+
+def latest_issue_comment(
+    repo: str,
+    issue: int | str,
+    token: str | None = None,
+    cache_path: Path = CACHE_PATH,
+    stats: dict[str, int] | None = None,
+) -> dict | None:
+    """
+    Return {"id", "created_at", "body"} of the newest comment, or None.
+    stats (optional) counts "requests" and "not_modified".
+    """
+    token = token if token is not None else os.getenv("GITHUB_TOKEN", "")
+    key = f"{repo}#{issue}"
+    cache = read_json(cache_path, default={})
+    ent: dict[str, Any] = cache.get(key) or {}
+    sess = shared_session()
+    stats = stats if stats is not None else {}
+
+    def get(url: str, etag: str = ""):
+        stats["requests"] = stats.get("requests", 0) + 1
+        r = sess.get(url, headers=_headers(token, etag), timeout=20)
+        if r.status_code == 304:
+            stats["not_modified"] = stats.get("not_modified", 0) + 1
+            return r
+        r.raise_for_status()
+        return r
+
+    def fresh() -> tuple[str, Any]:
+        first = f"{github_api_base()}/repos/{repo}/issues/{issue}/comments?per_page={PER_PAGE}&page=1"
+        r = get(first)
+        last_url = parse_link_header(r.headers.get("Link", "")).get("last")
+        if last_url and last_url != first:
+            r = get(last_url)
+            return last_url, r
+        return first, r
+
+    url, etag = ent.get("last_url", ""), ent.get("etag", "")
+    if url and etag:
+        r = get(url, etag)
+        if r.status_code == 304 and ent.get("count", 0) >= PER_PAGE:
+            # キャッシュしたページが満杯なら、次のページに新しいコメントが載っているかも
+            nxt = _with_page(url, _page_no(url) + 1)
+            r2 = get(nxt)
+            if r2.json():
+                url, r = nxt, r2
+        if r.status_code == 200:
+            links = parse_link_header(r.headers.get("Link", ""))
+            if "next" in links and "last" in links:
+                url, r = links["last"], get(links["last"])  # 最終ページではなくなっていた
+            elif not r.json():
+                url, r = fresh()  # 削除などでページが空 → 取り直し
+    else:
+        url, r = fresh()
+
+    if r.status_code == 200:
+        items = r.json()
+        ent.update(
+            {
+                "last_url": url,
+                "etag": r.headers.get("ETag", ""),
+                "count": len(items),
+                "latest": _slim(items[-1]) if items else None,
+            }
+        )
+        cache[key] = ent
+        write_json(cache_path, cache)
+
+    return ent.get("latest")
+
+
+def is_handled(repo: str, issue: int | str, comment_id: Any, cache_path: Path = CACHE_PATH) -> bool:
+    ent = read_json(cache_path, default={}).get(f"{repo}#{issue}") or {}
+    return comment_id is not None and ent.get("handled_id") == comment_id
+
+
+def mark_handled(repo: str, issue: int | str, comment_id: Any, cache_path: Path = CACHE_PATH) -> None:
+    cache = read_json(cache_path, default={})
+    cache.setdefault(f"{repo}#{issue}", {})["handled_id"] = comment_id
+    write_json(cache_path, cache)
@@ -0,0 +1,182 @@
+# nompower_pipeline/hedge.py
+"""
+Hedged DeepSeek calls: cut the tail latency of the one paid request per run.
+
+The primary request is sent; if it has not returned after a deadline
+(a latency percentile of recent calls to that model), a second request is
+fired — to generation.hedge.fallback_model, or the same model — and
+whichever finishes first wins. A primary that fails before the deadline
+fires the second request immediately instead of aborting the run.
+
+config.json (all optional; hedging is off unless enabled):
+
+  "generation": {
+    "hedge": {
+      "enabled": true,
+      "percentile": 90,        deadline = p90 of recent latencies …
+      "min_samples": 5,        … once this many are recorded, else default_s
+      "default_s": 25,
+      "min_s": 8, "max_s": 45, clamp
+      "fallback_model": ""     "" = same model
+    }
+  }
+
+Latencies are kept per model in data/llm_latency.json (last KEEP_SAMPLES,
+shared by every site of a multisite run). A request that lost the race is
+recorded with its elapsed time at that point — a lower bound — so the
+percentile does not drift down to only the winners.
+
+While hedging, both requests are streamed (DeepSeekClient.chat_full with
+cancel=). Once one wins, the other's cancel event is set: its thread
+closes the connection at the next keep-alive or token, DeepSeek stops
+generating it, and the thread ends instead of holding the interpreter at
+exit until the paid completion has finished.
+"""
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+import os
+import threading
+import time
+
+from nompower_pipeline.util import ROOT, percentile, read_json, write_json
+
+if TYPE_CHECKING:
+    from nompower_pipeline.deepseek import DeepSeekClient
+
+LATENCY_PATH = ROOT / "data" / "llm_latency.json"
+KEEP_SAMPLES = 50
+
+DEFAULTS: dict[str, Any] = {
+    "enabled": False,
+    "percentile": 90,
+    "min_samples": 5,
+    "default_s": 25.0,
+    "min_s": 8.0,
+    "max_s": 45.0,
+    "fallback_model": "",
+}
+
+_lock = threading.Lock()  # multisite のスレッド間で llm_latency.json を守る
+
+
+def hedge_config(cfg: dict) -> dict[str, Any]:
+    return {**DEFAULTS, **((cfg.get("generation") or {}).get("hedge") or {})}
+
+
+def record_latency(model: str, seconds: float, path: Path | None = None) -> None:
+    path = path or LATENCY_PATH
+    with _lock:
+        data = read_json(path, default={})
+        m = data.setdefault(model, {"samples": []})
+        m["samples"] = (m["samples"] + [round(seconds, 3)])[-KEEP_SAMPLES:]
+        s = m["samples"]
+        m.update(n=len(s), p50=percentile(s, 50), p90=percentile(s, 90), p99=percentile(s, 99))
+        tmp = path.with_suffix(".json.tmp")
+        write_json(tmp, data)
+        os.replace(tmp, path)
+
+
+def hedge_deadline(model: str, hcfg: dict[str, Any], path: Path | None = None) -> float:
+    path = path or LATENCY_PATH
+    with _lock:
+        samples = (read_json(path, default={}).get(model) or {}).get("samples") or []
+    if len(samples) < int(hcfg["min_samples"]):
+        d = float(hcfg["default_s"])
+    else:
+        d = percentile(samples, float(hcfg["percentile"]))
+    return max(float(hcfg["min_s"]), min(float(hcfg["max_s"]), d))
+
+
+def _sibling(ds: DeepSeekClient) -> DeepSeekClient:
+    # 2本目は別 Session（負けた方を放置しても1本目の接続プールを汚さない）
+    return type(ds)(api_key=ds.api_key, base_url=ds.base_url, max_retries=ds.max_retries, backoff_s=ds.backoff_s)
+
+
+def hedged_chat(
+    ds: DeepSeekClient,
+    cfg: dict,
+    model: str,
+    messages: list[dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    latency_path: Path | None = None,
+) -> tuple[str, dict[str, Any], dict[str, Any]]:
+    """
+    ds.chat_full with the hedging policy from config.json.
+    Returns (content, usage, info); info = {model, latency_s, hedge: {...}}.
+    """
+    hcfg = hedge_config(cfg)
+
+    def call(client: DeepSeekClient, m: str, cancel: threading.Event | None = None) -> tuple[str, dict[str, int], float]:
+        t0 = time.perf_counter()
+        content, usage = client.chat_full(model=m, messages=messages, temperature=temperature, max_tokens=max_tokens, cancel=cancel)
+        return content, usage, time.perf_counter() - t0
+
+    if not hcfg["enabled"]:
+        content, usage, dt = call(ds, model)
+        record_latency(model, dt, latency_path)
+        return content, usage, {"model": model, "latency_s": round(dt, 3), "hedge": None}
+
+    deadline = hedge_deadline(model, hcfg, latency_path)
+    second_model = hcfg["fallback_model"] or model
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+    cancels: dict[Future, threading.Event] = {}
+
+    def submit(client: DeepSeekClient, m: str) -> Future:
+        ev = threading.Event()
+        fut = pool.submit(call, client, m, ev)
+        cancels[fut] = ev
+        return fut
+
+    t0 = time.perf_counter()
+    try:
+        futs: dict[Future, tuple[str, str, float]] = {submit(ds, model): ("primary", model, t0)}
+        done, _ = wait(futs, timeout=deadline)
+        fired = ""
+        primary_error: BaseException | None = None
+        if not done:
+            fired = "deadline"
+        else:
+            fut = next(iter(done))
+            primary_error = fut.exception()
+            if primary_error is None:
+                content, usage, dt = fut.result()
+                record_latency(model, dt, latency_path)
+                return content, usage, {"model": model, "latency_s": round(dt, 3),
+                                        "hedge": {"deadline_s": round(deadline, 3), "fired": "", "winner": "primary"}}
+            fired = "error"
+            print(f"[hedge] primary {model} failed ({type(primary_error).__name__}); trying {second_model}")
+        if fired == "deadline":
+            print(f"[hedge] primary {model} > {deadline:.1f}s; firing {second_model}")
+        futs[submit(_sibling(ds), second_model)] = ("hedge", second_model, time.perf_counter())
+
+        pending = {f for f in futs if not f.done()}
+        errors: list[BaseException] = [primary_error] if primary_error else []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                err = fut.exception()
+                if err is not None:
+                    errors.append(err)
+                    continue
+                content, usage, dt = fut.result()
+                winner, wmodel, _ = futs[fut]
+                record_latency(wmodel, dt, latency_path)
+                now = time.perf_counter()
+                for other in pending:
+                    # 打ち切った側は「少なくともこれだけ掛かった」として記録
+                    _, omodel, started = futs[other]
+                    record_latency(omodel, now - started, latency_path)
+                    print(f"[hedge] cancelling {futs[other][0]} ({omodel})")
+                elapsed = now - t0
+                print(f"[hedge] {winner} ({wmodel}) won in {dt:.2f}s")
+                return content, usage, {"model": wmodel, "latency_s": round(elapsed, 3),
+                                        "hedge": {"deadline_s": round(deadline, 3), "fired": fired, "winner": winner}}
+        raise errors[0]
+    finally:
+        for ev in cancels.values():
+            ev.set()  # 負けた側は次の keep-alive / トークンで接続を閉じて終わる
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+# nompower_pipeline/http.py
+from __future__ import annotations
+
+from typing import Any
+from urllib.parse import urlparse
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ratelimit import LIMITER
+from .telemetry import HTTP_METRICS
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_shared: requests.Session | None = None
+
+
+class MeteredSession(requests.Session):
+    """
+    Session that waits for the host's token bucket (ratelimit.LIMITER) and
+    records every request into telemetry.HTTP_METRICS (host, status, latency
+    incl. urllib3 retries and body download, bytes). A 429 pauses the bucket.
+    """
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> requests.Response:
+        host = urlparse(url).netloc
+        LIMITER.acquire(host)
+        t0 = time.perf_counter()
+        try:
+            r = super().request(method, url, *args, **kwargs)
+        except requests.RequestException as e:
+            HTTP_METRICS.record(host, type(e).__name__, time.perf_counter() - t0)
+            raise
+        if r.status_code == 429:
+            LIMITER.pause(host, _retry_after(r))
+        # stream=True のときは本文を読まない（Content-Length だけ）
+        size = int(r.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(r.content)
+        body = r.request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        history = getattr(getattr(r.raw, "retries", None), "history", None) or ()
+        HTTP_METRICS.record(
+            host, r.status_code, time.perf_counter() - t0,
+            bytes_in=size, bytes_out=len(body) if isinstance(body, bytes) else 0, retries=len(history),
+        )
+        return r
+
+
+def _retry_after(r: requests.Response, default_s: float = 30.0) -> float:
+    try:
+        return float(r.headers.get("Retry-After", ""))
+    except ValueError:
+        return default_s  # HTTP-date 形式や無指定
+
+
+def make_session(retries: int = 3, backoff_s: float = 1.0, pool_size: int = 10, retry_post: bool = False) -> requests.Session:
+    """
+    Session with a keep-alive connection pool and urllib3 retries.
+    retry_post=True retries POST too — only for endpoints that are safe to
+    repeat (e.g. Mastodon statuses with an Idempotency-Key).
+    """
+    methods = None if retry_post else Retry.DEFAULT_ALLOWED_METHODS  # None = 全メソッド
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_s,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    s = MeteredSession()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"User-Agent": "nompower-pipeline/1.0"})
+    return s
+
+
+def shared_session() -> requests.Session:
+    """Process-wide session for GETs (reddit/GitHub/images); created on first use."""
+    global _shared
+    if _shared is None:
+        _shared = make_session()
+    return _shared
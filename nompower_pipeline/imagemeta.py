@@ -0,0 +1,119 @@
+# nompower_pipeline/imagemeta.py
+"""
+Pixel size of cached images (site/og/*), read from the file header only
+(the first HEADER_BYTES; a JPEG whose SOF marker sits further in, behind
+a large EXIF block, yields None).
+
+Used to emit width/height on the article hero image so the browser can
+reserve its box before the image arrives (no layout shift). PNG, GIF,
+JPEG and WebP are understood; anything else yields None.
+
+Results are memoized in data/image_meta.json keyed by the source image
+URL and checked against the file's byte length, so a file that is
+downloaded again (CI builds site/og/ from scratch) is only stat'ed, not
+parsed. build_site keeps one cache per state_dir (data/ for the main
+site, each data_dir under multisite), so concurrent site builds never
+share the file. The daily workflow commits data/image_meta.json.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import struct
+
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+META_PATH = ROOT / "data" / "image_meta.json"
+
+HEADER_BYTES = 65536  # PNG/GIF/WebP は先頭数十バイト、JPEG の SOF もほぼこの中
+
+# JPEG の SOFn（DHT/JPG/DAC は除く）
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_size(data: bytes) -> tuple[int, int] | None:
+    """(width, height) from the image header, or None if unknown/corrupt."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24 and data[12:16] == b"IHDR":
+        w, h = struct.unpack(">II", data[16:24])
+        return (w, h)
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        w, h = struct.unpack("<HH", data[6:10])
+        return (w, h)
+    if data[:2] == b"\xff\xd8":
+        return _jpeg_size(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _webp_size(data)
+    return None
+
+
+def _jpeg_size(data: bytes) -> tuple[int, int] | None:
+    i = 2
+    n = len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # 長さ無しのマーカー
+            i += 2
+            continue
+        seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in _JPEG_SOF:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return (w, h)
+        i += 2 + seg_len
+    return None
+
+
+def _webp_size(data: bytes) -> tuple[int, int] | None:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        w, h = struct.unpack("<HH", data[26:30])
+        return (w & 0x3FFF, h & 0x3FFF)
+    if chunk == b"VP8L" and len(data) >= 25:
+        b = data[21:25]
+        w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+        h = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+        return (w, h)
+    if chunk == b"VP8X" and len(data) >= 30:
+        w = 1 + int.from_bytes(data[24:27], "little")
+        h = 1 + int.from_bytes(data[27:30], "little")
+        return (w, h)
+    return None
+
+
+class ImageMetaCache:
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or META_PATH
+        self.meta: dict[str, dict] = read_json(self.path, default={})
+        self.dirty = False
+
+    def size(self, file: Path, url: str) -> tuple[int, int] | None:
+        """Size of the cached copy (file) of the image at url."""
+        try:
+            n = file.stat().st_size
+        except OSError:
+            return None
+        m = self.meta.get(url)
+        if m and m["bytes"] == n:
+            return (m["w"], m["h"]) if m.get("w") else None
+        try:
+            with file.open("rb") as f:
+                wh = image_size(f.read(HEADER_BYTES))
+        except OSError:
+            return None
+        self.meta[url] = {"bytes": n, "w": wh[0] if wh else 0, "h": wh[1] if wh else 0}
+        self.dirty = True
+        return wh
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp = self.path.with_suffix(".json.tmp")
+        write_json(tmp, self.meta)
+        os.replace(tmp, self.path)
+        self.dirty = False
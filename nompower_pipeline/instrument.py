@@ -0,0 +1,79 @@
+# nompower_pipeline/instrument.py
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Any, Iterator
+import threading
+import time
+
+
+class Timings:
+    """
+    Tiny span recorder: with timings.span("build_site.render"): ...
+    Aggregates count / total / max per span name (thread-safe).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: dict[str, dict[str, float]] = {}
+        self._order: list[str] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            s = self._spans.get(name)
+            if s is None:
+                s = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+                self._spans[name] = s
+                self._order.append(name)
+            s["count"] += 1
+            s["total_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._order.clear()
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "count": int(self._spans[name]["count"]),
+                    "total_s": round(self._spans[name]["total_s"], 4),
+                    "max_s": round(self._spans[name]["max_s"], 4),
+                }
+                for name in self._order
+            }
+
+    def summary_lines(self) -> list[str]:
+        rep = self.report()
+        width = max((len(n) for n in rep), default=0)
+        return [
+            f"{n.ljust(width)}  n={r['count']:<4} total={r['total_s']:.3f}s max={r['max_s']:.3f}s"
+            for n, r in rep.items()
+        ]
+
+
+# process-wide default recorder
+TIMINGS = Timings()
+
+
+def span(name: str):
+    return TIMINGS.span(name)
+
+
+def memory_top(snapshot: Any, limit: int = 15) -> list[dict[str, Any]]:
+    """Summarize a tracemalloc snapshot by source line."""
+    out = []
+    for st in snapshot.statistics("lineno")[:limit]:
+        frame = st.traceback[0]
+        out.append({"where": f"{frame.filename}:{frame.lineno}", "size_kb": round(st.size / 1024, 1), "count": st.count})
+    return out
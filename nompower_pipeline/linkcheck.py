@@ -0,0 +1,274 @@
+# nompower_pipeline/linkcheck.py
+"""
+Health check for the archive's outbound links (source_url, hero_image).
+
+Each run looks at only a slice of the archive: URLs never checked first,
+then the ones whose last result is oldest, skipping any checked within
+their TTL (ttl_h for live links, dead_ttl_h for dead / unknown ones).
+
+Reddit post URLs (source_url of almost every article) are not fetched:
+a removed post's permalink still answers 200 with a "[removed]" page.
+They are looked up through /by_id instead, BY_ID_MAX per request
+(reddit.fetch_by_id, the same call engagement.py makes, which records its
+answers here too). Outcome per post:
+
+  ok       returned and not removed
+  dead     missing from the answer, removed_by_category set, or a
+           "[deleted]" author (status "missing" / "removed")
+  unknown  the batch request failed
+
+Every other URL (i.redd.it hero images, non-Reddit sources) is probed, at
+most max_per_run per run, concurrently on `workers` threads through the
+shared HTTP layer (so the per-host rate limits in ratelimit.py apply).
+A probe is HEAD first. It falls back to a streamed GET (body not
+downloaded) when HEAD says nothing useful: 400 / 403 / 405 / 501 or a
+connection error. Outcome per URL:
+
+  ok       2xx / 3xx
+  dead     404 / 410 (or a host that no longer resolves)
+  unknown  anything else (timeouts, 5xx, 429, bot blocks) — not counted
+
+A /by_id "dead" is Reddit's own answer and flags the article at once. A
+probed link is flagged only after dead_after consecutive dead results, so
+a brief outage never hides anything. Results live in data/link_health.json:
+
+  {"<url>": {"state": "ok", "status": 200, "method": "HEAD",
+             "checked": 1760000000, "dead_runs": 0}}
+
+Flags written to articles.json (removed again once a link recovers):
+
+  source_dead   build_site replaces the "Open source" link with a note
+  hero_dead     build_site serves the cached copy in site/og/, or no hero
+
+config.json (optional):
+
+  "linkcheck": {"workers": 8, "max_per_run": 40, "ttl_h": 168, "dead_ttl_h": 24, "dead_after": 2}
+
+  python -m nompower_pipeline.linkcheck [--max N] [--dry-run]
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+import argparse
+
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+ARTICLES_PATH = ROOT / "data" / "articles.json"
+CONFIG_PATH = ROOT / "nompower_pipeline" / "config.json"
+HEALTH_PATH = ROOT / "data" / "link_health.json"
+
+DEFAULTS: dict[str, Any] = {"workers": 8, "max_per_run": 40, "ttl_h": 168, "dead_ttl_h": 24, "dead_after": 2}
+LINK_FIELDS = {"source_url": "source_dead", "hero_image": "hero_dead"}
+
+DEAD_STATUSES = {404, 410}
+GET_FALLBACK_STATUSES = {400, 403, 405, 501}
+
+BY_ID_MAX = 100  # reddit.BY_ID_MAX と同じ（requests を import しないため）
+
+# url → (state, status, method)
+Probe = Callable[[str], tuple[str, "int | str", str]]
+# fullnames → reddit.parse_by_id の形（テストではフェイクサーバ/固定データ）
+ByIdFetch = Callable[[list[str]], dict[str, dict]]
+
+
+def _now_epoch() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def linkcheck_config(cfg: dict) -> dict[str, Any]:
+    return {**DEFAULTS, **(cfg.get("linkcheck") or {})}
+
+
+def classify(status: int) -> str:
+    if 200 <= status < 400:
+        return "ok"
+    return "dead" if status in DEAD_STATUSES else "unknown"
+
+
+def http_probe(session: Any = None, timeout: float = 15, workers: int = DEFAULTS["workers"]) -> Probe:
+    """HEAD, then a streamed GET when HEAD is inconclusive."""
+    import requests
+
+    from nompower_pipeline.endpoints import rebase_url
+    from nompower_pipeline.http import make_session
+
+    session = session or make_session(retries=0, pool_size=max(10, workers))
+    headers = {"User-Agent": "Mozilla/5.0 (compatible; NompowerBot/1.0; +https://nompower.mikanntool.com/)"}
+
+    def probe(url: str) -> tuple[str, int | str, str]:
+        target = rebase_url(url)
+        try:
+            r = session.head(target, headers=headers, timeout=timeout, allow_redirects=True)
+            if r.status_code not in GET_FALLBACK_STATUSES:
+                return classify(r.status_code), r.status_code, "HEAD"
+        except requests.RequestException:
+            pass  # GET で確かめる
+        try:
+            with session.get(target, headers=headers, timeout=timeout, stream=True, allow_redirects=True) as r:
+                return classify(r.status_code), r.status_code, "GET"
+        except requests.ConnectionError as e:
+            # 名前解決できない = ホストごと消えた
+            dns = "Name or service not known" in str(e) or "nodename nor servname" in str(e)
+            return ("dead" if dns else "unknown"), type(e).__name__, "GET"
+        except requests.RequestException as e:
+            return "unknown", type(e).__name__, "GET"
+
+    return probe
+
+
+def due_urls(articles: list[dict], health: dict[str, dict], lc: dict[str, Any], now: int) -> list[str]:
+    """URLs to check this run: unchecked first, then oldest result; TTL-fresh ones skipped."""
+    seen: dict[str, int] = {}
+    for a in articles:
+        for field in LINK_FIELDS:
+            url = (a.get(field) or "").strip()
+            if not url.startswith(("http://", "https://")) or url in seen:
+                continue
+            h = health.get(url)
+            if h is None:
+                seen[url] = 0
+                continue
+            ttl_h = lc["ttl_h"] if h.get("state") == "ok" else lc["dead_ttl_h"]
+            if now - int(h.get("checked", 0)) >= ttl_h * 3600:
+                seen[url] = int(h.get("checked", 0))
+    return sorted(seen, key=lambda u: seen[u])
+
+
+def _record(health: dict[str, dict], url: str, state: str, status: int | str, method: str, now: int) -> None:
+    prev = health.get(url) or {}
+    dead_runs = prev.get("dead_runs", 0) + 1 if state == "dead" else (prev.get("dead_runs", 0) if state == "unknown" else 0)
+    health[url] = {"state": state, "status": status, "method": method, "checked": now, "dead_runs": dead_runs}
+
+
+def check_links(urls: list[str], health: dict[str, dict], probe: Probe, workers: int, now: int) -> dict[str, int]:
+    """Probe urls concurrently and record the results in health (in place)."""
+    stats = {"checked": 0, "ok": 0, "dead": 0, "unknown": 0}
+    if not urls:
+        return stats
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="linkcheck") as pool:
+        for url, (state, status, method) in zip(urls, pool.map(probe, urls)):
+            _record(health, url, state, status, method, now)
+            stats["checked"] += 1
+            stats[state] += 1
+    return stats
+
+
+def record_by_id(health: dict[str, dict], urls: list[str], got: dict[str, dict], now: int) -> dict[str, int]:
+    """Record one /by_id answer (reddit.parse_by_id) for the post URLs asked about."""
+    from nompower_pipeline.reddit import post_fullname
+
+    stats = {"checked": 0, "ok": 0, "dead": 0, "unknown": 0}
+    for url in urls:
+        d = got.get(post_fullname(url))
+        if d is None:
+            state, status = "dead", "missing"
+        elif d.get("removed"):
+            state, status = "dead", "removed"
+        else:
+            state, status = "ok", "live"
+        _record(health, url.strip(), state, status, "by_id", now)
+        stats["checked"] += 1
+        stats[state] += 1
+    return stats
+
+
+def check_posts(urls: list[str], health: dict[str, dict], fetch: ByIdFetch, now: int) -> dict[str, int]:
+    """Look Reddit post URLs up through /by_id, BY_ID_MAX per request, and record the results in health."""
+    from nompower_pipeline.reddit import post_fullname
+
+    stats = {"checked": 0, "ok": 0, "dead": 0, "unknown": 0}
+    for i in range(0, len(urls), BY_ID_MAX):
+        batch = urls[i:i + BY_ID_MAX]
+        try:
+            got = fetch([post_fullname(u) for u in batch])
+        except Exception as e:  # noqa: BLE001  1バッチ失敗しても残りは続ける
+            print(f"[linkcheck] by_id batch {i // BY_ID_MAX + 1} failed: {e}")
+            for url in batch:
+                _record(health, url, "unknown", type(e).__name__, "by_id", now)
+            stats["checked"] += len(batch)
+            stats["unknown"] += len(batch)
+            continue
+        for k, v in record_by_id(health, batch, got, now).items():
+            stats[k] += v
+    return stats
+
+
+def apply_flags(articles: list[dict], health: dict[str, dict], dead_after: int) -> int:
+    """Set / clear source_dead and hero_dead from health. Returns the number of articles changed."""
+    changed = 0
+    for a in articles:
+        before = {flag: a.get(flag, False) for flag in LINK_FIELDS.values()}
+        for field, flag in LINK_FIELDS.items():
+            h = health.get((a.get(field) or "").strip())
+            if h is None:
+                continue
+            if h["dead_runs"] >= dead_after or (h["state"] == "dead" and h.get("method") == "by_id"):
+                a[flag] = True
+            elif h["state"] == "ok":
+                a.pop(flag, None)
+        if before != {flag: a.get(flag, False) for flag in LINK_FIELDS.values()}:
+            changed += 1
+    return changed
+
+
+def run_linkcheck(
+    articles: list[dict],
+    cfg: dict,
+    probe: Probe | None = None,
+    by_id: ByIdFetch | None = None,
+    health_path: Path | None = None,
+    max_per_run: int | None = None,
+    now: int | None = None,
+    save: bool = True,
+) -> dict[str, int]:
+    """Check a slice of the archive, update the cache and the article flags (in place)."""
+    from nompower_pipeline.reddit import fetch_by_id, post_fullname
+
+    lc = linkcheck_config(cfg)
+    if max_per_run is not None:
+        lc["max_per_run"] = max_per_run
+    now = now or _now_epoch()
+    health = read_json(health_path or HEALTH_PATH, default={}) or {}
+    # 記事から消えた URL の結果は捨てる
+    live = {(a.get(f) or "").strip() for a in articles for f in LINK_FIELDS}
+    health = {u: h for u, h in health.items() if u in live}
+    due = due_urls(articles, health, lc, now)
+    sources = {(a.get("source_url") or "").strip() for a in articles}
+    # Reddit の投稿は by_id でまとめて（1リクエスト100件なので max_per_run の対象外）
+    posts = [u for u in due if u in sources and post_fullname(u)]
+    urls = [u for u in due if not (u in sources and post_fullname(u))][: int(lc["max_per_run"])]
+    workers = int(lc["workers"])
+    stats = check_links(urls, health, probe or http_probe(workers=workers), workers, now)
+    for k, v in check_posts(posts, health, by_id or fetch_by_id, now).items():
+        stats[k] += v
+    stats["flag_changes"] = apply_flags(articles, health, int(lc["dead_after"]))
+    stats["source_dead"] = sum(1 for a in articles if a.get("source_dead"))
+    stats["hero_dead"] = sum(1 for a in articles if a.get("hero_dead"))
+    if save:
+        write_json(health_path or HEALTH_PATH, health)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.linkcheck")
+    ap.add_argument("--max", type=int, default=None, help="probe at most N URLs this run (default: config)")
+    ap.add_argument("--dry-run", action="store_true", help="probe and report, write nothing")
+    args = ap.parse_args(argv)
+
+    from nompower_pipeline.telemetry import flush_at_exit
+
+    flush_at_exit("linkcheck")
+    cfg = read_json(CONFIG_PATH, default=None) or {}
+    articles = read_json(ARTICLES_PATH, default=[])
+    st = run_linkcheck(articles, cfg, max_per_run=args.max, save=not args.dry_run)
+    print(f"[linkcheck] checked={st['checked']} ok={st['ok']} dead={st['dead']} unknown={st['unknown']} "
+          f"flag_changes={st['flag_changes']} source_dead={st['source_dead']} hero_dead={st['hero_dead']}")
+    if st["flag_changes"] and not args.dry_run:
+        write_json(ARTICLES_PATH, articles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# nompower_pipeline/mastodon.py
+"""
+Shared Mastodon posting helpers for scripts/mastodon_*.py.
+
+- post texts come from DeepSeekClient; both are generated concurrently up front
+- statuses go through one pooled session with retries; every POST carries an
+  Idempotency-Key so a retried request returns the original toot
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+
+import requests
+
+from .deepseek import DeepSeekClient
+from .http import make_session
+
+MODEL = "deepseek-chat"
+
+FUN_PROMPT = (
+    "Write a short, funny, very human English Mastodon post.\n"
+    "Daily life vibe, casual, slightly chaotic, like a real person.\n"
+    "Make it genuinely amusing.\n"
+    "No links. No hashtags. No promotion. No mention of AI.\n"
+    "Length: 1-3 short sentences.\n"
+)
+
+
+def link_prompt(article_title: str) -> str:
+    return (
+        "Write ONE short, very human-sounding English sentence for a Mastodon post.\n"
+        "It should feel like a real person casually posting.\n"
+        "Tone: witty, everyday-life vibe, slightly playful.\n"
+        "Do NOT include any links, URLs, hashtags, emojis are optional (0-1 max).\n"
+        "Do NOT mention AI.\n"
+        "Keep it under 140 characters.\n\n"
+        f"Context (article title): {article_title}\n"
+    )
+
+
+def clean_one_liner(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().strip('"').strip("'")
+
+
+class MastodonClient:
+    def __init__(self, base_url: str | None = None, token: str | None = None, session: requests.Session | None = None, timeout: float = 20) -> None:
+        self.base_url = (base_url or os.getenv("MASTODON_BASE_URL", "")).rstrip("/")
+        self.token = token or os.getenv("MASTODON_ACCESS_TOKEN", "")
+        if not self.base_url or not self.token:
+            raise RuntimeError("Missing MASTODON_BASE_URL or MASTODON_ACCESS_TOKEN")
+        # Idempotency-Key を付けるので POST もリトライしてよい
+        self.session = session or make_session(retries=3, backoff_s=1.0, retry_post=True)
+        self.timeout = timeout
+
+    def post_status(self, text: str, visibility: str = "public", idempotency_key: str = "") -> dict:
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        r = self.session.post(
+            f"{self.base_url}/api/v1/statuses",
+            headers=headers,
+            data={"status": text, "visibility": visibility},
+            timeout=self.timeout,
+        )
+        if r.status_code >= 300:
+            raise RuntimeError(f"Mastodon {r.status_code}: {r.text[:200]}")
+        return r.json()
+
+
+def _chat(ds: DeepSeekClient, prompt: str) -> str:
+    return ds.chat(MODEL, [{"role": "user", "content": prompt}], temperature=0.9, max_tokens=200)
+
+
+def generate_post_texts(ds: DeepSeekClient, article_title: str) -> tuple[str, str]:
+    """(one-liner for the link post, follow-up fun post) — both requests in flight at once."""
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f1 = ex.submit(_chat, ds, link_prompt(article_title))
+        f2 = ex.submit(_chat, ds, FUN_PROMPT)
+        one_liner, fun = clean_one_liner(f1.result()), (f2.result() or "").strip()
+    if not one_liner or not fun:
+        raise RuntimeError("DeepSeek returned empty text")
+    return one_liner, fun
+
+
+def generate_fun_post(ds: DeepSeekClient) -> str:
+    text = (_chat(ds, FUN_PROMPT) or "").strip()
+    if not text:
+        raise RuntimeError("DeepSeek returned empty text")
+    return text
@@ -0,0 +1,214 @@
+# nompower_pipeline/minify.py
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+import re
+
+# 中身を一切触らない要素（整形済みテキスト / ユーザー貼り付けのアフィリエイトコード）
+PRESERVE_TAGS = {"pre", "code", "textarea"}
+PRESERVE_CLASSES = {"ad-affiliate"}
+
+# 中身を生テキストとして扱う要素
+RAW_TEXT_TAGS = {"script", "style"}
+
+_TAG_NAME_RE = re.compile(r"^</?\s*([a-zA-Z][a-zA-Z0-9:-]*)")
+_CLASS_ATTR_RE = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_TYPE_ATTR_RE = re.compile(r"""\btype\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_SRC_ATTR_RE = re.compile(r"\bsrc\s*=", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+_RAW_END_RE = {t: re.compile(rf"</{t}", re.IGNORECASE) for t in RAW_TEXT_TAGS}
+
+_JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+
+def _attr(tag: str, rx: re.Pattern[str]) -> str:
+    m = rx.search(tag)
+    if not m:
+        return ""
+    return next((g for g in m.groups() if g is not None), "")
+
+
+def _collapse_ws(text: str) -> str:
+    """連続空白を1文字に。改行を含む場合は改行1つに寄せる（行番号のデバッグ性を少し残す）。"""
+    def repl(m: re.Match[str]) -> str:
+        return "\n" if "\n" in m.group(0) else " "
+    return _WS_RE.sub(repl, text)
+
+
+def minify_inline_script(js: str) -> str:
+    """
+    Conservative line-level minification for inline JS.
+    - strips indentation / blank lines / whole-line // comments
+    - keeps line breaks so ASI behaves exactly as before
+    Scripts containing template literals are returned untouched.
+    """
+    if "`" in js:
+        return js
+    out = []
+    for line in js.splitlines():
+        s = line.strip()
+        if not s or s.startswith("//"):
+            continue
+        out.append(s)
+    return "\n".join(out)
+
+
+def minify_inline_style(css: str) -> str:
+    out = [line.strip() for line in css.splitlines()]
+    return "\n".join(x for x in out if x)
+
+
+class HtmlMinifier:
+    """
+    Incremental HTML minifier.
+
+    feed() accepts arbitrary chunks (e.g. from Template.generate()) and returns
+    the minified output that is safe to emit so far; close() flushes the rest.
+    - collapses whitespace in text
+    - strips comments (keeps conditional comments)
+    - minifies inline <script>/<style>
+    - leaves <pre>/<code>/<textarea> and .ad-affiliate blocks byte-for-byte intact
+    """
+
+    def __init__(self, minify_scripts: bool = True) -> None:
+        self.minify_scripts = minify_scripts
+        self._buf = ""
+        self._raw_tag = ""           # script/style の中にいる間はタグ名
+        self._raw_open = ""          # 開始タグ（type/src 判定用）
+        self._preserve_tag = ""      # 保護ブロックのタグ名
+        self._preserve_depth = 0
+
+    # ---- public ----
+    def feed(self, chunk: str) -> str:
+        # Template.generate() は Markup を混ぜて返す。Markup + str は str 側をエスケープするので素の str に
+        self._buf += str(chunk)
+        return self._drain(final=False)
+
+    def close(self) -> str:
+        out = self._drain(final=True)
+        self._buf = ""
+        return out
+
+    # ---- internals ----
+    def _drain(self, final: bool) -> str:
+        out: list[str] = []
+        buf = self._buf
+        pos = 0
+        n = len(buf)
+
+        while pos < n:
+            if self._raw_tag:
+                m = _RAW_END_RE[self._raw_tag].search(buf, pos)
+                end = m.start() if m else -1
+                if end < 0:
+                    if not final:
+                        break
+                    end = n
+                body = buf[pos:end]
+                out.append(self._raw_body(body))
+                self._raw_tag = ""
+                self._raw_open = ""
+                pos = end
+                continue
+
+            lt = buf.find("<", pos)
+            if lt < 0:
+                if not final:
+                    break
+                out.append(self._text(buf[pos:]))
+                pos = n
+                break
+
+            if lt > pos:
+                out.append(self._text(buf[pos:lt]))
+                pos = lt
+
+            if buf.startswith("<!--", pos):
+                end = buf.find("-->", pos + 4)
+                if end < 0:
+                    if not final:
+                        break
+                    end = n - 3
+                comment = buf[pos:end + 3]
+                if self._preserve_depth or comment.startswith("<!--[if") or comment.startswith("<![endif"):
+                    out.append(comment)
+                pos = end + 3
+                continue
+
+            gt = buf.find(">", pos + 1)
+            if gt < 0:
+                if not final:
+                    break
+                out.append(buf[pos:])
+                pos = n
+                break
+
+            tag = buf[pos:gt + 1]
+            out.append(tag)
+            pos = gt + 1
+            self._on_tag(tag)
+
+        self._buf = buf[pos:]
+        return "".join(out)
+
+    def _text(self, text: str) -> str:
+        if self._preserve_depth:
+            return text
+        return _collapse_ws(text)
+
+    def _raw_body(self, body: str) -> str:
+        if self._preserve_depth or not self.minify_scripts:
+            return body
+        if self._raw_tag == "style":
+            return minify_inline_style(body)
+        if _SRC_ATTR_RE.search(self._raw_open):
+            return body.strip()
+        if _attr(self._raw_open, _TYPE_ATTR_RE).strip().lower() not in _JS_TYPES:
+            return body
+        return minify_inline_script(body)
+
+    def _on_tag(self, tag: str) -> None:
+        m = _TAG_NAME_RE.match(tag)
+        if not m:
+            return
+        name = m.group(1).lower()
+        closing = tag.startswith("</")
+        self_closing = tag.endswith("/>")
+
+        if self._preserve_depth:
+            if name == self._preserve_tag and not self_closing:
+                self._preserve_depth += -1 if closing else 1
+                if self._preserve_depth == 0:
+                    self._preserve_tag = ""
+            elif not closing and name in RAW_TEXT_TAGS:
+                self._raw_tag = name
+                self._raw_open = tag
+            return
+
+        if closing or self_closing:
+            return
+
+        if name in RAW_TEXT_TAGS:
+            self._raw_tag = name
+            self._raw_open = tag
+            return
+
+        classes = set(_attr(tag, _CLASS_ATTR_RE).split())
+        if name in PRESERVE_TAGS or classes & PRESERVE_CLASSES:
+            self._preserve_tag = name
+            self._preserve_depth = 1
+
+
+def iter_minified(chunks: Iterable[str], minify_scripts: bool = True) -> Iterator[str]:
+    m = HtmlMinifier(minify_scripts=minify_scripts)
+    for chunk in chunks:
+        out = m.feed(chunk)
+        if out:
+            yield out
+    tail = m.close()
+    if tail:
+        yield tail
+
+
+def minify_html(s: str, minify_scripts: bool = True) -> str:
+    return "".join(iter_minified([s], minify_scripts=minify_scripts)).strip() + "\n"
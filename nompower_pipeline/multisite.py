@@ -0,0 +1,209 @@
+# nompower_pipeline/multisite.py
+"""
+Build several Nompower sites in one process.
+
+  python -m nompower_pipeline.multisite --sites sites.json
+
+sites.json:
+  {
+    "workers": 4,
+    "sites": [
+      {"name": "tech", "config": "sites/tech/config.json",
+       "data_dir": "sites/tech/data", "site_dir": "sites/tech/site"},
+      ...
+    ]
+  }
+
+Relative paths are resolved against the directory of sites.json. Each
+data_dir holds that site's articles.json / processed_urls.txt / last_run.json,
+its runs/ checkpoints, candidates.sqlite queue and build state
+(search_index_state.json, feed_state.json, image_meta.json).
+
+Shared across sites:
+  - feeds: every unique RSS URL is fetched once (all up front, concurrently)
+  - one pooled HTTP session for feeds, one pooled DeepSeekClient
+  - one Jinja environment, so templates are compiled once
+
+Sites then run concurrently (pick → generate → build), each into its own
+output directory. A per-site report (time / article count / created) is
+printed and written to data/multisite_last_run.json. Span timings in each
+site's last_run.json are process-wide aggregates.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+import argparse
+import json
+import threading
+import time
+
+from nompower_pipeline import generate as g
+from nompower_pipeline.deepseek import DeepSeekClient
+from nompower_pipeline.http import make_session
+from nompower_pipeline.instrument import TIMINGS, span
+from nompower_pipeline.reddit import fetch_rss_entries
+from nompower_pipeline.render import env_for
+from nompower_pipeline.telemetry import flush_at_exit
+from nompower_pipeline.util import ROOT, write_json
+
+REPORT_PATH = ROOT / "data" / "multisite_last_run.json"
+DEFAULT_WORKERS = 4
+
+
+class FeedCache:
+    """
+    fetch(url) for pick_candidate(): each URL is downloaded at most once,
+    concurrent callers wait on the same request. Callers get fresh entry
+    dicts because pick_candidate annotates them in place.
+    """
+
+    def __init__(self, session: Any, workers: int = DEFAULT_WORKERS) -> None:
+        self.session = session
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="feed")
+        self._lock = threading.Lock()
+        self._futs: dict[str, Future] = {}
+        self.requested = 0
+
+    def _future(self, url: str) -> Future:
+        with self._lock:
+            fut = self._futs.get(url)
+            if fut is None:
+                fut = self._pool.submit(fetch_rss_entries, url, session=self.session)
+                self._futs[url] = fut
+            return fut
+
+    def prefetch(self, urls: list[str]) -> None:
+        for url in urls:
+            self._future(url)
+        for fut in list(self._futs.values()):
+            fut.exception()  # 待つだけ（失敗はそのフィードを使うサイト側で raise）
+
+    def __call__(self, url: str, max_items: int = 25) -> list[dict]:
+        with self._lock:
+            self.requested += 1
+        return [dict(e) for e in self._future(url).result()[:max_items]]
+
+    @property
+    def unique(self) -> int:
+        return len(self._futs)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+def load_sites(path: Path) -> tuple[list[dict], int]:
+    """Return (sites with absolute paths, workers)."""
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    base = path.parent
+    sites = []
+    names: set[str] = set()
+    for i, s in enumerate(spec.get("sites") or []):
+        name = str(s.get("name") or f"site{i + 1}")
+        if name in names:
+            raise RuntimeError(f"duplicate site name in {path}: {name}")
+        names.add(name)
+        if not s.get("config") or not s.get("data_dir") or not s.get("site_dir"):
+            raise RuntimeError(f"site {name}: config, data_dir and site_dir are required")
+        data_dir = base / s["data_dir"]
+        sites.append(
+            {
+                "name": name,
+                "paths": g.SitePaths(
+                    config=base / s["config"],
+                    articles=data_dir / "articles.json",
+                    processed=data_dir / "processed_urls.txt",
+                    last_run=data_dir / "last_run.json",
+                    site_dir=base / s["site_dir"],
+                    runs=data_dir / "runs",
+                    queue=data_dir / "candidates.sqlite",
+                ),
+            }
+        )
+    if not sites:
+        raise RuntimeError(f"no sites in {path}")
+    return sites, int(spec.get("workers", DEFAULT_WORKERS))
+
+
+def run_all(sites: list[dict], workers: int = DEFAULT_WORKERS) -> dict:
+    workers = max(1, min(workers, len(sites)))
+    session = make_session(pool_size=max(10, workers * 2))
+    ds = DeepSeekClient(session=make_session(retries=0, pool_size=max(10, workers)))
+    jenv = env_for(g.TEMPLATES_DIR)
+    feeds = FeedCache(session, workers=max(workers, 4))
+
+    t0 = time.perf_counter()
+    with span("multisite.feeds"):
+        urls: list[str] = []
+        for s in sites:
+            cfg = g.load_config(s["paths"].config)
+            urls.extend(u for u in cfg["feeds"]["reddit_rss"] if u not in urls)
+        feeds.prefetch(urls)
+    feeds_s = time.perf_counter() - t0
+
+    def one(site: dict) -> dict:
+        st = time.perf_counter()
+        row: dict[str, Any] = {"name": site["name"], "site_dir": str(site["paths"].site_dir)}
+        try:
+            payload = g.run_site(site["paths"], fetch=feeds, ds=ds, jenv=jenv)
+        except Exception as e:  # noqa: BLE001 - 1サイトの失敗で他のサイトを止めない
+            row.update({"ok": False, "error": f"{type(e).__name__}: {e}"[:300]})
+        else:
+            row.update(
+                {
+                    "ok": True,
+                    "created": payload["created"],
+                    "articles": payload["articles"],
+                    "article_url": payload["article_url"],
+                }
+            )
+        row["seconds"] = round(time.perf_counter() - st, 3)
+        return row
+
+    rows: list[dict] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="site") as ex:
+        futs = [ex.submit(one, s) for s in sites]
+        for fut in as_completed(futs):
+            rows.append(fut.result())
+    feeds.close()
+
+    order = {s["name"]: i for i, s in enumerate(sites)}
+    rows.sort(key=lambda r: order[r["name"]])
+    return {
+        "updated_utc": g.now_utc_iso(),
+        "workers": workers,
+        "total_s": round(time.perf_counter() - t0, 3),
+        "feeds": {"unique": feeds.unique, "requested": feeds.requested, "fetch_s": round(feeds_s, 3)},
+        "sites": rows,
+        "timings": TIMINGS.report(),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.multisite")
+    ap.add_argument("--sites", required=True, help="sites.json (list of site configs)")
+    ap.add_argument("--workers", type=int, default=None, help="sites built at once (default: sites.json or 4)")
+    ap.add_argument("--report", default=str(REPORT_PATH), help="where to write the per-site report")
+    args = ap.parse_args(argv)
+    flush_at_exit("multisite")
+
+    sites, workers = load_sites(Path(args.sites).resolve())
+    report = run_all(sites, workers=args.workers or workers)
+
+    width = max(len(r["name"]) for r in report["sites"])
+    for r in report["sites"]:
+        if r["ok"]:
+            print(f"[multisite] {r['name'].ljust(width)}  created={r['created']!s:<5} articles={r['articles']:<5} {r['seconds']:.3f}s")
+        else:
+            print(f"[multisite] {r['name'].ljust(width)}  FAILED {r['seconds']:.3f}s  {r['error']}")
+    fd = report["feeds"]
+    print(f"[multisite] feeds unique={fd['unique']} requested={fd['requested']} fetch={fd['fetch_s']:.3f}s total={report['total_s']:.3f}s")
+
+    write_json(Path(args.report), report)
+    if not all(r["ok"] for r in report["sites"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# nompower_pipeline/pageweight.py
+"""
+Offline page-weight report for the built site (Lighthouse-style, no browser).
+
+For every *.html under site/ it parses the markup and reports:
+
+  html_bytes / html_gzip     document size, raw and gzip -6 (≈ transfer size)
+  inline_css / inline_js     bytes inside <style> / inline <script>
+  first_party_bytes          html + local assets it references (/assets, /og, …)
+  blocking                   render-blocking resources in <head>:
+                             stylesheets without media=print, scripts without
+                             async/defer/type=module
+  third_party                distinct external origins (scripts, css, images, iframes)
+  images / images_unsized    <img> count and how many lack width+height
+  lazy_lcp                   hero image marked loading=lazy (delays LCP)
+
+  python -m nompower_pipeline.pageweight                # summary + heaviest pages
+  python -m nompower_pipeline.pageweight --out data/page_weight.json
+"""
+from __future__ import annotations
+
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlparse
+import argparse
+import statistics
+import zlib
+
+from nompower_pipeline.util import ROOT, write_json
+
+SITE_DIR = ROOT / "site"
+
+
+class _PageScan(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.in_head = False
+        self.in_noscript = False
+        self.raw_tag = ""
+        self.raw_external = False
+        self.inline_css = 0
+        self.inline_js = 0
+        self.blocking: list[str] = []
+        self.local: set[str] = set()
+        self.origins: set[str] = set()
+        self.images = 0
+        self.images_unsized = 0
+        self.lazy_lcp = False
+
+    def _ref(self, url: str | None) -> None:
+        if not url:
+            return
+        u = urlparse(url)
+        if u.scheme in ("http", "https") or url.startswith("//"):
+            self.origins.add(u.netloc)
+        elif url.startswith("/"):
+            self.local.add(u.path)
+
+    def handle_starttag(self, tag: str, attrs_list: list[tuple[str, str | None]]) -> None:
+        attrs = {k: (v if v is not None else "") for k, v in attrs_list}
+        if tag == "head":
+            self.in_head = True
+        elif tag == "body":
+            self.in_head = False
+        elif tag == "noscript":
+            self.in_noscript = True  # JS 無効時のフォールバックは数えない
+        elif self.in_noscript:
+            return
+        elif tag == "link":
+            rel = attrs.get("rel", "").lower().split()
+            if "stylesheet" in rel or "preload" in rel:
+                self._ref(attrs.get("href"))
+            if "stylesheet" in rel and self.in_head and attrs.get("media", "all") not in ("print", "none"):
+                self.blocking.append(attrs.get("href", ""))
+        elif tag == "script":
+            self.raw_tag, self.raw_external = "script", "src" in attrs
+            if "src" in attrs:
+                self._ref(attrs["src"])
+                if self.in_head and not ({"async", "defer"} & attrs.keys()) and attrs.get("type") != "module":
+                    self.blocking.append(attrs["src"])
+        elif tag == "style":
+            self.raw_tag, self.raw_external = "style", False
+        elif tag == "img":
+            self.images += 1
+            self._ref(attrs.get("src"))
+            if not (attrs.get("width") and attrs.get("height")):
+                self.images_unsized += 1
+            if self.images == 1 and attrs.get("loading") == "lazy":
+                self.lazy_lcp = True
+        elif tag == "iframe":
+            self._ref(attrs.get("src"))
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == self.raw_tag:
+            self.raw_tag = ""
+        elif tag == "noscript":
+            self.in_noscript = False
+        elif tag == "head":
+            self.in_head = False
+
+    def handle_data(self, data: str) -> None:
+        if self.raw_tag == "style":
+            self.inline_css += len(data.encode("utf-8"))
+        elif self.raw_tag == "script" and not self.raw_external:
+            self.inline_js += len(data.encode("utf-8"))
+
+
+def scan_page(path: Path, site_dir: Path, asset_sizes: dict[str, int]) -> dict:
+    raw = path.read_bytes()
+    p = _PageScan()
+    p.feed(raw.decode("utf-8", errors="replace"))
+    p.close()
+
+    local_bytes = 0
+    for ref in p.local:
+        if ref not in asset_sizes:
+            f = site_dir / ref.lstrip("/")
+            asset_sizes[ref] = f.stat().st_size if f.is_file() and f.suffix != ".html" else 0
+        local_bytes += asset_sizes[ref]
+
+    return {
+        "page": "/" + path.relative_to(site_dir).as_posix(),
+        "html_bytes": len(raw),
+        "html_gzip": len(zlib.compress(raw, 6)),
+        "inline_css": p.inline_css,
+        "inline_js": p.inline_js,
+        "first_party_bytes": len(raw) + local_bytes,
+        "blocking": p.blocking,
+        "third_party": sorted(p.origins),
+        "images": p.images,
+        "images_unsized": p.images_unsized,
+        "lazy_lcp": p.lazy_lcp,
+    }
+
+
+def _dist(xs: list[int]) -> dict[str, int]:
+    s = sorted(xs)
+    return {
+        "median": int(statistics.median(s)),
+        "p95": s[min(len(s) - 1, int(len(s) * 0.95))],
+        "max": s[-1],
+    }
+
+
+def page_weight_report(site_dir: Path | None = None) -> dict:
+    site_dir = site_dir or SITE_DIR
+    asset_sizes: dict[str, int] = {}
+    pages = [scan_page(p, site_dir, asset_sizes) for p in sorted(site_dir.rglob("*.html"))]
+    if not pages:
+        return {"pages": 0, "summary": {}, "rows": []}
+    summary = {
+        key: _dist([r[key] for r in pages])
+        for key in ("html_bytes", "html_gzip", "inline_css", "inline_js", "first_party_bytes")
+    }
+    summary["pages_with_blocking"] = sum(1 for r in pages if r["blocking"])
+    summary["images_unsized"] = sum(r["images_unsized"] for r in pages)
+    summary["lazy_lcp"] = sum(1 for r in pages if r["lazy_lcp"])
+    summary["third_party_origins"] = sorted({o for r in pages for o in r["third_party"]})
+    return {"pages": len(pages), "summary": summary, "rows": pages}
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.pageweight")
+    ap.add_argument("--site", default=str(SITE_DIR), help="built site directory")
+    ap.add_argument("--top", type=int, default=5, help="heaviest pages to list")
+    ap.add_argument("--out", default="", help="write the full report as JSON")
+    args = ap.parse_args(argv)
+
+    rep = page_weight_report(Path(args.site))
+    if not rep["pages"]:
+        print(f"[weight] no pages under {args.site}")
+        return
+    s = rep["summary"]
+    print(f"[weight] pages={rep['pages']} blocking_pages={s['pages_with_blocking']} "
+          f"unsized_images={s['images_unsized']} lazy_lcp={s['lazy_lcp']} third_party={len(s['third_party_origins'])}")
+    for key in ("html_bytes", "html_gzip", "inline_css", "inline_js", "first_party_bytes"):
+        d = s[key]
+        print(f"  {key:<18} median={d['median'] / 1024:7.1f}KB p95={d['p95'] / 1024:7.1f}KB max={d['max'] / 1024:7.1f}KB")
+    for r in sorted(rep["rows"], key=lambda r: r["first_party_bytes"], reverse=True)[:args.top]:
+        print(f"  {r['first_party_bytes'] / 1024:7.1f}KB  gzip={r['html_gzip'] / 1024:5.1f}KB  {r['page']}"
+              + (f"  blocking={','.join(r['blocking'])}" if r["blocking"] else ""))
+    if args.out:
+        write_json(Path(args.out), rep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# nompower_pipeline/post_queue.py
+"""
+Persistent scheduled post queue (data/post_queue.json).
+
+The issue-triggered job enqueues posts with a due time and exits; a short
+periodic job drains everything that is due. Nothing sleeps on a runner.
+
+Entry:
+  {"id", "due_utc", "status", "text", "visibility", "kind", "source",
+   "attempts", "created_utc", "posted_utc", "posted_url", "error"}
+
+status: pending → posting → posted   (or → failed after MAX_ATTEMPTS)
+
+An entry is marked "posting" and saved *before* the request goes out. The
+entry id doubles as the Mastodon Idempotency-Key, so if a run dies after
+the request, the next drain retries with the same key and the server hands
+back the original toot instead of creating a second one.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable
+import hashlib
+import json
+import os
+
+from nompower_pipeline.util import ROOT, read_json
+
+QUEUE_PATH = ROOT / "data" / "post_queue.json"
+QUEUE_VERSION = 1
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_S = 300          # 5分, 10分, 20分 ...
+KEEP_DONE_DAYS = 14         # posted/failed はこの日数で掃除
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def _parse(iso: str) -> datetime:
+    return datetime.fromisoformat(iso.replace("Z", "+00:00"))
+
+
+def post_id(source: str, kind: str) -> str:
+    """Stable id per (source, kind) so re-triggered issues don't enqueue twice."""
+    return hashlib.sha1(f"{source}\0{kind}".encode("utf-8")).hexdigest()[:20]
+
+
+def is_queued(q: dict, source: str, kind: str) -> bool:
+    pid = post_id(source, kind)
+    return any(p["id"] == pid for p in q["posts"])
+
+
+def load_queue(path: Path = QUEUE_PATH) -> dict:
+    q = read_json(path, default=None)
+    if not isinstance(q, dict) or q.get("v") != QUEUE_VERSION:
+        q = {"v": QUEUE_VERSION, "posts": []}
+    return q
+
+
+def save_queue(q: dict, path: Path = QUEUE_PATH) -> None:
+    # 途中で落ちても壊れたJSONを残さない
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(q, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def enqueue(
+    q: dict,
+    text: str,
+    *,
+    source: str,
+    kind: str,
+    delay_s: float = 0,
+    visibility: str = "public",
+    now: datetime | None = None,
+) -> dict | None:
+    """Add a post due `delay_s` from now. Returns None if (source, kind) is already queued."""
+    if is_queued(q, source, kind):
+        return None
+    pid = post_id(source, kind)
+    now = now or _now()
+    entry = {
+        "id": pid,
+        "due_utc": _iso(now + timedelta(seconds=delay_s)),
+        "status": "pending",
+        "text": text,
+        "visibility": visibility,
+        "kind": kind,
+        "source": source,
+        "attempts": 0,
+        "created_utc": _iso(now),
+        "posted_utc": "",
+        "posted_url": "",
+        "error": "",
+    }
+    q["posts"].append(entry)
+    return entry
+
+
+def due_posts(q: dict, now: datetime | None = None) -> list[dict]:
+    now = now or _now()
+    due = [p for p in q["posts"] if p["status"] in ("pending", "posting") and _parse(p["due_utc"]) <= now]
+    return sorted(due, key=lambda p: p["due_utc"])
+
+
+def prune(q: dict, now: datetime | None = None) -> int:
+    now = now or _now()
+    cutoff = now - timedelta(days=KEEP_DONE_DAYS)
+    before = len(q["posts"])
+    q["posts"] = [
+        p for p in q["posts"]
+        if p["status"] not in ("posted", "failed") or _parse(p.get("posted_utc") or p["due_utc"]) > cutoff
+    ]
+    return before - len(q["posts"])
+
+
+def mastodon_poster(base_url: str, token: str, timeout: float = 20) -> Callable[[dict], dict]:
+    """post_fn for drain(): POST /api/v1/statuses with Idempotency-Key = entry id."""
+    from nompower_pipeline.mastodon import MastodonClient
+
+    client = MastodonClient(base_url, token, timeout=timeout)
+
+    def _post(entry: dict) -> dict:
+        return client.post_status(entry["text"], entry.get("visibility") or "public", idempotency_key=entry["id"])
+
+    return _post
+
+
+def drain(
+    post_fn: Callable[[dict], dict],
+    path: Path = QUEUE_PATH,
+    now: datetime | None = None,
+    limit: int = 20,
+) -> dict:
+    """
+    Post everything that is due. post_fn(entry) must send entry["text"] with
+    entry["id"] as idempotency key and return the API response (dict).
+    Returns stats: {"due", "posted", "retry", "failed", "pruned", "pending"}.
+    """
+    q = load_queue(path)
+    stats = {"due": 0, "posted": 0, "retry": 0, "failed": 0, "pruned": 0, "pending": 0}
+    for p in due_posts(q, now)[:limit]:
+        stats["due"] += 1
+        p["status"] = "posting"
+        p["attempts"] += 1
+        save_queue(q, path)
+        try:
+            res = post_fn(p) or {}
+        except Exception as e:  # noqa: BLE001 - 1件の失敗で他の投稿を止めない
+            p["error"] = f"{type(e).__name__}: {e}"[:300]
+            if p["attempts"] >= MAX_ATTEMPTS:
+                p["status"] = "failed"
+                stats["failed"] += 1
+            else:
+                p["status"] = "pending"
+                p["due_utc"] = _iso(_now() + timedelta(seconds=RETRY_BASE_S * 2 ** (p["attempts"] - 1)))
+                stats["retry"] += 1
+            print(f"[queue] {p['kind']} {p['id']} attempt={p['attempts']} error={p['error']}")
+        else:
+            p["status"] = "posted"
+            p["posted_utc"] = _iso(_now())
+            p["posted_url"] = str(res.get("url") or "")
+            p["error"] = ""
+            stats["posted"] += 1
+            print(f"[queue] posted {p['kind']} {p['id']} {p['posted_url']}")
+        save_queue(q, path)
+
+    stats["pruned"] = prune(q, now)
+    stats["pending"] = sum(1 for p in q["posts"] if p["status"] in ("pending", "posting"))
+    save_queue(q, path)
+    return stats
@@ -0,0 +1,152 @@
+# nompower_pipeline/ratelimit.py
+"""
+Per-host token buckets for every outbound request (see http.MeteredSession).
+
+Each rule is a host or parent domain with a refill rate (requests per
+second) and a burst size; "reddit.com" covers www./old.reddit.com with one
+shared bucket. A request takes one token, sleeping until one is available.
+Hosts that match no rule (and no "*" rule) are not limited — the fake
+upstream server on 127.0.0.1 in benchmarks is unaffected.
+
+config.json (merged over DEFAULT_RULES; "rate": 0 disables a rule):
+
+  "http": {
+    "rate_limits": {
+      "reddit.com": {"rate": 0.2, "burst": 5},
+      "*": {"rate": 10, "burst": 20}
+    }
+  }
+
+A 429 pauses the host's bucket for Retry-After seconds (capped at
+MAX_PAUSE_S). Bucket levels and pauses are saved to data/ratelimit.json at
+exit and restored on first use, refilled for the time that passed, so
+back-to-back runs do not each start with a full burst. Only the daily
+workflow commits the file; the poll / Mastodon jobs read it and autostash
+their copy. The limiter is process-wide and thread-safe; the sleep happens
+outside the lock, so threads waiting on different hosts do not block each
+other.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+import atexit
+import threading
+import time
+
+from nompower_pipeline.util import ROOT, read_json, write_json
+
+CONFIG_PATH = ROOT / "nompower_pipeline" / "config.json"
+STATE_PATH = ROOT / "data" / "ratelimit.json"
+MAX_PAUSE_S = 120.0
+
+DEFAULT_RULES: dict[str, dict[str, float]] = {
+    # 未認証の RSS は厳しめ（1分あたり 12 回、まとめて 5 回まで）
+    "reddit.com": {"rate": 0.2, "burst": 5},
+    "redd.it": {"rate": 2.0, "burst": 10},
+    "api.deepseek.com": {"rate": 1.0, "burst": 4},
+    "api.github.com": {"rate": 1.0, "burst": 10},
+}
+
+
+@dataclass
+class Bucket:
+    rate: float
+    burst: float
+    tokens: float
+    updated: float
+    paused_until: float = 0.0
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Take one token (possibly going negative); seconds to wait before sending."""
+        self.refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+
+class RateLimiter:
+    def __init__(self, rules: dict[str, dict[str, Any]] | None = None, state_path: Path | None = None) -> None:
+        self._lock = threading.Lock()
+        self._rules = rules
+        self._buckets: dict[str, Bucket] = {}
+        self._saved: dict[str, dict[str, float]] | None = None
+        self.state_path = state_path or STATE_PATH
+        self._atexit = False
+        self.waited_s = 0.0  # 累計の待ち時間（集計用）
+
+    def configure(self, rate_limits: dict[str, dict[str, Any]] | None) -> None:
+        """Replace the rules (DEFAULT_RULES + rate_limits); existing buckets are rebuilt on next use."""
+        with self._lock:
+            self._rules = {**DEFAULT_RULES, **(rate_limits or {})}
+            self._buckets.clear()
+
+    def _rule_for(self, host: str) -> str:
+        host = host.split(":", 1)[0].lower()
+        if self._rules is None:
+            cfg = read_json(CONFIG_PATH, default=None) or {}
+            self._rules = {**DEFAULT_RULES, **((cfg.get("http") or {}).get("rate_limits") or {})}
+        for key in self._rules:
+            if key != "*" and (host == key or host.endswith("." + key)):
+                return key
+        return "*" if "*" in self._rules else ""
+
+    def _bucket(self, key: str, now: float) -> Bucket | None:
+        b = self._buckets.get(key)
+        if b is None:
+            rule = self._rules[key]
+            rate, burst = float(rule.get("rate", 0)), float(rule.get("burst", 1))
+            if rate <= 0:
+                return None
+            if self._saved is None:
+                self._saved = read_json(self.state_path, default={}) or {}
+            saved = self._saved.get(key) or {}
+            b = Bucket(rate, burst, min(burst, float(saved.get("tokens", burst))),
+                       float(saved.get("updated", now)), float(saved.get("paused_until", 0.0)))
+            self._buckets[key] = b
+            if not self._atexit:
+                self._atexit = True
+                atexit.register(self.save)
+        return b
+
+    def acquire(self, host: str) -> float:
+        """Block until host may be contacted; returns the seconds waited."""
+        with self._lock:
+            key = self._rule_for(host)
+            b = self._bucket(key, time.time()) if key else None
+            wait = b.reserve(time.time()) if b else 0.0
+            self.waited_s += wait
+        if wait > 0:
+            if wait >= 1:
+                print(f"[ratelimit] {host}: waiting {wait:.1f}s")
+            time.sleep(wait)
+        return wait
+
+    def pause(self, host: str, seconds: float) -> None:
+        """Hold every request to host's bucket for seconds (429 / Retry-After)."""
+        with self._lock:
+            key = self._rule_for(host)
+            b = self._bucket(key, time.time()) if key else None
+            if b:
+                b.paused_until = max(b.paused_until, time.time() + min(MAX_PAUSE_S, max(0.0, seconds)))
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._buckets:
+                return
+            # 他のプロセスが書いた別ホストの状態は残す
+            state = read_json(self.state_path, default={}) or {}
+            for key, b in self._buckets.items():
+                state[key] = {"tokens": round(b.tokens, 3), "updated": round(b.updated, 3),
+                              "paused_until": round(b.paused_until, 3)}
+        write_json(self.state_path, state)
+
+
+# process-wide limiter（http.py の Session が使う）
+LIMITER = RateLimiter()
@@ -8,6 +8,9 @@ import xml.etree.ElementTree as ET
 
 import requests
 
+from .endpoints import rebase_url
+from .http import shared_session
+
 
 _IMG_RE = re.compile(r'<img[^>]+src="([^"]+)"', re.IGNORECASE)
 
@@ -47,7 +50,7 @@ def _safe_image(url: str) -> str:
     return ""
 
 
-def fetch_rss_entries(rss_url: str, max_items: int = 25) -> List[Dict]:
+def fetch_rss_entries(rss_url: str, max_items: int = 25, session: requests.Session | None = None) -> List[Dict]:
     """
     Fetch Reddit RSS feed and return list of entries with keys:
     - title
@@ -58,14 +61,23 @@ def fetch_rss_entries(rss_url: str, max_items: int = 25) -> List[Dict]:
     - hero_image (optional)
     - hero_image_kind (optional)
     """
-    r = requests.get(
-        rss_url,
+    # session: multisite で接続プールを共有するとき
+    r = (session or shared_session()).get(
+        rebase_url(rss_url),
         timeout=25,
         headers={"User-Agent": "Mozilla/5.0 (NompowerBot/1.0)"},
     )
     r.raise_for_status()
 
-    root = ET.fromstring(r.text)
+    return parse_rss_entries(r.text, rss_url, max_items=max_items)
+
+
+def parse_rss_entries(xml_text: str, rss_url: str, max_items: int = 25) -> List[Dict]:
+    """
+    Parse a Reddit Atom document (same output as fetch_rss_entries).
+    Split out so fixtures / benchmarks can run without network.
+    """
+    root = ET.fromstring(xml_text)
 
     ns = {
         "a": "http://www.w3.org/2005/Atom",
@@ -123,3 +135,62 @@ def fetch_rss_entries(rss_url: str, max_items: int = 25) -> List[Dict]:
             break
 
     return entries
+
+
+BY_ID_URL = "https://www.reddit.com/by_id/{names}.json"
+BY_ID_MAX = 100  # Reddit が1回で受け付ける fullname の上限
+
+_FULLNAME_RE = re.compile(r"/comments/([a-z0-9]+)", re.IGNORECASE)
+_SUBREDDIT_RE = re.compile(r"/r/([A-Za-z0-9_]+)")
+
+
+def post_fullname(url: str) -> str:
+    """t3_<id> for a Reddit post URL ("" if it is not one)."""
+    m = _FULLNAME_RE.search(url or "")
+    return f"t3_{m.group(1).lower()}" if m else ""
+
+
+def subreddit_from_url(url: str) -> str:
+    m = _SUBREDDIT_RE.search(url or "")
+    return m.group(1) if m else ""
+
+
+def fetch_by_id(fullnames: List[str], session: requests.Session | None = None) -> Dict[str, Dict]:
+    """
+    Score / comment counts for up to BY_ID_MAX posts in one request:
+    {"t3_abc": {"score": 123, "comments": 45, "subreddit": "technology", "removed": False}, ...}.
+    removed: a moderator / admin took the post down or its author deleted it
+    (Reddit still returns it, with removed_by_category or a "[deleted]" author).
+    Posts Reddit no longer returns at all are simply absent.
+    """
+    if not fullnames:
+        return {}
+    if len(fullnames) > BY_ID_MAX:
+        raise ValueError(f"by_id takes at most {BY_ID_MAX} names, got {len(fullnames)}")
+    r = (session or shared_session()).get(
+        rebase_url(BY_ID_URL.format(names=",".join(fullnames))),
+        params={"raw_json": 1, "limit": len(fullnames)},
+        timeout=25,
+        headers={"User-Agent": "Mozilla/5.0 (NompowerBot/1.0)"},
+    )
+    r.raise_for_status()
+    return parse_by_id(r.json())
+
+
+def parse_by_id(listing: Dict) -> Dict[str, Dict]:
+    """Parse a by_id Listing (split out like parse_rss_entries for fixtures)."""
+    out: Dict[str, Dict] = {}
+    for child in ((listing or {}).get("data") or {}).get("children") or []:
+        d = child.get("data") or {}
+        name = d.get("name") or (f"t3_{d['id']}" if d.get("id") else "")
+        if not name:
+            continue
+        out[name] = {
+            "score": int(d.get("score") or 0),
+            "comments": int(d.get("num_comments") or 0),
+            "subreddit": d.get("subreddit") or "",
+            "removed": bool(d.get("removed_by_category"))
+            or d.get("author") == "[deleted]"
+            or d.get("selftext") in ("[removed]", "[deleted]"),
+        }
+    return out
@@ -2,6 +2,7 @@ from __future__ import annotations
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from typing import Any
+from .minify import iter_minified
 from .util import write_text
 
 def env_for(templates_dir: Path) -> Environment:
@@ -14,6 +15,27 @@ def write_asset(dst: Path, src: Path) -> None:
     dst.parent.mkdir(parents=True, exist_ok=True)
     dst.write_bytes(src.read_bytes())
 
-def render_to_file(jenv: Environment, template_name: str, context: dict[str, Any], out_path: Path) -> None:
-    html = jenv.get_template(template_name).render(**context)
+def render_to_file(jenv: Environment, template_name: str, context: dict[str, Any], out_path: Path, minify: bool = False) -> tuple[int, int]:
+    """
+    Render a template to out_path.
+    minify=True streams Template.generate() chunks through the HTML minifier.
+    Returns (raw_bytes, written_bytes) for the size report.
+    """
+    tpl = jenv.get_template(template_name)
+    if not minify:
+        html = tpl.render(**context)
+        write_text(out_path, html)
+        n = len(html.encode("utf-8"))
+        return (n, n)
+
+    raw = 0
+
+    def _counted():
+        nonlocal raw
+        for chunk in tpl.generate(**context):
+            raw += len(chunk.encode("utf-8"))
+            yield chunk
+
+    html = "".join(iter_minified(_counted())).strip() + "\n"
     write_text(out_path, html)
+    return (raw, len(html.encode("utf-8")))
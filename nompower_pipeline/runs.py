@@ -0,0 +1,173 @@
+# nompower_pipeline/runs.py
+"""
+On-disk checkpoints for generate.run_site (data/runs/<run-id>/).
+
+Stages, in order:
+
+  pick       candidate.json      chosen feed entry (null = nothing new)
+  llm        completion.txt      raw model output (written before parsing)
+             usage.json          tokens incl. prompt cache hit/miss, latency
+             body.json           {"title", "body_html"} after sanitize
+  affiliate  affiliate.json      {"html", "ad_id"}
+  store      entry.json          article as inserted into articles.json
+  build      -
+  last_run   -
+
+state.json records which stages completed. A run that did not reach
+last_run is resumed by the next invocation from its first missing stage,
+so the paid LLM output is never requested twice. --from-stage reopens a
+run (latest by default) at a given stage, dropping that stage's and later
+artifacts.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+import json
+import os
+import shutil
+
+from nompower_pipeline.util import ROOT, read_json
+
+RUNS_DIR = ROOT / "data" / "runs"
+STAGES = ("pick", "llm", "affiliate", "store", "build", "last_run")
+ARTIFACTS: dict[str, tuple[str, ...]] = {
+    "pick": ("candidate.json",),
+    "llm": ("completion.txt", "usage.json", "body.json"),
+    "affiliate": ("affiliate.json",),
+    "store": ("entry.json",),
+    "build": (),
+    "last_run": (),
+}
+KEEP_RUNS = 20  # 完了済みの run はこの数だけ残す
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def new_run_id(now: datetime | None = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class Run:
+    def __init__(self, path: Path, state: dict[str, Any]) -> None:
+        self.path = path
+        self.state = state
+
+    @property
+    def id(self) -> str:
+        return self.state["run_id"]
+
+    @property
+    def finished(self) -> bool:
+        return STAGES[-1] in self.state["completed"]
+
+    def needs(self, stage: str) -> bool:
+        return stage not in self.state["completed"]
+
+    def complete(self, stage: str) -> None:
+        if stage not in self.state["completed"]:
+            self.state["completed"].append(stage)
+        self.state["updated_utc"] = _now_iso()
+        self._save_state()
+
+    def reset_from(self, stage: str) -> None:
+        """Forget `stage` and everything after it (artifacts included)."""
+        drop = STAGES[STAGES.index(stage):]
+        self.state["completed"] = [s for s in self.state["completed"] if s not in drop]
+        for s in drop:
+            for name in ARTIFACTS[s]:
+                (self.path / name).unlink(missing_ok=True)
+        self._save_state()
+
+    def has(self, name: str) -> bool:
+        return (self.path / name).exists()
+
+    def read_json(self, name: str, default: Any = None) -> Any:
+        return read_json(self.path / name, default=default)
+
+    def write_json(self, name: str, obj: Any) -> None:
+        _atomic_write(self.path / name, json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
+
+    def read_text(self, name: str) -> str:
+        return (self.path / name).read_text(encoding="utf-8")
+
+    def write_text(self, name: str, text: str) -> None:
+        _atomic_write(self.path / name, text)
+
+    def _save_state(self) -> None:
+        self.write_json("state.json", self.state)
+
+
+def load_run(runs_dir: Path, run_id: str) -> Run:
+    path = runs_dir / run_id
+    state = read_json(path / "state.json", default=None)
+    if not isinstance(state, dict):
+        raise RuntimeError(f"no checkpointed run at {path}")
+    return Run(path, state)
+
+
+def latest_run(runs_dir: Path) -> Run | None:
+    if not runs_dir.exists():
+        return None
+    for path in sorted((p for p in runs_dir.iterdir() if (p / "state.json").exists()), reverse=True):
+        return load_run(runs_dir, path.name)
+    return None
+
+
+def create_run(runs_dir: Path) -> Run:
+    run_id = new_run_id()
+    n = 1
+    while (runs_dir / run_id).exists():  # 同じ秒に2回
+        n += 1
+        run_id = f"{new_run_id()}-{n}"
+    run = Run(runs_dir / run_id, {"run_id": run_id, "created_utc": _now_iso(), "updated_utc": _now_iso(), "completed": []})
+    run._save_state()
+    return run
+
+
+def open_run(runs_dir: Path = RUNS_DIR, run_id: str | None = None, from_stage: str | None = None, fresh: bool = False) -> tuple[Run, str]:
+    """
+    Pick the run to work on. Returns (run, how) with how in
+    {"new", "resume", "rerun"}.
+      run_id / from_stage  → that run (default: latest), reset to from_stage
+      fresh                → always a new run
+      otherwise            → latest run if unfinished, else a new one
+    """
+    if from_stage is not None and from_stage not in STAGES:
+        raise RuntimeError(f"unknown stage {from_stage!r} (stages: {', '.join(STAGES)})")
+    if fresh:
+        return create_run(runs_dir), "new"
+
+    run = load_run(runs_dir, run_id) if run_id else latest_run(runs_dir)
+    if from_stage is not None:
+        if run is None:
+            raise RuntimeError(f"--from-stage {from_stage}: no previous run in {runs_dir}")
+        run.reset_from(from_stage)
+        return run, "rerun"
+    if run is not None and (run_id or not run.finished):
+        return run, "resume"
+    return create_run(runs_dir), "new"
+
+
+def prune_runs(runs_dir: Path = RUNS_DIR, keep: int = KEEP_RUNS) -> int:
+    """Delete finished runs beyond the newest `keep`. Unfinished runs are kept."""
+    if not runs_dir.exists():
+        return 0
+    finished = []
+    for path in sorted(runs_dir.iterdir(), reverse=True):
+        state = read_json(path / "state.json", default=None)
+        if isinstance(state, dict) and STAGES[-1] in state.get("completed", []):
+            finished.append(path)
+    for path in finished[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+    return max(0, len(finished) - keep)
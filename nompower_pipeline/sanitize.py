@@ -0,0 +1,327 @@
+# nompower_pipeline/sanitize.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from html import escape, unescape
+from html.parser import HTMLParser
+import itertools
+import re
+
+# プロンプトで許可しているタグだけ通す（それ以外はタグを外して中身のテキストは残す）
+ALLOWED_TAGS = {"p", "h2", "ul", "li", "strong", "code", "a"}
+ALLOWED_ATTRS = {"a": ("href", "rel", "target", "title")}
+
+# LLM が出しがちな近いタグは寄せる
+RENAME_TAGS = {"h1": "h2", "h3": "h2", "b": "strong", "ol": "ul"}
+
+# 中身ごと捨てる
+DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template", "noscript", "textarea", "title", "svg", "math"}
+
+# 開始タグで暗黙に閉じる要素（<li>a<li>b など）
+IMPLIED_CLOSE = {"li": {"li"}, "p": {"p"}, "h2": {"p"}, "ul": {"p"}}
+
+# 先頭の重複タイトル判定の対象になるブロック
+LEAD_BLOCKS = {"h1", "h2", "p"}
+
+SAFE_URL_SCHEMES = ("http:", "https:", "mailto:")
+
+_WS_RE = re.compile(r"\s+")
+_CTRL_RE = re.compile(r"[\x00-\x20\x7f]+")
+
+
+@dataclass
+class SanitizedHtml:
+    html: str
+    text: str
+    word_count: int
+    removed_title: bool
+
+
+def _norm(s: str) -> str:
+    return _WS_RE.sub(" ", unescape(s or "")).strip().lower()
+
+
+def safe_url(url: str) -> str:
+    """Return url if its scheme is allowed (or it is relative), else ""."""
+    u = (url or "").strip()
+    probe = _CTRL_RE.sub("", u).lower()
+    if ":" not in probe.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]:
+        return u  # relative / fragment
+    return u if probe.startswith(SAFE_URL_SCHEMES) else ""
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self, title: str) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title_norm = _norm(title)
+        self.out: list[str] = []
+        self.text: list[str] = []
+        self.stack: list[str] = []
+        self.drop_depth = 0
+        self.drop_tag = ""
+        self.removed_title = False
+
+        # 先頭ブロック判定用（決着がつくまで出力を保留）
+        self.lead_open = bool(self.title_norm)
+        self.lead_tag = ""
+        self.lead_depth = 0
+        self.lead_stack = 0
+        self.lead_out: list[str] = []
+        self.lead_text: list[str] = []
+        self.pending_bare = ""
+
+    # ---- output helpers ----
+    def _emit(self, s: str) -> None:
+        (self.lead_out if self.lead_tag else self.out).append(s)
+
+    def _emit_text(self, s: str) -> None:
+        (self.lead_text if self.lead_tag else self.text).append(s)
+
+    def _settle_lead(self, drop: bool) -> None:
+        if drop:
+            self.removed_title = True
+            del self.stack[self.lead_stack:]  # 捨てたブロック内で開いたタグは閉じ直さない
+        else:
+            self.out.extend(self.lead_out)
+            self.text.extend(self.lead_text)
+        self.lead_out, self.lead_text = [], []
+        self.lead_tag = ""
+        self.lead_open = False
+
+    # ---- parser callbacks ----
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.drop_depth:
+            if tag == self.drop_tag:
+                self.drop_depth += 1
+            return
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_tag, self.drop_depth = tag, 1
+            return
+        if tag == "br":
+            self._on_br()
+            return
+
+        if self.pending_bare:
+            self._flush_bare("", self.pending_bare)
+        if self.lead_open and not self.lead_tag:
+            if tag in LEAD_BLOCKS:
+                self.lead_tag, self.lead_depth, self.lead_stack = tag, 0, len(self.stack)
+            else:
+                self.lead_open = False
+        if self.lead_tag == tag:
+            self.lead_depth += 1
+
+        name = RENAME_TAGS.get(tag, tag)
+        if name not in ALLOWED_TAGS:
+            return
+
+        closes = IMPLIED_CLOSE.get(name)
+        if closes and self.stack and self.stack[-1] in closes:
+            self._emit(f"</{self.stack.pop()}>")
+            self._emit_text(" ")
+
+        parts = [name]
+        allowed = ALLOWED_ATTRS.get(name, ())
+        kept: dict[str, str] = {}
+        for k, v in attrs:
+            if k not in allowed or v is None:
+                continue
+            if k == "href":
+                v = safe_url(v)
+                if not v:
+                    continue
+            kept[k] = v
+        if kept.get("target") == "_blank":
+            rel = set((kept.get("rel") or "").split())
+            rel.add("noopener")
+            kept["rel"] = " ".join(sorted(rel))
+        for k, v in kept.items():
+            parts.append(f'{k}="{escape(v, quote=True)}"')
+
+        self._emit("<" + " ".join(parts) + ">")
+        self.stack.append(name)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        # 許可タグに void 要素は無いので、開始扱いしてすぐ閉じる
+        self.handle_starttag(tag, attrs)
+        if tag != "br":
+            self.handle_endtag(tag)
+
+    def _on_br(self) -> None:
+        if self.pending_bare:
+            self._flush_bare(self.pending_bare.strip(), "")
+        self._emit_text(" ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.drop_depth:
+            if tag == self.drop_tag:
+                self.drop_depth -= 1
+            return
+
+        name = RENAME_TAGS.get(tag, tag)
+        if name in ALLOWED_TAGS and name in self.stack:
+            while self.stack:
+                top = self.stack.pop()
+                self._emit(f"</{top}>")
+                if top == name:
+                    break
+
+        if self.lead_tag == tag:
+            self.lead_depth -= 1
+            if self.lead_depth <= 0:
+                self._settle_lead(_norm("".join(self.lead_text)) == self.title_norm)
+
+        if name in ("p", "h2", "li", "ul"):
+            self._emit_text(" ")
+
+    def handle_data(self, data: str) -> None:
+        if self.drop_depth:
+            return
+        if self.lead_open and not self.lead_tag:
+            if not self.pending_bare and not data.strip():
+                self._emit(escape(data, quote=False))
+                return
+            # 先頭がタグ無しのテキスト：1行目（改行 or <br> まで）がタイトルと同じなら捨てる
+            self.pending_bare += data
+            head, sep, rest = self.pending_bare.lstrip().partition("\n")
+            if sep:
+                self._flush_bare(head, rest)
+            elif len(head) > 200:
+                self._flush_bare("", self.pending_bare)
+            return
+        self._emit(escape(data, quote=False))
+        self._emit_text(data)
+
+    def _flush_bare(self, head: str, rest: str) -> None:
+        """Settle the bare leading line: drop it if it repeats the title."""
+        self.pending_bare = ""
+        self.lead_open = False
+        if head and _norm(head) == self.title_norm:
+            self.removed_title = True
+            data = rest
+        else:
+            data = head + ("\n" if head else "") + rest
+        if data:
+            self.handle_data(data)
+
+    def handle_comment(self, data: str) -> None:
+        return
+
+    def close(self) -> None:
+        super().close()
+        if self.pending_bare:
+            self._flush_bare("", self.pending_bare)
+        if self.lead_tag:
+            self._settle_lead(False)
+        while self.stack:
+            self._emit(f"</{self.stack.pop()}>")
+
+
+# ---- fast path: もう許可リスト通りの本文（LLM 出力のほぼ全部）はパーサを通さない ----
+
+# 許可タグ以外の "<"、余計な属性、&amp;/&lt;/&gt; 以外の文字参照があれば遅い方へ
+_FAST_TOKEN_RE = re.compile(r"<[^<>]*>")
+_FAST_TAGS = {f"<{t}>": ("", t) for t in ("p", "h2", "ul", "li", "strong", "code", "a")}
+_FAST_TAGS.update({f"</{t}>": ("/", t) for t in ("p", "h2", "ul", "li", "strong", "code", "a")})
+_FAST_A_RE = re.compile(r'<a(?: (?:href|rel|target|title)="(?:[^"&<>\']|&amp;)*")*>')
+_FAST_ATTR_RE = re.compile(r'(\w+)="([^"]*)"')
+_FAST_ENTITY_RE = re.compile(r"&(?=[#a-zA-Z])(?!(?:amp|lt|gt);)")  # 他の文字参照はパーサで正規化
+_BARE_AMP_RE = re.compile(r"&(?![#a-zA-Z])")
+_ANY_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _fast_anchor_ok(tag: str) -> bool:
+    # パーサ側が組み立て直す <a ...> と一字一句同じ形のときだけ通す
+    if not _FAST_A_RE.fullmatch(tag):
+        return False
+    kept = {k: unescape(v) for k, v in _FAST_ATTR_RE.findall(tag)}
+    if "href" in kept and safe_url(kept["href"]) != kept["href"]:
+        return False
+    if kept.get("target") == "_blank":
+        kept["rel"] = " ".join(sorted(set((kept.get("rel") or "").split()) | {"noopener"}))
+    return tag == "<a" + "".join(f' {k}="{escape(v, quote=True)}"' for k, v in kept.items()) + ">"
+
+
+def _fast_words(h: str) -> list[str]:
+    # パーサ側と同じく、ブロック終端だけ空白扱い
+    for end in ("</p>", "</h2>", "</li>", "</ul>"):
+        h = h.replace(end, " ")
+    h = _ANY_TAG_RE.sub("", h)
+    return (unescape(h) if "&" in h else h).split()
+
+
+def _fast_path(body: str, title: str) -> SanitizedHtml | None:
+    """Return the result without tokenizing when `body` is already clean, else None."""
+    title_norm = _norm(title)
+    head = body.lstrip()
+    if title_norm and head and not head.startswith("<"):
+        return None  # 先頭がタグ無しテキスト → 行単位の判定はパーサ側で
+    if "&" in body and _FAST_ENTITY_RE.search(body):
+        return None
+
+    tokens = _FAST_TOKEN_RE.findall(body)
+    if not (len(tokens) == body.count("<") == body.count(">")):
+        return None  # タグ以外の "<" / ">" がある
+
+    # 許可タグだけ・入れ子と閉じタグが対応していること（暗黙に閉じる形は遅い方に任せる）
+    stack: list[str] = []
+    lead_close = -1
+    for i, tok in enumerate(tokens):
+        kind = _FAST_TAGS.get(tok)
+        if kind is None:
+            if not (tok.startswith("<a ") and _fast_anchor_ok(tok)):
+                return None
+            kind = ("", "a")
+        close, name = kind
+        if close:
+            if not stack or stack.pop() != name:
+                return None
+            if lead_close < 0 and not stack:
+                lead_close = i
+        else:
+            if stack and stack[-1] in IMPLIED_CLOSE.get(name, ()):
+                return None
+            stack.append(name)
+    if stack:
+        return None
+
+    removed = False
+    if title_norm and tokens and tokens[0] in ("<h2>", "<p>"):
+        # 先頭ブロック（最初のタグとその閉じタグ）がタイトルと同じなら捨てる
+        lead = list(itertools.islice(_FAST_TOKEN_RE.finditer(body), lead_close + 1))
+        if " ".join(_fast_words(body[lead[0].end():lead[-1].start()])).lower() == title_norm:
+            body, removed = body[lead[-1].end():], True
+
+    html = body.strip()
+    words = _fast_words(html)
+    if "&" in html:
+        html = _BARE_AMP_RE.sub("&amp;", html)
+    return SanitizedHtml(html=html, text=" ".join(words), word_count=len(words), removed_title=removed)
+
+
+def sanitize_html(body_html: str, title: str = "") -> SanitizedHtml:
+    """
+    Single-pass allowlist sanitizer for LLM output.
+    - keeps only ALLOWED_TAGS / ALLOWED_ATTRS (event handlers, style, class ... dropped)
+    - drops <script>/<style>/<iframe>... including their content
+    - rejects javascript:/data:/vbscript: hrefs
+    - removes a leading block (h1/h2/p or bare first line) that repeats `title`
+    - collects plain text + word count on the way
+
+    Bodies that are already clean and well nested take a regex-only fast path
+    with the same result; everything else goes through html.parser.
+    """
+    return _fast_path(body_html or "", title) or _parse(body_html or "", title)
+
+
+def _parse(body_html: str, title: str) -> SanitizedHtml:
+    p = _Sanitizer(title)
+    p.feed(body_html)
+    p.close()
+    words = "".join(p.text).split()
+    return SanitizedHtml(
+        html="".join(p.out).strip(),
+        text=" ".join(words),
+        word_count=len(words),
+        removed_title=p.removed_title,
+    )
@@ -0,0 +1,209 @@
+# nompower_pipeline/search_index.py
+"""
+Compact client-side search index (site/search/).
+
+Layout:
+  meta.json        {"v", "prefix", "min", "stop", "shards": [...], "docs": N}   ← loader が最初に読む
+  docs.json        [[path, title], ...]  doc id = index（削除済みは null）
+  s/<prefix>.json  {"token": [first_id, delta, delta, ...], ...}
+
+Postings are sorted doc ids stored as deltas, sharded by the first
+PREFIX_LEN characters of each token so the browser only fetches the
+shards a query needs. Rebuilds only touch shards of added/changed/removed docs.
+
+The build-side state (id assignment, fingerprints, the shards each doc is
+in) lives outside the published site, in data/search_index_state.json. It
+records the hash of the docs.json it was written with; when the docs.json
+found in out_dir is a different one (site/ restored from an older deploy,
+or not restored at all) the index is rebuilt in full.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import hashlib
+import json
+import re
+
+from nompower_pipeline.util import read_json, write_json
+
+
+INDEX_VERSION = 1
+PREFIX_LEN = 2
+MIN_TOKEN_LEN = 3
+
+_TAG_RE = re.compile(r"(?is)<(script|style)\b.*?</\1\s*>|<[^>]+>")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "your", "with", "this", "that",
+    "from", "have", "has", "was", "were", "will", "can", "its", "they", "their",
+    "what", "when", "who", "how", "why", "all", "any", "our", "out", "into", "than",
+    "then", "them", "there", "these", "those", "about", "just", "more", "most",
+}
+
+
+def plain_text(body_html: str) -> str:
+    return _TAG_RE.sub(" ", body_html or "")
+
+
+def index_tokens(title: str, body_html: str) -> set[str]:
+    text = f"{title} {plain_text(body_html)}".lower()
+    return {t for t in _TOKEN_RE.findall(text) if len(t) >= MIN_TOKEN_LEN and t not in STOPWORDS}
+
+
+def shard_key(token: str) -> str:
+    return token[:PREFIX_LEN]
+
+
+def _fingerprint(a: dict) -> str:
+    h = hashlib.sha1()
+    h.update((a.get("title", "") or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update((a.get("path", "") or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update((a.get("body_html", "") or "").encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def encode_postings(ids: list[int]) -> list[int]:
+    out: list[int] = []
+    prev = 0
+    for i in sorted(ids):
+        out.append(i - prev)
+        prev = i
+    return out
+
+
+def decode_postings(deltas: list[int]) -> list[int]:
+    out: list[int] = []
+    cur = 0
+    for d in deltas:
+        cur += d
+        out.append(cur)
+    return out
+
+
+def _write_compact(path: Path, obj) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(obj, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def _sha(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:16] if path.exists() else ""
+
+
+def write_search_index(articles: list[dict], out_dir: Path, state_path: Path) -> dict:
+    """
+    Build/update the sharded index under out_dir (state kept in state_path).
+    Returns stats: {"docs", "shards", "touched", "full"}.
+    """
+    docs_path = out_dir / "docs.json"
+    state = read_json(state_path, default=None)
+    # 以前は公開ディレクトリに置いていた
+    (out_dir / "state.json").unlink(missing_ok=True)
+
+    full = (
+        not isinstance(state, dict)
+        or state.get("v") != INDEX_VERSION
+        or state.get("prefix") != PREFIX_LEN
+        or not docs_path.exists()
+        or state.get("docs_sha") != _sha(docs_path)
+    )
+    if full:
+        state = {"v": INDEX_VERSION, "prefix": PREFIX_LEN, "next_id": 0, "docs": {}}
+        docs: list = []
+    else:
+        docs = read_json(docs_path, default=[])
+
+    known: dict[str, dict] = state["docs"]  # article id -> {"id", "fp", "shards"}
+
+    # 古い順に id を振る（新しい記事ほど id が大きい → loader は id 降順 = 新着順で出せる）
+    ordered = sorted(articles, key=lambda a: a.get("published_ts", ""))
+    current_ids = {a.get("id") for a in ordered if a.get("id")}
+
+    # shard -> {"add": {token: [doc ids]}, "drop": set(doc ids)}
+    touched: dict[str, dict] = {}
+
+    def _touch(key: str) -> dict:
+        return touched.setdefault(key, {"add": {}, "drop": set()})
+
+    # removed docs
+    for aid in [k for k in known if k not in current_ids]:
+        rec = known.pop(aid)
+        for key in rec["shards"]:
+            _touch(key)["drop"].add(rec["id"])
+        if rec["id"] < len(docs):
+            docs[rec["id"]] = None
+
+    # added / changed docs
+    for a in ordered:
+        aid = a.get("id")
+        if not aid:
+            continue
+        fp = _fingerprint(a)
+        rec = known.get(aid)
+        if rec and rec["fp"] == fp:
+            continue
+
+        if rec:
+            doc_id = rec["id"]
+            for key in rec["shards"]:
+                _touch(key)["drop"].add(doc_id)
+        else:
+            doc_id = state["next_id"]
+            state["next_id"] += 1
+
+        while len(docs) <= doc_id:
+            docs.append(None)
+        docs[doc_id] = [a.get("path", ""), a.get("title", "")]
+
+        toks = index_tokens(a.get("title", ""), a.get("body_html", ""))
+        keys: set[str] = set()
+        for t in toks:
+            key = shard_key(t)
+            keys.add(key)
+            _touch(key)["add"].setdefault(t, []).append(doc_id)
+
+        known[aid] = {"id": doc_id, "fp": fp, "shards": sorted(keys)}
+
+    shard_dir = out_dir / "s"
+    if full and shard_dir.exists():
+        for old in shard_dir.glob("*.json"):
+            old.unlink()
+    for key, ch in touched.items():
+        p = shard_dir / f"{key}.json"
+        postings: dict[str, list[int]] = {}
+        if not full and p.exists():
+            postings = {t: decode_postings(d) for t, d in read_json(p, default={}).items()}
+
+        drop = ch["drop"]
+        if drop:
+            postings = {t: [i for i in ids if i not in drop] for t, ids in postings.items()}
+        for t, ids in ch["add"].items():
+            postings.setdefault(t, []).extend(ids)
+
+        postings = {t: ids for t, ids in postings.items() if ids}
+        if postings:
+            _write_compact(p, {t: encode_postings(ids) for t, ids in sorted(postings.items())})
+        elif p.exists():
+            p.unlink()
+
+    all_shards = sorted({k for rec in known.values() for k in rec["shards"]})
+
+    if touched or full:
+        _write_compact(docs_path, docs)
+        state["docs_sha"] = _sha(docs_path)
+        _write_compact(
+            out_dir / "meta.json",
+            {
+                "v": INDEX_VERSION,
+                "prefix": PREFIX_LEN,
+                "min": MIN_TOKEN_LEN,
+                "stop": sorted(STOPWORDS),
+                "shards": all_shards,
+                "docs": len(docs),
+            },
+        )
+        write_json(state_path, state)
+
+    return {"docs": len(known), "shards": len(all_shards), "touched": len(touched), "full": full}
@@ -0,0 +1,93 @@
+# nompower_pipeline/service_worker.py
+"""
+Fingerprinted assets, build manifest and the site's service worker.
+
+build_site copies each static asset twice into site/assets/:
+
+  style.css              stable name (old cached pages, external links)
+  style.<hash8>.css      content-addressed; what the templates reference
+
+and, after the pages are rendered, writes
+
+  build-manifest.json    {"build": <hash>, "assets": {name: url}, "precache": [...]}
+  sw.js                  static/sw.js with BUILD / PRECACHE prepended
+
+The build hash covers the fingerprinted asset URLs and the article list
+(what the precached index links to), not the rendered index itself: that
+carries the build time, which would give every build a new hash. So sw.js
+changes byte-for-byte only when an asset or the set of articles changes;
+the browser then installs the new worker, which drops the precache of the
+previous build (see static/sw.js). The article page cache is not tied to
+a build and survives deploys. The third-party ad service worker is
+imported at the end of the same sw.js, as before.
+
+Fingerprinted copies left over from earlier builds are removed.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import hashlib
+import json
+import re
+
+from nompower_pipeline.util import write_json, write_text
+
+ASSETS = ("style.css", "fx.js", "search.js", "ads.js")
+MANIFEST_NAME = "build-manifest.json"
+SW_NAME = "sw.js"
+
+_FINGERPRINTED_RE = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{8}(?P<ext>\.[a-z]+)$")
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:8]
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{fingerprint(data)}.{ext}" if dot else f"{name}.{fingerprint(data)}"
+
+
+def write_assets(static_dir: Path, assets_dir: Path) -> dict[str, str]:
+    """Copy ASSETS (plain + fingerprinted); returns {"style.css": "/assets/style.<hash>.css", ...}."""
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    urls: dict[str, str] = {}
+    for name in ASSETS:
+        data = (static_dir / name).read_bytes()
+        hashed = fingerprinted_name(name, data)
+        for dst in (assets_dir / name, assets_dir / hashed):
+            # 同じ中身なら書かない（mtime を保つ）
+            if not dst.exists() or dst.read_bytes() != data:
+                dst.write_bytes(data)
+        urls[name] = f"/assets/{hashed}"
+
+    # 前回ビルドの指紋付きコピーを消す
+    current = {u.rsplit("/", 1)[-1] for u in urls.values()}
+    for p in assets_dir.iterdir():
+        m = _FINGERPRINTED_RE.match(p.name)
+        if m and m.group("stem") + m.group("ext") in ASSETS and p.name not in current:
+            p.unlink()
+    return urls
+
+
+def build_manifest(assets: dict[str, str], article_paths: list[str]) -> dict:
+    precache = ["/"] + [assets[name] for name in ASSETS if name in assets]
+    h = hashlib.sha256()
+    for url in precache[1:]:
+        h.update(url.encode("utf-8") + b"\n")
+    for path in sorted(article_paths):
+        h.update(b"a:" + path.encode("utf-8") + b"\n")
+    return {"build": h.hexdigest()[:12], "assets": dict(assets), "precache": precache}
+
+
+def write_service_worker(out_dir: Path, assets: dict[str, str], static_dir: Path, article_paths: list[str]) -> dict:
+    """Write build-manifest.json and sw.js for the site in out_dir."""
+    manifest = build_manifest(assets, article_paths)
+    write_json(out_dir / MANIFEST_NAME, manifest)
+
+    head = (
+        f"const BUILD = {json.dumps(manifest['build'])};\n"
+        f"const PRECACHE = {json.dumps(manifest['precache'])};\n\n"
+    )
+    write_text(out_dir / SW_NAME, head + (static_dir / SW_NAME).read_text(encoding="utf-8"))
+    return manifest
@@ -0,0 +1,65 @@
+// ads.js — fills the ad placeholders emitted by nompower_pipeline/ad_slots.py
+//
+// <section class="ad-slot" data-ad-slot="top" data-ad-src="…" data-ad-attr-zone="…"
+//          data-ad-margin="200px" [data-ad-target="head"]></section>
+//
+// The provider script is injected when the slot comes within data-ad-margin of
+// the viewport (all at once if IntersectionObserver is missing). A src is only
+// injected once per page. ?adsdebug=1 (or localStorage.adsdebug = "1") logs timings.
+(function () {
+  var dbg = false;
+  try {
+    dbg = location.search.indexOf("adsdebug=1") >= 0 || localStorage.getItem("adsdebug") === "1";
+  } catch (e) {}
+  window.__ads_debug = dbg;
+  var t0 = Date.now();
+  function log() { if (dbg) console.log.apply(console, ["[ads]"].concat([].slice.call(arguments))); }
+
+  var loaded = {};
+
+  function fill(el) {
+    if (el.getAttribute("data-ad-filled")) return;
+    el.setAttribute("data-ad-filled", "1");
+    var src = el.getAttribute("data-ad-src");
+    var name = el.getAttribute("data-ad-slot");
+    if (!src) return;
+    if (loaded[src]) { log("slot", name, "shares", src, "; skip"); return; }
+    loaded[src] = true;
+
+    var s = document.createElement("script");
+    s.async = true;
+    s.src = src;
+    for (var i = 0; i < el.attributes.length; i++) {
+      var a = el.attributes[i];
+      if (a.name.indexOf("data-ad-attr-") === 0) s.setAttribute("data-" + a.name.slice(13), a.value);
+      else if (a.name.indexOf("data-ad-prop-") === 0) s.setAttribute(a.name.slice(13), a.value);
+    }
+    s.onload = function () { log("slot", name, "loaded", src, "ms=", Date.now() - t0); };
+    s.onerror = function (e) { console.error("[ads] slot " + name + " FAILED", src, e); };
+
+    var parent = el.getAttribute("data-ad-target") === "head" ? (document.head || el) : el;
+    parent.appendChild(s);
+    log("slot", name, "visible; injected", src, "ms=", Date.now() - t0);
+  }
+
+  function init() {
+    var slots = document.querySelectorAll(".ad-slot[data-ad-src]");
+    log("slots", slots.length);
+    if (!("IntersectionObserver" in window)) {
+      for (var i = 0; i < slots.length; i++) fill(slots[i]);
+      return;
+    }
+    // rootMargin は slot ごとに違うので observer も slot ごと
+    Array.prototype.forEach.call(slots, function (el) {
+      var io = new IntersectionObserver(function (entries) {
+        entries.forEach(function (ent) {
+          if (ent.isIntersecting) { io.disconnect(); fill(el); }
+        });
+      }, { root: null, rootMargin: el.getAttribute("data-ad-margin") || "200px", threshold: 0 });
+      io.observe(el);
+    });
+  }
+
+  if (document.readyState === "loading") document.addEventListener("DOMContentLoaded", init);
+  else init();
+})();
